@@ -0,0 +1,57 @@
+"""
+Compares the crowd-kit and the numpy engines of `aggregate_dawid_skene` on synthetic answers.
+
+Reports wall time and peak memory allocated by Python and NumPy (`tracemalloc`) for each engine.
+crowd-kit is skipped above `--crowdkit-limit` answers.
+
+Usage:
+    PYTHONPATH=python-lib python benchmarks/bench_dawid_skene.py --answers 100000 1000000 --n-jobs 1 4
+"""
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Tuple
+
+import pandas as pd
+
+from synthetic_crowd import make_answers_df
+from toloka_dataiku import aggregate_dawid_skene
+
+
+def measure(aggregate: Callable[[], pd.Series]) -> Tuple[pd.Series, float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    predicted = aggregate()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return predicted, elapsed, peak / 2 ** 20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--answers', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--n-jobs', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--n-iter', type=int, default=20)
+    parser.add_argument('--crowdkit-limit', type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    print(f'{"answers":>10}{"engine":>12}{"n_jobs":>8}{"seconds":>10}{"peak MiB":>10}{"speedup":>10}{"agree":>8}')
+    for answers in args.answers:
+        answers_df = make_answers_df(answers)
+        baseline = None
+        if answers <= args.crowdkit_limit:
+            baseline, crowdkit_time, peak = measure(
+                lambda: aggregate_dawid_skene(answers_df, args.n_iter, engine='crowdkit'))
+            print(f'{answers:>10}{"crowdkit":>12}{1:>8}{crowdkit_time:>10.2f}{peak:>10.0f}{"1.0x":>10}{"":>8}')
+
+        for n_jobs in args.n_jobs:
+            predicted, elapsed, peak = measure(
+                lambda: aggregate_dawid_skene(answers_df, args.n_iter, engine='numpy', n_jobs=n_jobs))
+            speedup = f'{crowdkit_time / elapsed:.1f}x' if baseline is not None else '-'
+            agree = f'{(predicted == baseline.reindex(predicted.index)).mean():.3f}' if baseline is not None else '-'
+            print(f'{answers:>10}{"numpy":>12}{n_jobs:>8}{elapsed:>10.2f}{peak:>10.0f}{speedup:>10}{agree:>8}')
+
+
+if __name__ == '__main__':
+    main()
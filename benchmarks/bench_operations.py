@@ -0,0 +1,146 @@
+"""
+Measures plugin operations end to end against a local fake Toloka API (`fake_toloka.py`) without network access.
+
+For every size the pipeline of the example project runs: `create_tasks` uploads `rows` tasks, `wait_pool` opens
+the pool and waits until the synthetic crowd solves it, `get_assignments_df` downloads `rows * overlap` answers
+and `aggregate_dawid_skene` aggregates them. `aggregate_pool` then does the download and aggregation in one pass
+without the assignments table. Each operation runs in a fresh process, which reports rows/sec,
+requests/sec, request latency percentiles and the peak RSS of that process.
+
+Usage:
+    PYTHONPATH=python-lib python benchmarks/bench_operations.py --rows 10000 100000 1000000 --latency 0.05
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import requests
+
+from fake_toloka import FakeToloka
+from synthetic_crowd import make_tasks_df
+from toloka_dataiku import (
+    aggregate_dawid_skene,
+    aggregate_pool,
+    create_pool,
+    create_project,
+    create_tasks,
+    create_toloka_client,
+    get_assignments_df,
+    get_operation_metrics,
+    wait_pool,
+)
+from toloka_dataiku._toloka_internals import wrap_thread_sessions
+
+CONFIGS_DIR = Path(__file__).resolve().parent.parent / 'example-data' / 'configs'
+
+OPERATIONS = ['create_tasks', 'wait_pool', 'get_assignments_df', 'aggregate_dawid_skene', 'aggregate_pool']
+
+
+def _record_latencies(toloka_client: Any, latencies: List[float]) -> None:
+    lock = threading.Lock()
+
+    def _record(response: requests.Response, *args, **kwargs) -> None:
+        with lock:
+            latencies.append(response.elapsed.total_seconds())
+
+    wrap_thread_sessions(toloka_client, lambda session: session.hooks['response'].append(_record))
+
+
+def setup(url: str) -> str:
+    """Creates the example project and pool and returns the pool ID."""
+    toloka_client = create_toloka_client('fake-token', url=url)
+    project = create_project(json.loads((CONFIGS_DIR / 'project.json').read_text()), toloka_client=toloka_client)
+    pool = create_pool(json.loads((CONFIGS_DIR / 'pool.json').read_text()), project=project, expiration=1,
+                       toloka_client=toloka_client)
+    return pool['id']
+
+
+def run_operation(operation: str, url: str, pool_id: str, rows: int, args: argparse.Namespace) -> Dict[str, Any]:
+    toloka_client = create_toloka_client('fake-token', url=url, pool_maxsize=max(args.concurrency, 10))
+    latencies: List[float] = []
+    _record_latencies(toloka_client, latencies)
+
+    if operation == 'create_tasks':
+        tasks_df = make_tasks_df(rows, field='headline')
+        create_tasks(pool_id=pool_id, pool_tasks=tasks_df, chunk_size=args.chunk_size, concurrency=args.concurrency,
+                     prefetch=args.prefetch, toloka_client=toloka_client)
+    elif operation == 'wait_pool':
+        wait_pool(pool_id=pool_id, open_pool=True, period=1, toloka_client=toloka_client)
+    elif operation == 'get_assignments_df':
+        get_assignments_df('ACCEPTED', pool_id=pool_id, toloka_client=toloka_client)
+    elif operation == 'aggregate_dawid_skene':
+        # Assignments download is measured by its own operation.
+        answers_df = toloka_client.get_assignments_df(pool_id=pool_id, status=['ACCEPTED'])
+        get_operation_metrics(clear=True)
+        latencies.clear()
+        aggregate_dawid_skene(answers_df, engine='numpy')
+    elif operation == 'aggregate_pool':
+        aggregate_pool('ACCEPTED', pool_id=pool_id, method='dawid_skene', toloka_client=toloka_client)
+
+    metrics = get_operation_metrics().iloc[-1]
+    seconds = metrics['wall_seconds']
+    percentiles = np.percentile(latencies, [50, 95, 99]) * 1000 if latencies else [np.nan] * 3
+    return {
+        'rows': int(metrics['rows']),
+        'seconds': seconds,
+        'requests': int(metrics['requests']),
+        'throttled': int(metrics['throttled']),
+        'latency_ms': list(percentiles),
+        # Kilobytes on Linux.
+        'peak_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def spawn_operation(operation: str, url: str, pool_id: str, rows: int, args: argparse.Namespace) -> Dict[str, Any]:
+    command = [sys.executable, '-W', 'ignore', __file__, '--worker', operation, '--url', url, '--pool-id', pool_id,
+               '--rows', str(rows), '--chunk-size', str(args.chunk_size), '--concurrency', str(args.concurrency),
+               '--prefetch', str(args.prefetch)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean seconds per fake API request.')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Fake API requests per second.')
+    parser.add_argument('--solve-rate', type=float, default=100_000.0, help='Tasks per second solved by the crowd.')
+    parser.add_argument('--chunk-size', type=int, default=10_000)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--prefetch', type=int, default=0, help='Task chunks built ahead of the upload.')
+    parser.add_argument('--worker', choices=OPERATIONS, help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    parser.add_argument('--pool-id', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_operation(args.worker, args.url, args.pool_id, args.rows[0], args)))
+        return
+
+    fake = FakeToloka(latency=args.latency, rate_limit=args.rate_limit, solve_rate=args.solve_rate)
+    url = fake.start()
+    print(f'{"rows":>9}{"operation":>23}{"seconds":>9}{"rows/s":>10}{"requests":>9}{"req/s":>8}{"429":>6}'
+          f'{"p50 ms":>8}{"p95 ms":>8}{"p99 ms":>8}{"RSS MiB":>9}')
+    try:
+        for rows in args.rows:
+            pool_id = setup(url)
+            for operation in OPERATIONS:
+                result = spawn_operation(operation, url, pool_id, rows, args)
+                p50, p95, p99 = result['latency_ms']
+                seconds = result['seconds']
+                rows_per_second = f'{result["rows"] / seconds:.0f}' if result['rows'] else '-'
+                print(f'{rows:>9}{operation:>23}{seconds:>9.2f}{rows_per_second:>10}'
+                      f'{result["requests"]:>9}{result["requests"] / seconds:>8.1f}{result["throttled"]:>6}'
+                      f'{p50:>8.1f}{p95:>8.1f}{p99:>8.1f}{result["peak_rss_mib"]:>9.0f}', flush=True)
+    finally:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Compares the columnar `init_*_tasks` builders with the previous `iterrows`-based implementation.
+
+Usage:
+    PYTHONPATH=python-lib python benchmarks/bench_task_builders.py --rows 10000 100000
+"""
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+from toloka.client import Task
+
+from toloka_dataiku._utils import init_control_tasks, init_pool_tasks, init_training_tasks
+
+
+def legacy_init_pool_tasks(tasks_df: pd.DataFrame, pool_id: str) -> List[Task]:
+    headings = [column_name for column_name in tasks_df.columns if column_name.startswith('INPUT:')]
+    return [
+        Task(input_values={field[len('INPUT:'):]: row[field] for field in headings if not pd.isna(row[field])},
+             pool_id=pool_id)
+        for _, row in tasks_df.iterrows()
+    ]
+
+
+def legacy_init_control_tasks(tasks_df: pd.DataFrame, pool_id: str) -> List[Task]:
+    input_headings = [column_name for column_name in tasks_df.columns if column_name.startswith('INPUT:')]
+    golden_headings = [column_name for column_name in tasks_df.columns if column_name.startswith('GOLDEN:')]
+    return [
+        Task(input_values={field[len('INPUT:'):]: row[field] for field in input_headings if not pd.isna(row[field])},
+             known_solutions=[{'output_values': {field[len('GOLDEN:'):]: row[field] for field in golden_headings
+                                                 if not pd.isna(row[field])}}],
+             pool_id=pool_id)
+        for _, row in tasks_df.iterrows()
+    ]
+
+
+def legacy_init_training_tasks(tasks_df: pd.DataFrame, pool_id: str) -> List[Task]:
+    input_headings = [column_name for column_name in tasks_df.columns if column_name.startswith('INPUT:')]
+    golden_headings = [column_name for column_name in tasks_df.columns if column_name.startswith('GOLDEN:')]
+    hint_headings = [column_name for column_name in tasks_df.columns if column_name.startswith('HINT:')]
+    tasks = []
+    for _, row in tasks_df.iterrows():
+        hint_fields = hint_headings or golden_headings
+        tasks.append(Task(
+            input_values={field[len('INPUT:'):]: row[field] for field in input_headings if not pd.isna(row[field])},
+            known_solutions=[{'output_values': {field[len('GOLDEN:'):]: row[field] for field in golden_headings
+                                                if not pd.isna(row[field])}}],
+            message_on_unknown_solution='Correct solution: ' + ''.join(row[field] for field in hint_fields
+                                                                       if not pd.isna(row[field])),
+            pool_id=pool_id))
+    return tasks
+
+
+def make_tasks_df(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    urls = pd.Series([f'https://example.com/images/{i}.png' for i in range(rows)])
+    texts = pd.Series(rng.choice(['cat', 'dog', 'bird', None], size=rows))
+    return pd.DataFrame({
+        'INPUT:image': urls,
+        'INPUT:caption': texts,
+        'GOLDEN:result': rng.choice(['OK', 'BAD'], size=rows),
+        'HINT:result': rng.choice(['looks fine', 'broken image', None], size=rows),
+    })
+
+
+def measure(builder: Callable[[pd.DataFrame, str], List[Task]], tasks_df: pd.DataFrame) -> float:
+    start = time.perf_counter()
+    builder(tasks_df, 'pool-id')
+    return len(tasks_df) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    builders = [
+        ('pool', legacy_init_pool_tasks, init_pool_tasks),
+        ('control', legacy_init_control_tasks, init_control_tasks),
+        ('training', legacy_init_training_tasks, init_training_tasks),
+    ]
+    print(f'{"builder":<10}{"rows":>10}{"legacy rows/s":>16}{"columnar rows/s":>18}{"speedup":>10}')
+    for rows in args.rows:
+        tasks_df = make_tasks_df(rows)
+        for name, legacy, columnar in builders:
+            sample = tasks_df.head(1000)
+            assert legacy(sample, 'pool-id') == columnar(sample, 'pool-id'), f'{name} builders disagree'
+            legacy_rate = measure(legacy, tasks_df)
+            columnar_rate = measure(columnar, tasks_df)
+            print(f'{name:<10}{rows:>10}{legacy_rate:>16.0f}{columnar_rate:>18.0f}{columnar_rate / legacy_rate:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""
+Local stand-in for the Toloka API endpoints used by the plugin operations, to benchmark them offline.
+
+Serves projects, pools, task upload (synchronous and through async operations), pool opening, analytics,
+operations and the assignments TSV export. Opened pools are solved by a synthetic crowd at `--solve-rate`
+tasks per second and close once all tasks are solved. Every request waits about `--latency` seconds,
+and requests above `--rate-limit` per second are throttled with 429 and "Retry-After".
+
+Usage:
+    python benchmarks/fake_toloka.py --port 8080 --latency 0.05 --rate-limit 50
+"""
+import argparse
+import bisect
+import io
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from synthetic_crowd import crowd_answers
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, code: str, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+class _PoolTasks:
+    """Tasks of one pool stored column-wise, so millions of tasks do not take millions of dicts."""
+
+    def __init__(self) -> None:
+        self.ids: List[str] = []
+        self.inputs: Dict[str, List[Any]] = {}
+
+    def add(self, task_id: str, input_values: Dict[str, Any]) -> None:
+        for name, value in input_values.items():
+            self.inputs.setdefault(name, [None] * len(self.ids)).append(value)
+        self.ids.append(task_id)
+        for values in self.inputs.values():
+            if len(values) < len(self.ids):
+                values.append(None)
+
+    def task(self, i: int, pool_id: str) -> Dict[str, Any]:
+        input_values = {name: values[i] for name, values in self.inputs.items() if values[i] is not None}
+        return {'id': self.ids[i], 'pool_id': pool_id, 'input_values': input_values, 'overlap': 1}
+
+
+class FakeToloka:
+    """
+    In-memory fake of the Toloka API served by a threading HTTP server on localhost.
+
+    Args:
+        - latency (float): Mean seconds every request takes, uniformly jittered by +-50%.
+        - rate_limit (float, optional): Requests per second above which requests are throttled.
+        - retry_after (int): "Retry-After" of throttled responses in seconds.
+        - solve_rate (float): Tasks per second solved in an open pool.
+        - overlap (int): Answers per task.
+        - labels (int): Number of labels of the synthetic crowd.
+        - workers (int): Number of workers of the synthetic crowd.
+    """
+
+    def __init__(self, *, latency: float = 0.0, rate_limit: Optional[float] = None, retry_after: int = 1,
+                 solve_rate: float = 100_000.0, overlap: int = 3, labels: int = 3, workers: int = 1000) -> None:
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.solve_rate = solve_rate
+        self.overlap = overlap
+        self.labels = labels
+        self.workers = workers
+
+        self.projects: Dict[str, Dict[str, Any]] = {}
+        self.pools: Dict[str, Dict[str, Any]] = {}
+        self.tasks: Dict[str, _PoolTasks] = {}
+        self.operations: Dict[str, Dict[str, Any]] = {}
+        self.operation_logs: Dict[str, List[Dict[str, Any]]] = {}
+        self.requests = 0
+        self.throttled = 0
+
+        self._ids = itertools.count(1)
+        self._opened_at: Dict[str, float] = {}
+        self._exports: Dict[str, bytes] = {}
+        self._sent: Deque[float] = deque()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+        self._routes: List[Tuple[str, re.Pattern, Callable[..., Any]]] = [
+            (method, re.compile(f'^/api{pattern}$'), handler) for method, pattern, handler in [
+                ('POST', '/v1/projects', self._create_project),
+                ('GET', '/v1/projects/([^/]+)', self._get_project),
+                ('POST', '/v1/pools', self._create_pool),
+                ('GET', '/v1/pools/([^/]+)', self._get_pool),
+                ('POST', '/v1/pools/([^/]+)/open', self._open_pool),
+                ('POST', '/v1/tasks', self._create_tasks),
+                ('GET', '/v1/tasks', self._find_tasks),
+                ('GET', '/v1/operations/([^/]+)', self._get_operation),
+                ('GET', '/v1/operations/([^/]+)/log', self._get_operation_log),
+                ('POST', '/staging/analytics-2', self._get_analytics),
+                ('GET', '/v1/user-restrictions', lambda query, body: {'items': [], 'has_more': False}),
+                ('GET', '/new/requester/pools/([^/]+)/assignments.tsv', self._get_assignments_tsv),
+            ]
+        ]
+
+    # Server
+
+    def start(self, port: int = 0) -> str:
+        """Starts serving in a background thread and returns the URL to pass to `TolokaClient`."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                fake._handle(self)
+
+            do_POST = do_PUT = do_PATCH = do_GET
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _throttle(self) -> bool:
+        if self.rate_limit is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            while self._sent and self._sent[0] <= now - 1.0:
+                self._sent.popleft()
+            if len(self._sent) >= self.rate_limit:
+                self.throttled += 1
+                return True
+            self._sent.append(now)
+            return False
+
+    def _handle(self, request: BaseHTTPRequestHandler) -> None:
+        with self._lock:
+            self.requests += 1
+        length = int(request.headers.get('Content-Length') or 0)
+        body = json.loads(request.rfile.read(length)) if length else None
+        if self.latency:
+            time.sleep(self.latency * random.uniform(0.5, 1.5))
+
+        headers = {}
+        if self._throttle():
+            status, result = 429, {'code': 'TOO_MANY_REQUESTS', 'message': 'Too many requests', 'payload': {}}
+            headers['Retry-After'] = str(self.retry_after)
+        else:
+            url = urlsplit(request.path)
+            query = {name: values[0] for name, values in parse_qs(url.query).items()}
+            status, result = 404, {'code': 'DOES_NOT_EXIST', 'message': f'Unknown endpoint {url.path}'}
+            for method, pattern, handler in self._routes:
+                match = pattern.match(url.path)
+                if method == request.command and match:
+                    try:
+                        status, result = 200, handler(*match.groups(), query=query, body=body)
+                    except ApiError as e:
+                        status, result = e.status, {'code': e.code, 'message': str(e)}
+                    break
+
+        if isinstance(result, bytes):
+            content, content_type = result, 'text/tab-separated-values; charset=utf-8'
+        else:
+            content, content_type = json.dumps(result).encode(), 'application/json'
+        request.send_response(status)
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(content)))
+        request.end_headers()
+        request.wfile.write(content)
+
+    # Objects
+
+    def _new_id(self) -> str:
+        # Zero-padded, so string order follows creation order as toloka-kit range requests expect.
+        return f'{next(self._ids):012d}'
+
+    def _operation(self, operation_type: str, details: Optional[Dict[str, Any]] = None,
+                   log: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        operation = {'id': str(uuid.uuid4()), 'type': operation_type, 'status': 'SUCCESS', 'submitted': _now(),
+                     'started': _now(), 'finished': _now(), 'progress': 100, 'parameters': {}}
+        if details is not None:
+            operation['details'] = details
+        with self._lock:
+            self.operations[operation['id']] = operation
+            self.operation_logs[operation['id']] = log or []
+        return operation
+
+    def _get(self, objects: Dict[str, Dict[str, Any]], object_id: str) -> Dict[str, Any]:
+        if object_id not in objects:
+            raise ApiError(404, 'DOES_NOT_EXIST', f'Object {object_id} does not exist')
+        return objects[object_id]
+
+    def _create_project(self, query: Dict[str, str], body: Dict[str, Any]) -> Dict[str, Any]:
+        project = {**body, 'id': self._new_id(), 'status': 'ACTIVE', 'created': _now()}
+        self.projects[project['id']] = project
+        return project
+
+    def _get_project(self, project_id: str, query: Dict[str, str], body: None) -> Dict[str, Any]:
+        return self._get(self.projects, project_id)
+
+    def _create_pool(self, query: Dict[str, str], body: Dict[str, Any]) -> Dict[str, Any]:
+        pool = {**body, 'id': self._new_id(), 'status': 'CLOSED', 'created': _now()}
+        self.pools[pool['id']] = pool
+        self.tasks[pool['id']] = _PoolTasks()
+        return pool
+
+    def _progress(self, pool_id: str) -> float:
+        """Share of solved tasks of the pool, from 0 to 1."""
+        if pool_id not in self._opened_at:
+            return 0.0
+        tasks = len(self.tasks[pool_id].ids)
+        solved = (time.monotonic() - self._opened_at[pool_id]) * self.solve_rate
+        return min(1.0, solved / tasks) if tasks else 1.0
+
+    def _get_pool(self, pool_id: str, query: Dict[str, str], body: None) -> Dict[str, Any]:
+        pool = self._get(self.pools, pool_id)
+        if pool['status'] == 'OPEN' and self._progress(pool_id) >= 1.0:
+            pool.update(status='CLOSED', last_close_reason='COMPLETED', last_closed=_now())
+        return pool
+
+    def _open_pool(self, pool_id: str, query: Dict[str, str], body: None) -> Dict[str, Any]:
+        pool = self._get(self.pools, pool_id)
+        pool.update(status='OPEN', last_started=_now())
+        self._opened_at[pool_id] = time.monotonic()
+        return self._operation('POOL.OPEN')
+
+    def _create_tasks(self, query: Dict[str, str], body: List[Dict[str, Any]]) -> Dict[str, Any]:
+        created, log = {}, []
+        with self._lock:
+            for i, task in enumerate(body):
+                pool_tasks = self.tasks.get(task['pool_id'])
+                if pool_tasks is None:
+                    log.append({'type': 'TASK_CREATE', 'success': False, 'input': task,
+                                'output': {'pool_id': {'code': 'DOES_NOT_EXIST', 'message': 'Pool does not exist'}}})
+                    continue
+                task_id = self._new_id()
+                pool_tasks.add(task_id, task['input_values'])
+                created[str(i)] = {**task, 'id': task_id, 'created': _now()}
+                log.append({'type': 'TASK_CREATE', 'success': True, 'input': task, 'output': {'task_id': task_id}})
+        if query.get('async_mode') == 'true':
+            return self._operation('TASK.BATCH_CREATE', log=log)
+        return {'items': created, 'validation_errors': {}}
+
+    def _find_tasks(self, query: Dict[str, str], body: None) -> Dict[str, Any]:
+        pool_id = query['pool_id']
+        pool_tasks = self._get(self.tasks, pool_id)
+        start = bisect.bisect_left(pool_tasks.ids, query.get('id_gte', ''))
+        end = bisect.bisect_right(pool_tasks.ids, query['id_lte']) if 'id_lte' in query else len(pool_tasks.ids)
+        return {'items': [pool_tasks.task(i, pool_id) for i in range(start, end)], 'has_more': False}
+
+    def _get_operation(self, operation_id: str, query: Dict[str, str], body: None) -> Dict[str, Any]:
+        return self._get(self.operations, operation_id)
+
+    def _get_operation_log(self, operation_id: str, query: Dict[str, str], body: None) -> List[Dict[str, Any]]:
+        return self.operation_logs.get(operation_id, [])
+
+    def _get_analytics(self, query: Dict[str, str], body: List[Dict[str, Any]]) -> Dict[str, Any]:
+        values = []
+        for request in body:
+            progress = self._progress(request['subject_id'])
+            if request['name'] == 'completion_percentage':
+                value = int(progress * 100)
+            else:
+                value = int(progress * len(self.tasks[request['subject_id']].ids) * self.overlap)
+            values.append({'request': request, 'result': {'value': value}, 'finished': _now()})
+        return self._operation('ANALYTICS', details={'value': values})
+
+    # Assignments
+
+    def _get_assignments_tsv(self, pool_id: str, query: Dict[str, str], body: None) -> bytes:
+        pool = self._get(self.pools, pool_id)
+        if pool_id not in self._exports:
+            self._exports[pool_id] = self._export(pool_id, pool)
+        return self._exports[pool_id]
+
+    def _export(self, pool_id: str, pool: Dict[str, Any]) -> bytes:
+        """Accepted assignments of the synthetic crowd, one task per assignment."""
+        pool_tasks = self.tasks[pool_id]
+        output_spec = self.projects.get(pool.get('project_id'), {}).get('task_spec', {}).get('output_spec', {})
+        output_field = next(iter(output_spec), 'result')
+        crowd = crowd_answers(len(pool_tasks.ids), self.overlap, self.labels, self.workers, seed=int(pool_id))
+
+        export = pd.DataFrame({f'INPUT:{name}': pd.Series(values, dtype=object).take(crowd.task).to_numpy()
+                               for name, values in pool_tasks.inputs.items()})
+        export[f'OUTPUT:{output_field}'] = pd.Series(crowd.label).map('label_{}'.format)
+        task_ids = pd.Series(pool_tasks.ids, dtype=object).take(crowd.task).to_numpy()
+        export['ASSIGNMENT:link'] = ''
+        export['ASSIGNMENT:task_id'] = task_ids
+        export['ASSIGNMENT:assignment_id'] = [f'a{i:012d}' for i in range(len(crowd.task))]
+        export['ASSIGNMENT:worker_id'] = pd.Series(crowd.worker).map('worker_{}'.format)
+        export['ASSIGNMENT:status'] = 'ACCEPTED'
+        export['ASSIGNMENT:started'] = _now()
+        buffer = io.StringIO()
+        export.to_csv(buffer, sep='\t', index=False)
+        return buffer.getvalue().encode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=None)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--solve-rate', type=float, default=100_000.0)
+    parser.add_argument('--overlap', type=int, default=3)
+    args = parser.parse_args()
+
+    fake = FakeToloka(latency=args.latency, rate_limit=args.rate_limit, retry_after=args.retry_after,
+                      solve_rate=args.solve_rate, overlap=args.overlap)
+    print(fake.start(args.port), flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
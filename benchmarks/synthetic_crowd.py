@@ -0,0 +1,50 @@
+"""
+Synthetic tasks and crowd answers for benchmarks.
+
+Workers have a fixed skill: the probability to give the true label, otherwise they answer uniformly at random.
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+
+class CrowdAnswers(NamedTuple):
+    """Answers as parallel arrays of task, worker and label numbers, `overlap` consecutive answers per task."""
+    task: np.ndarray
+    worker: np.ndarray
+    label: np.ndarray
+    true_labels: np.ndarray
+
+
+def crowd_answers(tasks: int, overlap: int = 5, labels: int = 3, workers: int = 1000,
+                  seed: int = 0) -> CrowdAnswers:
+    rng = np.random.default_rng(seed)
+    true_labels = rng.integers(labels, size=tasks)
+    skills = rng.uniform(0.5, 0.95, size=workers)
+
+    task = np.repeat(np.arange(tasks), overlap)
+    worker = rng.integers(workers, size=len(task))
+    correct = rng.random(len(task)) < skills[worker]
+    label = np.where(correct, true_labels[task], rng.integers(labels, size=len(task)))
+    return CrowdAnswers(task, worker, label, true_labels)
+
+
+def image_url(task: int) -> str:
+    return f'https://example.com/images/{task}.png'
+
+
+def make_tasks_df(tasks: int, field: str = 'image') -> pd.DataFrame:
+    """Tasks with one input field, as read from a DSS dataset."""
+    return pd.DataFrame({f'INPUT:{field}': pd.Series(np.arange(tasks)).map(image_url)})
+
+
+def make_answers_df(answers: int, overlap: int = 5, labels: int = 3, workers: int = 1000,
+                    seed: int = 0) -> pd.DataFrame:
+    """Answers in the assignments export format used by aggregation."""
+    crowd = crowd_answers(answers // overlap, overlap, labels, workers, seed)
+    return pd.DataFrame({
+        'INPUT:image': pd.Series(crowd.task).map(image_url),
+        'OUTPUT:result': pd.Series(crowd.label).map('label_{}'.format),
+        'ASSIGNMENT:worker_id': pd.Series(crowd.worker).map('worker_{}'.format),
+    })
@@ -4,17 +4,55 @@ import dataiku
 from dataiku.customrecipe import *
 
 import logging
-from toloka.client import TolokaClient
 
-from toloka_dataiku import aggregate_dawid_skene
+from toloka_dataiku import aggregate_dawid_skene, get_operation_metrics, recipe_profiling
+from toloka_dataiku import ANSWER_COLUMNS, read_parquet_folder, write_parquet
 
 
-input_name = get_input_names_for_role('input_dataset' )[0]
-answers_df = dataiku.Dataset(input_name).get_dataframe()
+input_name = get_input_names_for_role('input_dataset')
+if input_name:
+    answers_df = dataiku.Dataset(input_name[0]).get_dataframe()
+else:
+    # Parquet files written by the get-assignments recipe: only the columns needed for aggregation are read.
+    assignments_folder = dataiku.Folder(get_input_names_for_role('assignments_folder')[0])
+    answers_df = read_parquet_folder(assignments_folder, columns=ANSWER_COLUMNS)
 
 n_iter = get_recipe_config()['n_iter']
+tol = get_recipe_config().get('tol', 1e-5)
+engine = get_recipe_config().get('engine') or None
+n_jobs = get_recipe_config().get('n_jobs', 1)
 
-predicted_answers = aggregate_dawid_skene(answers_df, n_iter).to_frame().reset_index()
+# Fitted model state is kept in the optional state folder to warm-start the next run.
+state = None
+on_state_fitted = None
+state_folder_name = get_output_names_for_role('state_folder')
+if state_folder_name:
+    state_folder = dataiku.Folder(state_folder_name[0])
+    state_filename = get_recipe_config().get('state_filename') or 'dawid_skene_state.json'
+    if state_filename in [path.lstrip('/') for path in state_folder.list_paths_in_partition()]:
+        state = state_folder.read_json(state_filename)
 
-output_name  = get_output_names_for_role('output_dataset')[0]
-dataiku.Dataset(output_name).write_with_schema(predicted_answers)
\ No newline at end of file
+    def write_state(new_state):
+        state_folder.write_json(state_filename, new_state)
+
+    on_state_fitted = write_state
+    # Only the numpy engine can be warm-started.
+    engine = 'numpy'
+
+# CPU and memory profiling of the run is enabled by the optional profiling folder.
+with recipe_profiling('profiling_folder', 'aggregate_dawid_skene'):
+    predicted_answers = aggregate_dawid_skene(answers_df, n_iter, tol=tol, state=state,
+                                              on_state_fitted=on_state_fitted, engine=engine,
+                                              n_jobs=n_jobs).to_frame().reset_index()
+
+output_name = get_output_names_for_role('output_dataset')
+if output_name:
+    dataiku.Dataset(output_name[0]).write_with_schema(predicted_answers)
+
+results_folder_name = get_output_names_for_role('results_folder')
+if results_folder_name:
+    write_parquet(predicted_answers, dataiku.Folder(results_folder_name[0]).upload_data, 'aggregated.parquet')
+
+metrics_name = get_output_names_for_role('metrics_dataset')
+if metrics_name:
+    dataiku.Dataset(metrics_name[0]).write_with_schema(get_operation_metrics())
@@ -0,0 +1,44 @@
+# import the classes for accessing DSS objects from the recipe
+import dataiku
+# Import the helpers for custom recipes
+from dataiku.customrecipe import *
+
+import logging
+
+from toloka_dataiku import aggregate_pool, get_operation_metrics, recipe_profiling, toloka_client_from_config
+from toloka_dataiku import write_parquet
+
+
+input_folder = dataiku.Folder(get_input_names_for_role('input_folder')[0])
+input_config_filename = get_recipe_config()['input_config_filename']
+
+exclude_banned = get_recipe_config()['exclude_banned']
+
+toloka_client = toloka_client_from_config(get_plugin_config())
+
+pool = input_folder.read_json(input_config_filename)
+
+method = get_recipe_config().get('method') or 'dawid_skene'
+cascade = get_recipe_config().get('cascade', False)
+agreement_threshold = get_recipe_config().get('agreement_threshold', 1.0)
+# 0 keeps the default number of iterations of the chosen method.
+n_iter = get_recipe_config().get('n_iter') or None
+n_jobs = get_recipe_config().get('n_jobs', 1)
+
+# CPU and memory profiling of the run is enabled by the optional profiling folder.
+with recipe_profiling('profiling_folder', 'aggregate_pool'):
+    predicted_answers = aggregate_pool(pool=pool, toloka_client=toloka_client, exclude_banned=exclude_banned,
+                                       method=method, cascade=cascade, agreement_threshold=agreement_threshold,
+                                       n_iter=n_iter, n_jobs=n_jobs).to_frame().reset_index()
+
+output_name = get_output_names_for_role('output_dataset')
+if output_name:
+    dataiku.Dataset(output_name[0]).write_with_schema(predicted_answers)
+
+results_folder_name = get_output_names_for_role('results_folder')
+if results_folder_name:
+    write_parquet(predicted_answers, dataiku.Folder(results_folder_name[0]).upload_data, 'aggregated.parquet')
+
+metrics_name = get_output_names_for_role('metrics_dataset')
+if metrics_name:
+    dataiku.Dataset(metrics_name[0]).write_with_schema(get_operation_metrics())
@@ -0,0 +1,42 @@
+# import the classes for accessing DSS objects from the recipe
+import dataiku
+# Import the helpers for custom recipes
+from dataiku.customrecipe import *
+
+import logging
+
+from toloka_dataiku import aggregate, get_operation_metrics, recipe_profiling
+from toloka_dataiku import ANSWER_COLUMNS, read_parquet_folder, write_parquet
+
+
+input_name = get_input_names_for_role('input_dataset')
+if input_name:
+    answers_df = dataiku.Dataset(input_name[0]).get_dataframe()
+else:
+    # Parquet files written by the get-assignments recipe: only the columns needed for aggregation are read.
+    assignments_folder = dataiku.Folder(get_input_names_for_role('assignments_folder')[0])
+    answers_df = read_parquet_folder(assignments_folder, columns=ANSWER_COLUMNS)
+
+method = get_recipe_config().get('method') or 'dawid_skene'
+cascade = get_recipe_config().get('cascade', False)
+agreement_threshold = get_recipe_config().get('agreement_threshold', 1.0)
+# 0 keeps the default number of iterations of the chosen method.
+n_iter = get_recipe_config().get('n_iter') or None
+n_jobs = get_recipe_config().get('n_jobs', 1)
+
+# CPU and memory profiling of the run is enabled by the optional profiling folder.
+with recipe_profiling('profiling_folder', 'aggregate'):
+    predicted_answers = aggregate(answers_df, method, cascade=cascade, agreement_threshold=agreement_threshold,
+                                  n_iter=n_iter, n_jobs=n_jobs).to_frame().reset_index()
+
+output_name = get_output_names_for_role('output_dataset')
+if output_name:
+    dataiku.Dataset(output_name[0]).write_with_schema(predicted_answers)
+
+results_folder_name = get_output_names_for_role('results_folder')
+if results_folder_name:
+    write_parquet(predicted_answers, dataiku.Folder(results_folder_name[0]).upload_data, 'aggregated.parquet')
+
+metrics_name = get_output_names_for_role('metrics_dataset')
+if metrics_name:
+    dataiku.Dataset(metrics_name[0]).write_with_schema(get_operation_metrics())
@@ -4,9 +4,8 @@ import dataiku
 from dataiku.customrecipe import *
 
 import logging
-from toloka.client import TolokaClient
 
-from toloka_dataiku import create_pool
+from toloka_dataiku import create_pool, get_operation_metrics, toloka_client_from_config
 
 
 input_folder = dataiku.Folder(get_input_names_for_role('input_folder')[0])
@@ -31,14 +30,15 @@ pool_expiration_days = get_recipe_config()['pool_expiration_days']
 
 pool_reward_per_assignment = get_recipe_config()['pool_reward_per_assignment'] 
 
-environment = get_plugin_config()['environment']
-token = get_plugin_config()['token']
-
-toloka_client = TolokaClient(token, environment)
+toloka_client = toloka_client_from_config(get_plugin_config())
 
 pool = create_pool(pool_config, project=project, training=training, expiration = pool_expiration_datetime or pool_expiration_days,
                    reward_per_assignment=pool_reward_per_assignment, toloka_client=toloka_client)
 
 output_folder = dataiku.Folder(get_output_names_for_role('output_folder')[0])
 output_pool_filename = get_recipe_config()['output_pool_filename']
-output_folder.write_json(output_pool_filename, pool)
\ No newline at end of file
+output_folder.write_json(output_pool_filename, pool)
+
+metrics_name = get_output_names_for_role('metrics_dataset')
+if metrics_name:
+    dataiku.Dataset(metrics_name[0]).write_with_schema(get_operation_metrics())
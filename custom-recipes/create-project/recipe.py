@@ -6,22 +6,22 @@ import dataiku
 from dataiku.customrecipe import *
 
 import logging
-from toloka.client import TolokaClient
 
-from toloka_dataiku import create_project
+from toloka_dataiku import create_project, get_operation_metrics, toloka_client_from_config
 
 
 input_folder = dataiku.Folder(get_input_names_for_role('input_folder')[0])
 input_config_filename = get_recipe_config()['input_config_filename']
 
-environment = get_plugin_config()['environment']
-token = get_plugin_config()['token']
-
-toloka_client = TolokaClient(token, environment)
+toloka_client = toloka_client_from_config(get_plugin_config())
 
 project_config = input_folder.read_json(input_config_filename)
 project = create_project(project_config, toloka_client=toloka_client)
 
 output_folder = dataiku.Folder(get_output_names_for_role('output_folder')[0])
 output_project_filename = get_recipe_config()['output_project_config_filename']
-output_folder.write_json(output_project_filename, project)
\ No newline at end of file
+output_folder.write_json(output_project_filename, project)
+
+metrics_name = get_output_names_for_role('metrics_dataset')
+if metrics_name:
+    dataiku.Dataset(metrics_name[0]).write_with_schema(get_operation_metrics())
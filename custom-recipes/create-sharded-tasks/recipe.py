@@ -0,0 +1,90 @@
+# import the classes for accessing DSS objects from the recipe
+import dataiku
+# Import the helpers for custom recipes
+from dataiku.customrecipe import *
+
+import logging
+
+from toloka_dataiku import create_sharded_tasks, get_operation_metrics, toloka_client_from_config
+
+
+input_folder = dataiku.Folder(get_input_names_for_role('input_folder')[0])
+input_config_filename = get_recipe_config()['input_config_filename']
+pool_config = input_folder.read_json(input_config_filename)
+
+project_config_folder = dataiku.Folder(get_input_names_for_role('project_config_folder')[0])
+input_project_filename = get_recipe_config().get('input_project_filename')
+project = project_config_folder.read_json(input_project_filename)
+
+training_config_folder = get_input_names_for_role('training_config_folder')
+input_training_filename = get_recipe_config().get('input_training_filename')
+if training_config_folder and input_training_filename:
+    training = dataiku.Folder(training_config_folder[0]).read_json(input_training_filename)
+else:
+    training = None
+
+pool_expiration_datetime = get_recipe_config().get('pool_expiration_datetime')
+pool_expiration_days = get_recipe_config()['pool_expiration_days']
+pool_reward_per_assignment = get_recipe_config()['pool_reward_per_assignment']
+
+# The number of pools is set directly, derived from a target pool size or from distinct values of a column.
+sharding = get_recipe_config().get('sharding') or 'shards'
+shards = get_recipe_config().get('shards') if sharding == 'shards' else None
+rows_per_shard = get_recipe_config().get('rows_per_shard') if sharding == 'rows_per_shard' else None
+partition_by = get_recipe_config().get('partition_column') if sharding == 'partition' else None
+shard_by = get_recipe_config().get('shard_by_columns') or None
+
+chunk_size = get_recipe_config().get('chunk_size')
+pool_tasks_dataset = dataiku.Dataset(get_input_names_for_role('pool_tasks_dataset')[0])
+# Pool sizes and partitions are known only after all rows are read.
+if chunk_size and sharding == 'shards':
+    pool_tasks = pool_tasks_dataset.iter_dataframes(chunksize=chunk_size)
+else:
+    pool_tasks = pool_tasks_dataset.get_dataframe()
+
+control_tasks_dataset = get_input_names_for_role('control_tasks_dataset')
+control_tasks = dataiku.Dataset(control_tasks_dataset[0]).get_dataframe() if control_tasks_dataset else None
+
+# Rows rejected by validation are written to the optional rejected tasks dataset as they are found,
+# with the columns of the pool tasks dataset, their position and their errors.
+validate = get_recipe_config().get('validate_tasks', False)
+rejected_name = get_output_names_for_role('rejected_dataset')
+rejected_writer = None
+on_rejected = None
+if rejected_name:
+    rejected_schema = pool_tasks_dataset.read_schema() + [{'name': 'row', 'type': 'bigint'},
+                                                          {'name': 'validation_errors', 'type': 'string'}]
+    rejected_dataset = dataiku.Dataset(rejected_name[0])
+    rejected_dataset.write_schema(rejected_schema)
+    rejected_writer = rejected_dataset.get_writer()
+
+    def write_rejected(rejected_df):
+        rejected_writer.write_dataframe(rejected_df.reindex(columns=[column['name'] for column in rejected_schema]))
+
+    on_rejected = write_rejected
+
+toloka_client = toloka_client_from_config(get_plugin_config())
+
+try:
+    manifest = create_sharded_tasks(pool_config, project=project, training=training,
+                                    expiration=pool_expiration_datetime or pool_expiration_days,
+                                    reward_per_assignment=pool_reward_per_assignment,
+                                    pool_tasks=pool_tasks, control_tasks=control_tasks, shards=shards,
+                                    rows_per_shard=rows_per_shard, shard_by=shard_by, partition_by=partition_by,
+                                    allow_defaults=get_recipe_config().get('allow_defaults'),
+                                    open_pool=get_recipe_config().get('open_pool'),
+                                    skip_invalid_items=get_recipe_config().get('skip_invalid_items'),
+                                    chunk_size=chunk_size, concurrency=get_recipe_config().get('concurrency') or 4,
+                                    prefetch=get_recipe_config().get('prefetch') or 0,
+                                    validate=validate, on_rejected=on_rejected, toloka_client=toloka_client)
+finally:
+    # Closed even if the upload fails on invalid rows, to show which rows to fix.
+    if rejected_writer is not None:
+        rejected_writer.close()
+
+output_folder = dataiku.Folder(get_output_names_for_role('output_folder')[0])
+output_folder.write_json(get_recipe_config()['output_manifest_filename'], manifest)
+
+metrics_name = get_output_names_for_role('metrics_dataset')
+if metrics_name:
+    dataiku.Dataset(metrics_name[0]).write_with_schema(get_operation_metrics())
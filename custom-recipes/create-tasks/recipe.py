@@ -6,46 +6,116 @@ import dataiku
 from dataiku.customrecipe import *
 
 import logging
-from toloka.client import TolokaClient
 
-from toloka_dataiku import create_tasks
+from toloka.client import unstructure
+from toloka_dataiku import create_tasks, get_operation_metrics, recipe_profiling, toloka_client_from_config
 
 
 pool_config_folder = dataiku.Folder(get_input_names_for_role('pool_config_folder')[0])
 input_pool_filename = get_recipe_config()['input_pool_filename']
 pool = pool_config_folder.read_json(input_pool_filename)
 
+chunk_size = get_recipe_config().get('chunk_size')
+
+
+def read_tasks(dataset_name):
+    dataset = dataiku.Dataset(dataset_name)
+    if chunk_size:
+        return dataset.iter_dataframes(chunksize=chunk_size)
+    return dataset.get_dataframe()
+
+
 pool_tasks_dataset = get_input_names_for_role('pool_tasks_dataset')
 pool_tasks = None
 if pool_tasks_dataset:
     pool_tasks_dataset = pool_tasks_dataset[0]
-    pool_tasks = dataiku.Dataset(pool_tasks_dataset).get_dataframe()
+    pool_tasks = read_tasks(pool_tasks_dataset)
     
 control_tasks_dataset = get_input_names_for_role('control_tasks_dataset')
 control_tasks = None
 if control_tasks_dataset:
     control_tasks_dataset = control_tasks_dataset[0]
-    control_tasks = dataiku.Dataset(control_tasks_dataset).get_dataframe()
+    control_tasks = read_tasks(control_tasks_dataset)
     
 training_tasks_dataset = get_input_names_for_role('training_tasks_dataset')
 training_tasks = None
 if training_tasks_dataset:
     training_tasks_dataset = training_tasks_dataset[0]
-    training_tasks = dataiku.Dataset(training_tasks_dataset).get_dataframe()
+    training_tasks = read_tasks(training_tasks_dataset)
 
 allow_defaults = get_recipe_config().get('allow_defaults')
 open_pool = get_recipe_config().get('open_pool')
 skip_invalid_items = get_recipe_config().get('skip_invalid_items')
+concurrency = get_recipe_config().get('concurrency') or 1
+prefetch = get_recipe_config().get('prefetch') or 0
 
-environment = get_plugin_config()['environment']
-token = get_plugin_config()['token']
+output_folder = dataiku.Folder(get_output_names_for_role('output_folder')[0])
+output_tasks_filename = get_recipe_config()['output_tasks_filename']
 
-toloka_client = TolokaClient(token, environment)
+# In chunked mode results are written chunk by chunk next to the output file, which keeps validation errors only.
+on_chunk_uploaded = None
+if chunk_size:
+    chunks_path = f'{output_tasks_filename.rsplit(".", 1)[0]}_chunks'
 
-tasks = create_tasks(pool=pool, pool_tasks=pool_tasks, control_tasks=control_tasks, training_tasks=training_tasks, 
-                     allow_defaults=allow_defaults, open_pool=open_pool, skip_invalid_items=skip_invalid_items,
-                     toloka_client=toloka_client)
+    def write_chunk_result(offset, result):
+        output_folder.write_json(f'{chunks_path}/{offset:012d}.json', unstructure(result))
 
-output_folder = dataiku.Folder(get_output_names_for_role('output_folder')[0])
-output_tasks_filename = get_recipe_config()['output_tasks_filename']
-output_folder.write_json(output_tasks_filename, tasks)
\ No newline at end of file
+    on_chunk_uploaded = write_chunk_result
+
+# Accepted chunks are saved to the output folder, so a failed run may be resumed without duplicate tasks.
+committed_chunks = None
+on_chunk_committed = None
+if get_recipe_config().get('resume_upload'):
+    checkpoint_path = get_recipe_config().get('checkpoint_path') or 'tasks_checkpoint'
+    committed_chunks = [output_folder.read_json(path) for path in output_folder.list_paths_in_partition()
+                        if path.lstrip('/').startswith(f'{checkpoint_path}/')]
+
+    def write_checkpoint(chunk):
+        output_folder.write_json(f'{checkpoint_path}/{chunk["offset"]:012d}.json', chunk)
+
+    on_chunk_committed = write_checkpoint
+
+# Rows rejected by validation are written to the optional rejected tasks dataset as they are found,
+# with the columns of all task datasets, their position and their errors.
+validate = get_recipe_config().get('validate_tasks', False)
+rejected_name = get_output_names_for_role('rejected_dataset')
+rejected_writer = None
+on_rejected = None
+if rejected_name:
+    rejected_schema = {}
+    for tasks_dataset in (pool_tasks_dataset, control_tasks_dataset, training_tasks_dataset):
+        if tasks_dataset:
+            for column in dataiku.Dataset(tasks_dataset).read_schema():
+                rejected_schema.setdefault(column['name'], column)
+    rejected_schema['row'] = {'name': 'row', 'type': 'bigint'}
+    rejected_schema['validation_errors'] = {'name': 'validation_errors', 'type': 'string'}
+    rejected_dataset = dataiku.Dataset(rejected_name[0])
+    rejected_dataset.write_schema(list(rejected_schema.values()))
+    rejected_writer = rejected_dataset.get_writer()
+
+    def write_rejected(rejected_df):
+        rejected_writer.write_dataframe(rejected_df.reindex(columns=list(rejected_schema)))
+
+    on_rejected = write_rejected
+
+toloka_client = toloka_client_from_config(get_plugin_config())
+
+# CPU and memory profiling of the run is enabled by the optional profiling folder.
+try:
+    with recipe_profiling('profiling_folder', 'create_tasks'):
+        tasks = create_tasks(pool=pool, pool_tasks=pool_tasks, control_tasks=control_tasks,
+                             training_tasks=training_tasks, allow_defaults=allow_defaults, open_pool=open_pool,
+                             skip_invalid_items=skip_invalid_items, chunk_size=chunk_size, concurrency=concurrency,
+                             prefetch=prefetch, on_chunk_uploaded=on_chunk_uploaded,
+                             committed_chunks=committed_chunks, on_chunk_committed=on_chunk_committed,
+                             validate=validate, on_rejected=on_rejected, toloka_client=toloka_client)
+finally:
+    # Closed even if the upload fails on invalid rows, to show which rows to fix.
+    if rejected_writer is not None:
+        rejected_writer.close()
+
+output_folder.write_json(output_tasks_filename, tasks)
+
+metrics_name = get_output_names_for_role('metrics_dataset')
+if metrics_name:
+    dataiku.Dataset(metrics_name[0]).write_with_schema(get_operation_metrics())
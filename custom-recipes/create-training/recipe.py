@@ -6,9 +6,8 @@ import dataiku
 from dataiku.customrecipe import *
 
 import logging
-from toloka.client import TolokaClient
 
-from toloka_dataiku import create_training
+from toloka_dataiku import create_training, get_operation_metrics, toloka_client_from_config
 
 
 input_folder = dataiku.Folder(get_input_names_for_role('input_folder')[0])
@@ -19,13 +18,14 @@ project_config_folder = dataiku.Folder(get_input_names_for_role('project_config_
 input_project_filename = get_recipe_config().get('input_project_filename')
 project = project_config_folder.read_json(input_project_filename)
 
-environment = get_plugin_config()['environment']
-token = get_plugin_config()['token']
-
-toloka_client = TolokaClient(token, environment)
+toloka_client = toloka_client_from_config(get_plugin_config())
 
 training = create_training(training_config, project=project, toloka_client=toloka_client)
 
 output_folder = dataiku.Folder(get_output_names_for_role('output_folder')[0])
 output_training_filename = get_recipe_config()['output_training_filename']
-output_folder.write_json(output_training_filename, training)
\ No newline at end of file
+output_folder.write_json(output_training_filename, training)
+
+metrics_name = get_output_names_for_role('metrics_dataset')
+if metrics_name:
+    dataiku.Dataset(metrics_name[0]).write_with_schema(get_operation_metrics())
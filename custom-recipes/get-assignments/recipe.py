@@ -4,9 +4,16 @@ import dataiku
 from dataiku.customrecipe import *
 
 import logging
-from toloka.client import TolokaClient
+from contextlib import nullcontext
+from datetime import datetime
+from itertools import chain
 
-from toloka_dataiku import get_assignments_df
+import pandas as pd
+
+from toloka_dataiku import get_assignments_df, iter_assignments_dfs, write_parquet
+from toloka_dataiku import final_assignments, update_assignments_watermark
+from toloka_dataiku import get_shard_assignments_dfs, is_shard_manifest, shard_pools
+from toloka_dataiku import get_operation_metrics, recipe_profiling, toloka_client_from_config
 
 
 input_folder = dataiku.Folder(get_input_names_for_role('input_folder')[0])
@@ -14,13 +21,120 @@ input_config_filename = get_recipe_config()['input_config_filename']
 
 exclude_banned = get_recipe_config()['exclude_banned']
 
-environment = get_plugin_config()['environment']
-token = get_plugin_config()['token']
-
-toloka_client = TolokaClient(token, environment)
+toloka_client = toloka_client_from_config(get_plugin_config())
 
 pool = input_folder.read_json(input_config_filename)
-assignments_df = get_assignments_df(pool=pool, toloka_client=toloka_client, exclude_banned=exclude_banned)
+# A shard manifest of the create-sharded-tasks recipe may be used instead of a pool config.
+manifest = pool if is_shard_manifest(pool) else None
+pools = shard_pools(manifest) if manifest is not None else [pool]
+
+incremental = get_recipe_config().get('incremental')
+# Watermarks by pool ID. A shard manifest keeps them all in one file.
+watermarks = {}
+if incremental:
+    state_folder = dataiku.Folder(get_output_names_for_role('state_folder')[0])
+    watermark_filename = get_recipe_config().get('watermark_filename') or 'assignments_watermark.json'
+    if watermark_filename in [path.lstrip('/') for path in state_folder.list_paths_in_partition()]:
+        state = state_folder.read_json(watermark_filename)
+        watermarks = state if manifest is not None else {pool['id']: state}
+first_run = not watermarks
+new_watermarks = dict(watermarks)
+
+compact_dtypes = get_recipe_config().get('compact_dtypes', False)
+
+
+def lookback(pool):
+    return get_recipe_config().get('incremental_lookback') or pool.get('assignment_max_duration_seconds') or 0
+
+
+def to_write(df):
+    # Active and submitted assignments are downloaded again by the next run, so each assignment is appended once.
+    return final_assignments(df) if incremental else df
+
+
+output_name = get_output_names_for_role('output_dataset')
+output_dataset = dataiku.Dataset(output_name[0]) if output_name else None
+
+# Assignments are also written as Parquet parts to the optional folder, so aggregation recipes
+# read only the columns they need instead of parsing the whole dataset.
+parquet_folder_name = get_output_names_for_role('parquet_folder')
+parquet_folder = dataiku.Folder(parquet_folder_name[0]) if parquet_folder_name else None
+if output_dataset is None and parquet_folder is None:
+    raise ValueError('Either an output dataset or a Parquet folder is required')
+parquet_prefix = f'assignments_{datetime.utcnow().strftime("%Y%m%dT%H%M%S")}'
+if parquet_folder is not None and first_run:
+    parquet_folder.clear()
+
+
+def write_parquet_part(df, part):
+    # Incremental runs add only non-empty parts next to the previous ones.
+    if parquet_folder is not None and (not df.empty or (first_run and part == 0)):
+        write_parquet(df, parquet_folder.upload_data, f'{parquet_prefix}_{part:05d}.parquet')
+
+
+# CPU and memory profiling of the run is enabled by the optional profiling folder.
+with recipe_profiling('profiling_folder', 'get_assignments'):
+    if get_recipe_config().get('streaming'):
+        def iter_pool_chunks():
+            for pool in pools:
+                for chunk in iter_assignments_dfs(pool=pool, toloka_client=toloka_client, exclude_banned=exclude_banned,
+                                                  chunk_size=get_recipe_config().get('chunk_size') or 10000,
+                                                  watermark=watermarks.get(pool['id']), compact_dtypes=compact_dtypes):
+                    yield pool, chunk
+
+        # The watermark of each pool is advanced once, after all its chunks, so it does not pass
+        # active and submitted assignments of earlier chunks. Only the columns it needs are kept.
+        watermark_columns = ['ASSIGNMENT:assignment_id', 'ASSIGNMENT:status', 'ASSIGNMENT:started']
+        downloaded = {pool['id']: [] for pool in pools}
+        chunks = iter_pool_chunks()
+        # The first chunk is always present and carries all the columns, even if there are no assignments.
+        first_chunk = next(chunks)
+        if output_dataset is not None and first_run:
+            output_dataset.write_schema_from_dataframe(first_chunk[1])
+        with output_dataset.get_writer() if output_dataset is not None else nullcontext() as writer:
+            for part, (pool, chunk) in enumerate(chain([first_chunk], chunks)):
+                if incremental:
+                    downloaded[pool['id']].append(chunk[watermark_columns])
+                chunk = to_write(chunk)
+                if writer is not None:
+                    writer.write_dataframe(chunk)
+                write_parquet_part(chunk, part)
+        if incremental:
+            for pool in pools:
+                new_watermarks[pool['id']] = update_assignments_watermark(
+                    pd.concat(downloaded[pool['id']], ignore_index=True), watermarks.get(pool['id']), lookback(pool))
+    else:
+        if manifest is not None:
+            # Pools are downloaded in parallel.
+            pool_dfs = get_shard_assignments_dfs(manifest=manifest, toloka_client=toloka_client,
+                                                 exclude_banned=exclude_banned, watermarks=watermarks,
+                                                 compact_dtypes=compact_dtypes)
+        else:
+            pool_dfs = {pool['id']: get_assignments_df(pool=pool, toloka_client=toloka_client,
+                                                       exclude_banned=exclude_banned,
+                                                       watermark=watermarks.get(pool['id']),
+                                                       compact_dtypes=compact_dtypes)}
+        if incremental:
+            for pool, assignments_df in zip(pools, pool_dfs.values()):
+                new_watermarks[pool['id']] = update_assignments_watermark(assignments_df, watermarks.get(pool['id']),
+                                                                          lookback(pool))
+        pool_dfs = {pool_id: to_write(assignments_df) for pool_id, assignments_df in pool_dfs.items()}
+        if output_dataset is not None:
+            assignments_df = pd.concat(pool_dfs.values(), ignore_index=True) if len(pool_dfs) > 1 else next(
+                iter(pool_dfs.values()))
+            if first_run:
+                output_dataset.write_with_schema(assignments_df)
+            elif not assignments_df.empty:
+                # The output dataset should have "Append instead of overwrite" enabled in the recipe inputs/outputs.
+                output_dataset.write_dataframe(assignments_df)
+        # One Parquet part per pool keeps categories of every pool.
+        for part, (pool, assignments_df) in enumerate(zip(pools, pool_dfs.values())):
+            write_parquet_part(assignments_df, part)
+
+if incremental:
+    state_folder.write_json(watermark_filename,
+                            new_watermarks if manifest is not None else new_watermarks[pools[0]['id']])
 
-output_name  = get_output_names_for_role('output_dataset')[0]
-dataiku.Dataset(output_name).write_with_schema(assignments_df)
\ No newline at end of file
+metrics_name = get_output_names_for_role('metrics_dataset')
+if metrics_name:
+    dataiku.Dataset(metrics_name[0]).write_with_schema(get_operation_metrics())
@@ -4,25 +4,45 @@ import dataiku
 from dataiku.customrecipe import *
 
 import logging
-from toloka.client import TolokaClient
 
-from toloka_dataiku import wait_pool
+from toloka_dataiku import wait_pool, wait_pools, get_operation_metrics, toloka_client_from_config
+from toloka_dataiku import is_shard_manifest, shard_pools, update_shard_pools
 
 
 input_folder = dataiku.Folder(get_input_names_for_role('input_folder')[0])
 input_config_filename = get_recipe_config()['input_config_filename']
 
 check_period = get_recipe_config()['check_period']
+min_check_period = None
+max_check_period = None
+if get_recipe_config().get('adaptive_polling'):
+    min_check_period = get_recipe_config().get('min_check_period') or None
+    max_check_period = get_recipe_config().get('max_check_period') or None
+# 0 waits for pools to close. Otherwise results are released early while pools keep running.
+completion_threshold = get_recipe_config().get('completion_threshold') or None
+min_accepted_assignments = get_recipe_config().get('min_accepted_assignments') or None
 open_pool = get_recipe_config().get('open_pool')
 
-environment = get_plugin_config()['environment']
-token = get_plugin_config()['token']
-
-toloka_client = TolokaClient(token, environment)
+toloka_client = toloka_client_from_config(get_plugin_config())
 
 pool = input_folder.read_json(input_config_filename)
-pool = wait_pool(pool=pool, period=check_period, open_pool=open_pool, toloka_client=toloka_client)
+if is_shard_manifest(pool):
+    # Pools of a shard manifest are waited all together and written back to the manifest.
+    pools = wait_pools(pools=shard_pools(pool), period=check_period, min_period=min_check_period,
+                       max_period=max_check_period, completion_threshold=completion_threshold,
+                       min_accepted_assignments=min_accepted_assignments, open_pools=open_pool,
+                       toloka_client=toloka_client)
+    pool = update_shard_pools(pool, pools)
+else:
+    pool = wait_pool(pool=pool, period=check_period, min_period=min_check_period,
+                     max_period=max_check_period, completion_threshold=completion_threshold,
+                     min_accepted_assignments=min_accepted_assignments, open_pool=open_pool,
+                     toloka_client=toloka_client)
 
 output_folder = dataiku.Folder(get_output_names_for_role('output_folder')[0])
 output_pool_filename = get_recipe_config()['output_pool_config_filename']
-output_folder.write_json(output_pool_filename, pool)
\ No newline at end of file
+output_folder.write_json(output_pool_filename, pool)
+
+metrics_name = get_output_names_for_role('metrics_dataset')
+if metrics_name:
+    dataiku.Dataset(metrics_name[0]).write_with_schema(get_operation_metrics())
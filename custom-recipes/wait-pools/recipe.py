@@ -0,0 +1,45 @@
+# import the classes for accessing DSS objects from the recipe
+import dataiku
+# Import the helpers for custom recipes
+from dataiku.customrecipe import *
+
+import logging
+
+from toloka_dataiku import wait_pools, get_operation_metrics, toloka_client_from_config
+
+
+input_folder = dataiku.Folder(get_input_names_for_role('input_folder')[0])
+pool_config_filenames = get_recipe_config().get('pool_config_filenames') or []
+training_config_filenames = get_recipe_config().get('training_config_filenames') or []
+
+check_period = get_recipe_config()['check_period']
+min_check_period = None
+max_check_period = None
+if get_recipe_config().get('adaptive_polling'):
+    min_check_period = get_recipe_config().get('min_check_period') or None
+    max_check_period = get_recipe_config().get('max_check_period') or None
+# 0 waits for pools to close. Otherwise results are released early while pools keep running.
+completion_threshold = get_recipe_config().get('completion_threshold') or None
+min_accepted_assignments = get_recipe_config().get('min_accepted_assignments') or None
+open_pools = get_recipe_config().get('open_pools')
+# 0 waits for all pools and trainings.
+quorum = get_recipe_config().get('quorum') or None
+concurrency = get_recipe_config().get('concurrency', 8)
+
+toloka_client = toloka_client_from_config(get_plugin_config())
+
+pools = [input_folder.read_json(filename) for filename in pool_config_filenames]
+trainings = [input_folder.read_json(filename) for filename in training_config_filenames]
+objects = wait_pools(pools=pools, trainings=trainings, period=check_period, min_period=min_check_period,
+                     max_period=max_check_period, open_pools=open_pools, quorum=quorum,
+                     completion_threshold=completion_threshold, min_accepted_assignments=min_accepted_assignments,
+                     concurrency=concurrency, toloka_client=toloka_client)
+
+# Pools and trainings are written back under their input file names.
+output_folder = dataiku.Folder(get_output_names_for_role('output_folder')[0])
+for filename, obj in zip(pool_config_filenames + training_config_filenames, objects):
+    output_folder.write_json(filename, obj)
+
+metrics_name = get_output_names_for_role('metrics_dataset')
+if metrics_name:
+    dataiku.Dataset(metrics_name[0]).write_with_schema(get_operation_metrics())
@@ -3,11 +3,54 @@ __all__ = [
     'create_training',
     'create_pool',
     'create_tasks',
+    'create_sharded_tasks',
     'open_pool',
     'open_training',
     'wait_pool',
+    'wait_pools',
     'get_assignments_df',
+    'get_shard_assignments_dfs',
+    'iter_assignments_dfs',
+    'update_assignments_watermark',
+    'final_assignments',
     'aggregate_dawid_skene',
+    'aggregate',
+    'aggregate_pool',
+    'get_operation_metrics',
+    'profiling',
+    'recipe_profiling',
+    'write_parquet',
+    'read_parquet',
+    'read_parquet_folder',
+    'ANSWER_COLUMNS',
+    'shard_pools',
+    'update_shard_pools',
+    'is_shard_manifest',
+    'create_toloka_client',
+    'toloka_client_from_config',
 ]
 
-from .operations import create_project, create_training, create_pool, create_tasks, open_pool, open_training, wait_pool, get_assignments_df, aggregate_dawid_skene
+from ._client import create_toloka_client, toloka_client_from_config
+from ._parquet import ANSWER_COLUMNS, read_parquet, read_parquet_folder, write_parquet
+from ._profiling import profiling, recipe_profiling
+from ._sharding import is_shard_manifest, shard_pools, update_shard_pools
+from .operations import (
+    create_project,
+    create_training,
+    create_pool,
+    create_tasks,
+    create_sharded_tasks,
+    open_pool,
+    open_training,
+    wait_pool,
+    wait_pools,
+    get_assignments_df,
+    get_shard_assignments_dfs,
+    iter_assignments_dfs,
+    update_assignments_watermark,
+    final_assignments,
+    aggregate_dawid_skene,
+    aggregate,
+    aggregate_pool,
+    get_operation_metrics,
+)
@@ -0,0 +1,92 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from functools import partial
+from typing import Callable, Optional
+
+from crowdkit.aggregation import GLAD, MMSR
+from crowdkit.aggregation.base import BaseClassificationAggregator
+
+from ._dawid_skene import fit_dawid_skene
+from ._utils import AnswerCodes
+
+# Aggregators take integer-coded answers and return label codes indexed by task codes.
+Aggregator = Callable[[AnswerCodes], pd.Series]
+
+AGGREGATION_METHODS = ('majority_vote', 'wawa', 'dawid_skene', 'glad', 'mmsr')
+
+
+def _votes(answers: AnswerCodes, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Sums (weighted) votes into a `(task, label)` matrix."""
+    n_tasks, n_labels = len(answers.tasks), len(answers.labels)
+    votes = np.bincount(answers.task * n_labels + answers.label, weights=weights, minlength=n_tasks * n_labels)
+    return votes.reshape(n_tasks, n_labels)
+
+
+def _most_voted(votes: np.ndarray) -> pd.Series:
+    # Ties go to the first label in sorted order, as in crowd-kit.
+    return pd.Series(votes.argmax(axis=1), index=pd.RangeIndex(len(votes), name='task'), name='agg_label')
+
+
+def majority_vote(answers: AnswerCodes) -> pd.Series:
+    return _most_voted(_votes(answers))
+
+
+def wawa(answers: AnswerCodes) -> pd.Series:
+    """Majority vote weighted by each worker's agreement with the plain majority vote."""
+    agreed = answers.label == _votes(answers).argmax(axis=1)[answers.task]
+    n_workers = len(answers.workers)
+    skills = (np.bincount(answers.worker, weights=agreed, minlength=n_workers)
+              / np.bincount(answers.worker, minlength=n_workers))
+    return _most_voted(_votes(answers, weights=skills[answers.worker]))
+
+
+def _fit_crowdkit(model: BaseClassificationAggregator, answers: AnswerCodes) -> pd.Series:
+    predicted = model.fit_predict(answers.to_frame())
+    return pd.Series(answers.labels.get_indexer(predicted.to_numpy()), index=predicted.index.rename('task'),
+                     name='agg_label')
+
+
+def get_aggregator(method: str, n_iter: Optional[int] = None, tol: Optional[float] = None,
+                   n_jobs: int = 1) -> Aggregator:
+    """Returns the aggregator for `method`. Iterative models use their own defaults when `n_iter` or `tol` is None."""
+    params = {name: value for name, value in (('n_iter', n_iter), ('tol', tol)) if value is not None}
+    if method == 'majority_vote':
+        return majority_vote
+    if method == 'wawa':
+        return wawa
+    if method == 'dawid_skene':
+        params = {'n_iter': 20, 'tol': 1e-5, **params}
+        return lambda answers: fit_dawid_skene(answers, params['n_iter'], params['tol'], n_jobs=n_jobs)[0]
+    if method == 'glad':
+        return partial(_fit_crowdkit, GLAD(**params))
+    if method == 'mmsr':
+        return partial(_fit_crowdkit, MMSR(**params))
+    raise ValueError(f'Unknown aggregation method: {method}. Expected one of: {", ".join(AGGREGATION_METHODS)}')
+
+
+def aggregate_codes(answers: AnswerCodes, aggregator: Aggregator) -> pd.Series:
+    """Runs `aggregator` and decodes its result to labels indexed by task keys."""
+    if not len(answers.task):
+        return pd.Series([], index=pd.Index([], name='task'), name='agg_label', dtype=object)
+    return answers.decode(aggregator(answers))
+
+
+def aggregate_cascade(answers: AnswerCodes, aggregator: Aggregator, agreement_threshold: float) -> pd.Series:
+    """
+    Takes the majority vote for tasks where the share of the top label reaches `agreement_threshold`
+    and runs `aggregator` only on answers to the remaining, contested tasks.
+    """
+    if not len(answers.task):
+        return aggregate_codes(answers, aggregator)
+    votes = _votes(answers)
+    agreement = votes.max(axis=1) / votes.sum(axis=1)
+    contested = agreement < agreement_threshold
+    logging.info(f'{contested.sum()} of {len(contested)} tasks are contested')
+
+    agreed = _most_voted(votes)[~contested]
+    predicted = answers.decode(agreed)
+    if contested.any():
+        predicted = pd.concat([predicted, aggregate_codes(answers.subset(contested[answers.task]), aggregator)])
+    return predicted.reindex(answers.tasks.rename('task'))
@@ -0,0 +1,193 @@
+import functools
+import requests
+import threading
+
+from contextlib import nullcontext
+from requests.adapters import HTTPAdapter
+from typing import Any, Dict, Optional, Tuple, Union
+
+from toloka.client import TolokaClient
+from toloka.client.primitives.retry import STATUSES_TO_RETRY, PreloadingHTTPAdapter, TolokaRetry
+from urllib3 import HTTPResponse, PoolManager
+from urllib3.util.retry import Retry
+
+from ._metrics import instrument_session
+from ._rate_limit import RateLimitedPoolManager, RateLimitedRetry, limit_public_calls, shared_rate_limiter
+from ._toloka_internals import wrap_thread_sessions
+
+# Bad gateway responses of a proxy in front of Toloka are worth retrying too.
+_STATUSES_TO_RETRY = sorted(STATUSES_TO_RETRY | {502})
+
+
+class _SharedPoolAdapter(PreloadingHTTPAdapter):
+    """
+    Adapter of one thread's session. Each thread keeps its own retry state, as `TolokaRetry` is not thread-safe,
+    while connections come from a pool manager shared by all threads, so concurrent requests reuse warm connections.
+    Unlike `PreloadingHTTPAdapter`, bodies of requests sent with `stream=True` are left to be read by the caller.
+    """
+
+    def __init__(self, pool_manager: PoolManager, semaphore: Optional[threading.Semaphore], max_retries: Retry):
+        super().__init__(max_retries=max_retries)
+        self.poolmanager = pool_manager
+        self._semaphore = semaphore
+        self._stream = False
+
+    def send(self, request: requests.PreparedRequest, stream: bool = False, **kwargs) -> requests.Response:
+        # The adapter belongs to one thread, so the flag is not shared.
+        self._stream = stream
+        with self._semaphore if self._semaphore is not None else nullcontext():
+            return super().send(request, stream=stream, **kwargs)
+
+    def get_connection(self, *args, **kwargs):
+        # Connection pools are shared, so they are not patched to preload every response.
+        return HTTPAdapter.get_connection(self, *args, **kwargs)
+
+    def build_response(self, req: requests.PreparedRequest, resp: HTTPResponse) -> requests.Response:
+        if self._stream:
+            return HTTPAdapter.build_response(self, req, resp)
+        return super().build_response(req, resp)
+
+    def close(self) -> None:
+        # The shared pool manager is owned by the client.
+        pass
+
+
+def _api_url(environment: Union[TolokaClient.Environment, str, None], url: Optional[str]) -> Optional[str]:
+    """The URL `TolokaClient` resolves, known before it is created."""
+    if url is not None:
+        return url.rstrip('/')
+    if isinstance(environment, str):
+        environment = TolokaClient.Environment[environment.upper()]
+    return environment.value if environment is not None else None
+
+
+class PooledTolokaClient(TolokaClient):
+    """
+    `TolokaClient` whose per-thread sessions share one pool of keep-alive connections
+    and at most `max_concurrent_requests` requests in flight.
+
+    Every request, retries included, goes through the rate limiter shared by all clients of the same account.
+    Connections are shared by threads only with toloka-kit versions whose sessions can be extended,
+    see `_toloka_internals`. Otherwise each public method call waits for the rate limiter once,
+    and retried responses still adapt its rate.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        environment: Union[TolokaClient.Environment, str, None] = None,
+        *,
+        url: Optional[str] = None,
+        pool_maxsize: int = 10,
+        max_concurrent_requests: Optional[int] = None,
+        max_requests_per_second: Optional[float] = None,
+        retries: int = 3,
+        backoff_factor: float = 2.0,
+        timeout: Union[float, Tuple[float, float]] = 10.0,
+    ):
+        self.rate_limiter = shared_rate_limiter(_api_url(environment, url), token, max_requests_per_second)
+        retryer_factory = functools.partial(
+            RateLimitedRetry,
+            limiter=self.rate_limiter,
+            retry_quotas=TolokaRetry.Unit.MIN,
+            total=retries,
+            status_forcelist=_STATUSES_TO_RETRY,
+            allowed_methods=['HEAD', 'GET', 'PUT', 'DELETE', 'OPTIONS', 'TRACE', 'POST', 'PATCH'],
+            backoff_factor=backoff_factor,
+        )
+        super().__init__(token, environment, timeout=timeout, url=url, retryer_factory=retryer_factory)
+        self.pool_maxsize = pool_maxsize
+        self.max_concurrent_requests = max_concurrent_requests
+        # Connections beyond `pool_maxsize` are opened when needed, but are not kept alive.
+        self._pool_manager = RateLimitedPoolManager(self.rate_limiter, num_pools=4, maxsize=pool_maxsize, block=False)
+        self._semaphore = threading.BoundedSemaphore(max_concurrent_requests) if max_concurrent_requests else None
+        if not wrap_thread_sessions(self, self._use_shared_pool):
+            limit_public_calls(self, self.rate_limiter)
+
+    def _use_shared_pool(self, session: requests.Session) -> None:
+        session.mount(self.url, _SharedPoolAdapter(self._pool_manager, self._semaphore, self.retryer_factory()))
+        instrument_session(session)
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_client(token: str, environment: Optional[str], url: Optional[str],
+                   settings: Tuple[Tuple[str, Any], ...]) -> PooledTolokaClient:
+    return PooledTolokaClient(token, environment, url=url, **dict(settings))
+
+
+def create_toloka_client(
+    token: str,
+    environment: Optional[str] = None,
+    *,
+    url: Optional[str] = None,
+    pool_maxsize: int = 10,
+    max_concurrent_requests: Optional[int] = None,
+    max_requests_per_second: Optional[float] = None,
+    retries: int = 3,
+    backoff_factor: float = 2.0,
+    timeout: Union[float, Tuple[float, float]] = 10.0,
+) -> TolokaClient:
+    """
+    Function to get a Toloka client with a shared pool of keep-alive connections and a tuned retry policy.
+
+    Clients are cached by their settings, so operations called with the same settings reuse warm connections.
+    Requests of all clients with the same token share one rate limiter: it lowers the rate when Toloka
+    throttles requests, pauses them for "Retry-After" and raises the rate back gradually.
+    Time spent waiting for it is reported in the `queue_seconds` column of `get_operation_metrics`.
+
+    Args:
+        - token (str): Toloka API token.
+        - environment (str, optional): "PRODUCTION" or "SANDBOX". Either this or `url` should be set.
+        - url (str, optional): Toloka API URL.
+        - pool_maxsize (int): Number of keep-alive connections. Should be at least the upload `concurrency`.
+        - max_concurrent_requests (int, optional): Maximum number of requests in flight from all threads.
+            Not limited by default.
+        - max_requests_per_second (float, optional): Upper limit of the rate shared by all threads.
+            Not limited until the first throttled request by default.
+        - retries (int): Number of retries of connection errors and 408, 429, 5xx responses.
+        - backoff_factor (float): Retry after `backoff_factor * 2 ** (retry - 1)` seconds,
+            unless the response sets "Retry-After".
+        - timeout (float, Tuple[float, float]): Request timeout or (connect, read) timeouts in seconds.
+
+    Returns:
+        - TolokaClient: Client to be passed to operations.
+
+    Example:
+        >>> toloka_client = create_toloka_client(token, 'PRODUCTION', pool_maxsize=16, max_concurrent_requests=8)
+        ...
+    """
+    settings = {
+        'pool_maxsize': pool_maxsize,
+        'max_concurrent_requests': max_concurrent_requests,
+        'max_requests_per_second': max_requests_per_second,
+        'retries': retries,
+        'backoff_factor': backoff_factor,
+        'timeout': tuple(timeout) if isinstance(timeout, list) else timeout,
+    }
+    return _cached_client(token, environment, url, tuple(sorted(settings.items())))
+
+
+def toloka_client_from_config(plugin_config: Dict[str, Any]) -> TolokaClient:
+    """
+    Function to get a Toloka client configured by the plugin settings.
+
+    Args:
+        - plugin_config (Dict): Plugin settings, e.g. `dataiku.customrecipe.get_plugin_config()`.
+
+    Returns:
+        - TolokaClient: Client to be passed to operations.
+
+    Example:
+        >>> toloka_client = toloka_client_from_config(get_plugin_config())
+        ...
+    """
+    return create_toloka_client(
+        plugin_config['token'],
+        plugin_config['environment'],
+        pool_maxsize=plugin_config.get('pool_maxsize') or 10,
+        max_concurrent_requests=plugin_config.get('max_concurrent_requests') or None,
+        max_requests_per_second=plugin_config.get('max_requests_per_second') or None,
+        retries=plugin_config.get('retries', 3),
+        backoff_factor=plugin_config.get('backoff_factor', 2.0),
+        timeout=(plugin_config.get('connect_timeout') or 10.0, plugin_config.get('read_timeout') or 10.0),
+    )
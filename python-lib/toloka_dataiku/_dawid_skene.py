@@ -0,0 +1,151 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+
+from ._utils import AnswerCodes
+
+# Same lower bound for confusion matrix entries as in crowd-kit.
+_EPS = 1e-10
+
+
+def _majority_vote_probas(answers: AnswerCodes, n_tasks: int, n_labels: int) -> np.ndarray:
+    votes = np.bincount(answers.task * n_labels + answers.label, minlength=n_tasks * n_labels)
+    votes = votes.reshape(n_tasks, n_labels).astype(float)
+    return votes / votes.sum(axis=1, keepdims=True)
+
+
+def _m_step(answers: AnswerCodes, probas: np.ndarray, n_workers: int) -> np.ndarray:
+    """Estimates `errors[worker, label, true_label]`, normalized over labels each worker has given."""
+    n_labels = probas.shape[1]
+    index = answers.worker * n_labels + answers.label
+    answer_probas = probas[answers.task]
+    errors = np.stack([
+        np.bincount(index, weights=answer_probas[:, true_label], minlength=n_workers * n_labels)
+        for true_label in range(n_labels)
+    ], axis=1).reshape(n_workers, n_labels, n_labels)
+    given = (np.bincount(index, minlength=n_workers * n_labels) > 0).reshape(n_workers, n_labels)
+    errors = np.where(given[:, :, None], np.maximum(errors, _EPS), 0.0)
+    return errors / errors.sum(axis=1, keepdims=True)
+
+
+def _answer_log_errors(answers: AnswerCodes, errors: np.ndarray) -> np.ndarray:
+    return np.log(errors[answers.worker, answers.label])
+
+
+def _task_blocks(task: np.ndarray, n_tasks: int, n_blocks: int) -> List[Tuple[int, int, np.ndarray]]:
+    """Splits answers sorted by task into `(first_answer, end_answer, task_starts)` blocks of whole tasks."""
+    task_starts = np.searchsorted(task, np.arange(n_tasks))
+    bounds = np.linspace(0, n_tasks, min(n_blocks, n_tasks) + 1).astype(int)
+    blocks = []
+    for first_task, end_task in zip(bounds[:-1], bounds[1:]):
+        first_answer = task_starts[first_task]
+        end_answer = task_starts[end_task] if end_task < n_tasks else len(task)
+        blocks.append((first_answer, end_answer, task_starts[first_task:end_task] - first_answer))
+    return blocks
+
+
+def _e_step(
+    priors: np.ndarray,
+    log_errors: np.ndarray,
+    blocks: List[Tuple[int, int, np.ndarray]],
+    executor: Optional[ThreadPoolExecutor] = None,
+) -> np.ndarray:
+    def _task_log_likelihoods(block: Tuple[int, int, np.ndarray]) -> np.ndarray:
+        first_answer, end_answer, task_starts = block
+        return np.add.reduceat(log_errors[first_answer:end_answer], task_starts, axis=0)
+
+    # NumPy releases the GIL in `reduceat`, so blocks of tasks are summed in parallel by threads.
+    sums = executor.map(_task_log_likelihoods, blocks) if executor is not None else map(_task_log_likelihoods, blocks)
+    log_likelihoods = np.log(priors) + np.concatenate(list(sums))
+    scaled_likelihoods = np.exp(log_likelihoods - log_likelihoods.max(axis=1, keepdims=True))
+    return scaled_likelihoods / scaled_likelihoods.sum(axis=1, keepdims=True)
+
+
+def _evidence_lower_bound(answers: AnswerCodes, probas: np.ndarray, priors: np.ndarray, errors: np.ndarray) -> float:
+    answer_probas = probas[answers.task]
+    joint_expectation = (answer_probas * (_answer_log_errors(answers, errors) + np.log(priors))).sum()
+    entropy = -(probas * np.log(probas, out=np.zeros_like(probas), where=probas > 0)).sum()
+    return (joint_expectation + entropy) / len(answers.task)
+
+
+def _warm_start(
+    answers: AnswerCodes,
+    state: Dict[str, Any],
+    priors: np.ndarray,
+    errors: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    labels = answers.labels.tolist()
+    if sorted(map(str, state['labels'])) != sorted(map(str, labels)):
+        logging.warning('Dawid-Skene state was fitted for other labels, starting from scratch')
+        return priors, errors
+
+    # State matrices may list labels in another order.
+    order = [list(map(str, state['labels'])).index(str(label)) for label in labels]
+    priors = np.asarray(state['priors'], dtype=float)[order]
+    given = errors > 0
+    for code, worker in enumerate(answers.workers):
+        worker_errors = state['workers'].get(str(worker))
+        if worker_errors is not None:
+            errors[code] = np.asarray(worker_errors, dtype=float)[np.ix_(order, order)]
+    errors = np.where(given, np.maximum(errors, _EPS), 0.0)
+    return priors, errors / errors.sum(axis=1, keepdims=True)
+
+
+def fit_dawid_skene(
+    answers: AnswerCodes,
+    n_iter: int,
+    tol: float,
+    state: Optional[Dict[str, Any]] = None,
+    n_jobs: int = 1,
+) -> Tuple[pd.Series, Dict[str, Any]]:
+    """
+    Fits Dawid-Skene on integer-coded answers with the same EM steps as crowd-kit `DawidSkene`.
+
+    Answers are sorted by task once, so the E-step is a segmented sum over contiguous answers,
+    split between `n_jobs` threads. The M-step accumulates confusion matrices with `np.bincount`.
+
+    If `state` of a previous fit is given, class priors and confusion matrices of known workers are taken from it
+    instead of the majority vote estimate, so EM usually converges in a few iterations.
+
+    Returns label codes indexed by task codes and the new JSON-serializable state.
+    Without answers nothing is predicted and the given state is returned as is.
+    """
+    if not len(answers.task):
+        predicted = pd.Series([], index=pd.Index([], dtype=np.int64, name='task'), name='agg_label', dtype=np.int64)
+        return predicted, state or {'labels': [], 'priors': [], 'workers': {}}
+
+    n_tasks, n_workers, n_labels = len(answers.tasks), len(answers.workers), len(answers.labels)
+    tasks = pd.unique(answers.task)
+    by_task = np.argsort(answers.task, kind='stable')
+    answers = answers._replace(task=answers.task[by_task], worker=answers.worker[by_task], label=answers.label[by_task])
+    blocks = _task_blocks(answers.task, n_tasks, n_jobs)
+
+    probas = _majority_vote_probas(answers, n_tasks, n_labels)
+    priors = probas.mean(axis=0)
+    errors = _m_step(answers, probas, n_workers)
+    if state:
+        priors, errors = _warm_start(answers, state, priors, errors)
+
+    loss = -np.inf
+    iteration = -1
+    with ThreadPoolExecutor(max_workers=n_jobs) if n_jobs > 1 else nullcontext() as executor:
+        for iteration in range(n_iter):
+            probas = _e_step(priors, _answer_log_errors(answers, errors), blocks, executor)
+            priors = probas.mean(axis=0)
+            errors = _m_step(answers, probas, n_workers)
+            new_loss = _evidence_lower_bound(answers, probas, priors, errors)
+            if new_loss - loss < tol:
+                break
+            loss = new_loss
+    logging.info(f'Dawid-Skene stopped after {iteration + 1} iterations')
+
+    workers = dict(state['workers']) if state else {}
+    workers.update((str(worker), worker_errors.tolist()) for worker, worker_errors in zip(answers.workers, errors))
+    new_state = {'labels': answers.labels.tolist(), 'priors': priors.tolist(), 'workers': workers}
+
+    predicted = pd.Series(probas[tasks].argmax(axis=1), index=pd.Index(tasks, name='task'), name='agg_label')
+    return predicted, new_state
@@ -0,0 +1,177 @@
+import json
+import pandas as pd
+import requests
+import threading
+import time
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from toloka.client import TolokaClient
+
+from ._toloka_internals import wrap_thread_sessions
+
+METRICS_COLUMNS = [
+    'operation', 'started_at', 'wall_seconds', 'http_seconds', 'requests', 'request_bytes', 'response_bytes',
+    'retries', 'queue_seconds', 'throttled', 'rows', 'phases', 'error',
+]
+
+# Metrics of the latest operations, oldest first.
+_RECORDED: Deque[Dict[str, Any]] = deque(maxlen=10000)
+
+_current_metrics: ContextVar[Optional['OperationMetrics']] = ContextVar('toloka_dataiku_metrics', default=None)
+
+
+class OperationMetrics:
+    """Counters of one operation call. Updated from every thread the operation runs requests in."""
+
+    def __init__(self, operation: str) -> None:
+        self.operation = operation
+        self.started_at = datetime.utcnow()
+        self.http_seconds = 0.0
+        self.requests = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.retries = 0
+        self.queue_seconds = 0.0
+        self.throttled = 0
+        self.rows = 0
+        self.phases: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, **counters: float) -> None:
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def add_phase(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def record(self, error: Optional[BaseException] = None) -> None:
+        _RECORDED.append({
+            'operation': self.operation,
+            'started_at': self.started_at.isoformat(),
+            'wall_seconds': time.perf_counter() - self._start,
+            'http_seconds': self.http_seconds,
+            'requests': self.requests,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'retries': self.retries,
+            'queue_seconds': self.queue_seconds,
+            'throttled': self.throttled,
+            'rows': self.rows,
+            'phases': json.dumps({name: round(seconds, 6) for name, seconds in self.phases.items()}),
+            'error': type(error).__name__ if error is not None else None,
+        })
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Adds the wall time of the block to the `name` phase of the current operation."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            metrics.add_phase(name, time.perf_counter() - start)
+
+
+def count_rows(rows: int) -> None:
+    """Adds `rows` to the number of rows processed by the current operation."""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.add(rows=rows)
+
+
+def count_queue_wait(seconds: float, throttled: bool = False) -> None:
+    """Adds time a request waited for the rate limiter and whether it was throttled to the current operation."""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.add(queue_seconds=seconds, throttled=int(throttled))
+
+
+def _record_response(response: requests.Response, *args, **kwargs) -> None:
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return
+    body = response.request.body or b''
+    retries = getattr(response.raw, 'retries', None)
+    # Toloka responses are read as a whole anyway, so reading content here costs nothing extra.
+    # Streamed ones are counted by their declared length, as reading them here would load them in memory.
+    response_bytes = int(response.headers.get('Content-Length', 0)) if kwargs.get('stream') else len(response.content)
+    metrics.add(
+        requests=1,
+        http_seconds=response.elapsed.total_seconds(),
+        request_bytes=len(body.encode() if isinstance(body, str) else body),
+        response_bytes=response_bytes,
+        retries=len(retries.history) if retries is not None else 0,
+    )
+
+
+def instrument_session(session: requests.Session) -> None:
+    if _record_response not in session.hooks['response']:
+        session.hooks['response'].append(_record_response)
+
+
+def instrument_client(toloka_client: TolokaClient) -> None:
+    """Makes every per-thread session of `toloka_client` report requests to the current operation."""
+    if getattr(toloka_client, '_toloka_dataiku_instrumented', False):
+        return
+    wrap_thread_sessions(toloka_client, instrument_session)
+    toloka_client._toloka_dataiku_instrumented = True
+
+
+def _record_when_exhausted(iterator: Iterator[Any], metrics: OperationMetrics) -> Iterator[Any]:
+    error = None
+    try:
+        yield from iterator
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        metrics.record(error)
+
+
+def instrumented(func: Callable) -> Callable:
+    """
+    Records wall time, phases, HTTP requests and processed rows of every call of an operation.
+
+    Operations returning iterators are recorded once the iterator is exhausted.
+    """
+    @wraps(func)
+    def _wrapper(*args, **kwargs) -> Any:
+        if _current_metrics.get() is not None:
+            # Nested operations are accounted to the outermost one.
+            return func(*args, **kwargs)
+        if isinstance(kwargs.get('toloka_client'), TolokaClient):
+            instrument_client(kwargs['toloka_client'])
+
+        metrics = OperationMetrics(func.__name__)
+        token = _current_metrics.set(metrics)
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            metrics.record(e)
+            raise
+        finally:
+            _current_metrics.reset(token)
+        if isinstance(result, Iterator):
+            return _record_when_exhausted(result, metrics)
+        metrics.record()
+        return result
+
+    return _wrapper
+
+
+def recorded_metrics(clear: bool = False) -> pd.DataFrame:
+    metrics_df = pd.DataFrame(list(_RECORDED), columns=METRICS_COLUMNS)
+    if clear:
+        _RECORDED.clear()
+    return metrics_df
@@ -0,0 +1,140 @@
+import io
+import os
+
+from typing import Any, Callable, Iterable, List, Optional, Union
+
+import pandas as pd
+
+# Columns aggregation needs from assignments: task inputs, answers and workers.
+# Names ending with ":" are prefixes.
+ANSWER_COLUMNS = ['INPUT:', 'OUTPUT:', 'ASSIGNMENT:worker_id']
+
+
+def _select_columns(names: List[str], columns: Optional[Iterable[str]]) -> List[str]:
+    if columns is None:
+        return names
+    columns = list(columns)
+    return [
+        name for name in names
+        if any(name == column or (column.endswith(':') and name.startswith(column)) for column in columns)
+    ]
+
+
+def _decode_mixed_dictionaries(tables: list) -> list:
+    """Decodes columns that are dictionary-encoded in some tables only, e.g. categorical in some chunks only."""
+    import pyarrow as pa
+
+    types = {}
+    for table in tables:
+        for field in table.schema:
+            types.setdefault(field.name, set()).add(field.type)
+    mixed = {
+        name for name, name_types in types.items()
+        if len(name_types) > 1 and any(pa.types.is_dictionary(type_) for type_ in name_types)
+    }
+    if not mixed:
+        return tables
+
+    decoded = []
+    for table in tables:
+        for i, field in enumerate(table.schema):
+            if field.name in mixed and pa.types.is_dictionary(field.type):
+                table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+        decoded.append(table)
+    return decoded
+
+
+def write_parquet(df: pd.DataFrame, write: Callable[[str, bytes], None], path: str) -> None:
+    """
+    Function to write a DataFrame as a Parquet file, e.g. to a managed folder.
+
+    Categorical columns are stored dictionary-encoded and are read back by `read_parquet` as categories,
+    so assignments with `compact_dtypes` keep their compact form on the way to aggregation.
+
+    Args:
+        - df (DataFrame): DataFrame to write. The index is not written.
+        - write (Callable[[str, bytes], None]): Called with the file path and its content,
+            e.g. `dataiku.Folder(...).upload_data`.
+        - path (str): File path, passed to `write`.
+
+    Example:
+        >>> write_parquet(assignments_df, folder.upload_data, 'assignments.parquet')
+    """
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, engine='pyarrow', index=False)
+    write(path, buffer.getvalue())
+
+
+def read_parquet(sources: Iterable[Union[str, bytes]], columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Function to read Parquet files into one DataFrame, reading only the needed columns.
+
+    Local files are memory-mapped, so only the pages of the selected columns are read from disk.
+    Dictionary-encoded columns are read as categories, unless some files store them as plain values.
+
+    Args:
+        - sources (Iterable[Union[str, bytes]]): Local file paths or file contents, e.g. downloaded from
+            a managed folder that is not stored on the local filesystem.
+        - columns (Optional[Iterable[str]]): Column names to read. Names ending with ":" select all columns
+            with this prefix, e.g. `ANSWER_COLUMNS` are the columns needed by aggregation. All columns if None.
+
+    Returns:
+        DataFrame: Rows of all files in the order of `sources`.
+
+    Example:
+        >>> answers_df = read_parquet(glob.glob('assignments/*.parquet'), columns=ANSWER_COLUMNS)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tables = []
+    for source in sources:
+        parquet_file = pq.ParquetFile(source if isinstance(source, str) else pa.BufferReader(source),
+                                      memory_map=True)
+        tables.append(parquet_file.read(columns=_select_columns(parquet_file.schema_arrow.names, columns)))
+    if not tables:
+        raise ValueError('No Parquet files to read')
+
+    # Empty files, e.g. the first chunk of an empty incremental download, may have null-typed columns.
+    tables = _decode_mixed_dictionaries([table for table in tables if table.num_rows] or tables[:1])
+    try:
+        # Dictionary index widths and integer types may differ between files.
+        table = pa.concat_tables(tables, promote_options='permissive')
+    except TypeError:
+        # pyarrow < 14
+        table = pa.concat_tables(tables, promote=True)
+    return table.to_pandas()
+
+
+def read_parquet_folder(folder: Any, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Function to read all Parquet files of a managed folder into one DataFrame, reading only the needed columns.
+
+    Files of folders on the local filesystem are memory-mapped, files of other folders are downloaded.
+
+    Args:
+        - folder (dataiku.Folder): Managed folder, e.g. written by the get-assignments recipe.
+        - columns (Optional[Iterable[str]]): Column names to read, as in `read_parquet`. All columns if None.
+
+    Returns:
+        DataFrame: Rows of all files in the order of their paths.
+
+    Example:
+        >>> answers_df = read_parquet_folder(dataiku.Folder('assignments'), columns=ANSWER_COLUMNS)
+    """
+    paths = sorted(path for path in folder.list_paths_in_partition() if path.endswith('.parquet'))
+    try:
+        folder_path = folder.get_path()
+    except Exception:
+        # DSS raises a plain Exception for folders that are not on the local filesystem
+        # and for recipes running in containers.
+        folder_path = None
+
+    if folder_path is not None:
+        sources = [os.path.join(folder_path, path.lstrip('/')) for path in paths]
+    else:
+        sources = []
+        for path in paths:
+            with folder.get_download_stream(path) as stream:
+                sources.append(stream.read())
+    return read_parquet(sources, columns=columns)
@@ -0,0 +1,140 @@
+import cProfile
+import io
+import linecache
+import logging
+import marshal
+import pstats
+import threading
+import tracemalloc
+
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Any, Callable, ContextManager, Iterator, List
+
+# Allocations made by the profilers themselves.
+_IGNORED_FILES = [tracemalloc.__file__, cProfile.__file__, linecache.__file__, '<frozen importlib._bootstrap>',
+                  '<unknown>']
+
+
+def _memory_report(before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, peak: int, top_n: int) -> str:
+    filters = [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES]
+    before, after = before.filter_traces(filters), after.filter_traces(filters)
+    lines: List[str] = [f'Peak traced memory: {peak / 2 ** 20:.1f} MiB', '']
+
+    lines.append(f'Top {top_n} allocation sites by memory still allocated at the end:')
+    for stat in after.compare_to(before, 'lineno')[:top_n]:
+        lines.append(str(stat))
+    lines.append('')
+
+    lines.append(f'Top {top_n} allocation tracebacks by memory still allocated at the end:')
+    for stat in after.compare_to(before, 'traceback')[:top_n]:
+        lines.append(f'{stat.size_diff / 1024:.1f} KiB in {stat.count_diff} blocks')
+        lines.extend(f'    {line}' for line in stat.traceback.format())
+    return '\n'.join(lines) + '\n'
+
+
+class _ThreadProfilers:
+    """Starts a `cProfile` profiler in every thread on its first call, as one profiler sees its own thread only."""
+
+    def __init__(self) -> None:
+        self.profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, frame: Any, event: str, arg: Any) -> None:
+        profiler = cProfile.Profile()
+        try:
+            # Replaces this hook in the current thread.
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler, which already sees all threads.
+            threading.setprofile(None)
+            return
+        with self._lock:
+            self.profilers.append(profiler)
+
+
+@contextmanager
+def profiling(
+    write: Callable[[str, bytes], None],
+    name: str = 'profile',
+    *,
+    top_n: int = 30,
+    nframes: int = 10,
+) -> Iterator[None]:
+    """
+    Context manager to profile CPU time with `cProfile` and allocations with `tracemalloc` inside the block.
+
+    Writes three files with the `name` prefix and a timestamp: a `.pstats` file for `pstats` or snakeviz,
+    a `_cpu.txt` report with top functions by cumulative time and a `_memory.txt` report
+    with the peak traced memory and top allocation sites. Files are written even if the block fails.
+
+    Threads started inside the block, e.g. by `concurrency` or `prefetch`, are profiled by their own profilers
+    and their CPU time is merged into the reports. Threads started before the block are not profiled.
+    Allocations are traced in all threads.
+
+    Args:
+        - write (Callable[[str, bytes], None]): Called with a file path and its content,
+            e.g. `dataiku.Folder(...).upload_data`.
+        - name (str): File name prefix.
+        - top_n (int): Number of entries in the text reports.
+        - nframes (int): Number of frames kept in allocation tracebacks. More frames make tracking slower.
+
+    Example:
+        >>> with profiling(folder.upload_data, 'create_tasks'):
+        ...     create_tasks(pool_id=pool_id, pool_tasks=tasks_df, toloka_client=toloka_client)
+    """
+    prefix = f'{name}_{datetime.utcnow().strftime("%Y%m%dT%H%M%S")}'
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(nframes)
+    if hasattr(tracemalloc, 'reset_peak'):
+        # Python 3.9+, otherwise the peak may include allocations made before the block.
+        tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    thread_profilers = _ThreadProfilers()
+    threading.setprofile(thread_profilers)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        threading.setprofile(None)
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        if not was_tracing:
+            tracemalloc.stop()
+
+        cpu_report = io.StringIO()
+        stats = pstats.Stats(profiler, *thread_profilers.profilers, stream=cpu_report)
+        # Same format as `Profile.dump_stats`.
+        write(f'{prefix}.pstats', marshal.dumps(stats.stats))
+        stats.sort_stats('cumulative').print_stats(top_n)
+        write(f'{prefix}_cpu.txt', cpu_report.getvalue().encode())
+        write(f'{prefix}_memory.txt', _memory_report(before, after, peak, top_n).encode())
+        logging.info(f'Profiling reports are written with the {prefix} prefix')
+
+
+def recipe_profiling(role: str, name: str) -> ContextManager[None]:
+    """
+    Function to profile a recipe run if its optional profiling folder output is set, see `profiling`.
+
+    Args:
+        - role (str): Output role of the profiling folder.
+        - name (str): File name prefix.
+
+    Returns:
+        - ContextManager: `profiling` writing to the folder, or a context manager doing nothing.
+
+    Example:
+        >>> with recipe_profiling('profiling_folder', 'create_tasks'):
+        ...     create_tasks(pool_id=pool_id, pool_tasks=tasks_df, toloka_client=toloka_client)
+    """
+    # Imported here, so the library does not need DSS outside of recipes.
+    import dataiku
+    from dataiku.customrecipe import get_output_names_for_role
+
+    folder_names = get_output_names_for_role(role)
+    if not folder_names:
+        return nullcontext()
+    return profiling(dataiku.Folder(folder_names[0]).upload_data, name)
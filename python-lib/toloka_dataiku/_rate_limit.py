@@ -0,0 +1,204 @@
+import inspect
+import logging
+import threading
+import time
+
+from collections import deque
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from toloka.client import TolokaClient
+from toloka.client.primitives.retry import TolokaRetry
+from urllib3 import HTTPResponse, PoolManager
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
+
+from ._metrics import count_queue_wait
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all threads sending requests to one Toloka account.
+
+    The rate follows additive increase / multiplicative decrease: every throttled (429) response multiplies it
+    by `decrease` at most once per `cooldown` seconds, as requests in flight are throttled together.
+    Successful responses raise it by about `increase` requests per second each second,
+    up to `max_rate`. "Retry-After" of a throttled response pauses all requests.
+    Without `max_rate` requests are not limited until the first throttled response,
+    which sets the rate to a share of the throughput observed during the last `window` seconds.
+    """
+
+    def __init__(
+        self,
+        max_rate: Optional[float] = None,
+        *,
+        min_rate: float = 0.1,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        window: float = 5.0,
+        cooldown: float = 1.0,
+    ) -> None:
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.cooldown = cooldown
+        self._rate = max_rate
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._decreased_at = float('-inf')
+        self._paused_until = 0.0
+        self._sent: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> Optional[float]:
+        """Current rate in requests per second. None if requests are not limited."""
+        return self._rate
+
+    def _refill(self, now: float) -> None:
+        if self._rate is not None:
+            # At most one second of requests may be sent at once.
+            self._tokens = min(max(self._rate, 1.0), self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Waits for a turn to send a request. Returns the time waited in seconds."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(self._paused_until - now, 0.0)
+            if self._rate is not None:
+                # Tokens are reserved in advance, so a negative balance is the queue ahead of this request.
+                self._tokens -= 1
+                wait = max(wait, -self._tokens / self._rate)
+            self._sent.append(now + wait)
+            while self._sent and self._sent[0] < now - self.window:
+                self._sent.popleft()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def observe(self, status: int, retry_after: Optional[float] = None) -> None:
+        """Adapts the rate to a response status."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if status == 429:
+                self._tokens = min(self._tokens, 0.0)
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+                if now - self._decreased_at < self.cooldown:
+                    return
+                if self._rate is None:
+                    # Right after the start fewer than `window` seconds of requests are known.
+                    throughput = len(self._sent) / min(self.window, max(now - self._sent[0], 1.0))
+                    self._rate = max(self.min_rate, throughput * self.decrease)
+                else:
+                    self._rate = max(self.min_rate, self._rate * self.decrease)
+                self._decreased_at = now
+                logging.warning(f'Toloka API throttled requests, slowing down to {self._rate:.2f} requests/s'
+                                + (f' after a {retry_after:.0f}s pause' if retry_after else ''))
+            elif status < 500 and self._rate is not None:
+                self._rate += self.increase / self._rate
+                if self.max_rate is not None:
+                    self._rate = min(self._rate, self.max_rate)
+
+
+def _observe(limiter: RateLimiter, response: HTTPResponse, retry_after: Optional[float]) -> None:
+    # The same response may reach both `RateLimitedRetry.increment` and `urlopen` of a pool.
+    if getattr(response, '_toloka_dataiku_observed', False):
+        return
+    response._toloka_dataiku_observed = True
+    if response.status == 429:
+        count_queue_wait(0.0, throttled=True)
+    limiter.observe(response.status, retry_after)
+
+
+class RateLimitedRetry(TolokaRetry):
+    """`TolokaRetry` reporting responses it retries to `limiter`, as retries happen inside one `urlopen` call."""
+
+    def __init__(self, *args, limiter: Optional[RateLimiter] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter
+
+    def new(self, **kwargs) -> Retry:
+        retry = super().new(**kwargs)
+        retry.limiter = self.limiter
+        return retry
+
+    def increment(self, *args, **kwargs) -> Retry:
+        try:
+            return super().increment(*args, **kwargs)
+        finally:
+            response = kwargs.get('response')
+            if self.limiter is not None and response is not None:
+                # Also reads the quota interval of Toloka throttled responses without "Retry-After".
+                _observe(self.limiter, response, self.get_retry_after(response))
+
+
+def _retry_after(response: HTTPResponse) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return Retry().parse_retry_after(value)
+    except InvalidHeader:
+        return None
+
+
+def _limit_urlopen(urlopen: Callable[..., HTTPResponse], limiter: RateLimiter) -> Callable[..., HTTPResponse]:
+    @wraps(urlopen)
+    def wrapper(*args, **kwargs) -> HTTPResponse:
+        # Retries call `urlopen` recursively, so each attempt waits for its turn.
+        count_queue_wait(limiter.acquire())
+        response = urlopen(*args, **kwargs)
+        _observe(limiter, response, _retry_after(response))
+        return response
+
+    return wrapper
+
+
+def limit_public_calls(toloka_client: TolokaClient, limiter: RateLimiter) -> None:
+    """
+    Makes every public method call of `toloka_client` wait for its turn. It is a coarser fallback for clients
+    whose connection pools can not be replaced: a call counts as one request, whatever the requests it sends.
+    """
+    for name, method in inspect.getmembers(TolokaClient, inspect.isfunction):
+        if not name.startswith('_'):
+            setattr(toloka_client, name, _limit_call(getattr(toloka_client, name), limiter))
+
+
+def _limit_call(method: Callable[..., Any], limiter: RateLimiter) -> Callable[..., Any]:
+    @wraps(method)
+    def wrapper(*args, **kwargs) -> Any:
+        count_queue_wait(limiter.acquire())
+        return method(*args, **kwargs)
+
+    return wrapper
+
+
+class RateLimitedPoolManager(PoolManager):
+    """Pool manager whose connection pools send every request, retries included, through `limiter`."""
+
+    def __init__(self, limiter: RateLimiter, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.limiter = limiter
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context=request_context)
+        pool.urlopen = _limit_urlopen(pool.urlopen, self.limiter)
+        return pool
+
+
+_LIMITERS: Dict[Tuple[str, str], RateLimiter] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def shared_rate_limiter(url: str, token: str, max_rate: Optional[float] = None) -> RateLimiter:
+    """Returns the rate limiter of the Toloka account. Settings of the first call are kept."""
+    with _LIMITERS_LOCK:
+        if (url, token) not in _LIMITERS:
+            _LIMITERS[url, token] = RateLimiter(max_rate)
+        return _LIMITERS[url, token]
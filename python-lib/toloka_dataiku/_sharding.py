@@ -0,0 +1,116 @@
+import math
+import numpy as np
+import pandas as pd
+
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+
+class ShardPlan(NamedTuple):
+    """How task rows are spread across pools: by a hash modulo the number of shards or by values of a column."""
+    shards: int
+    shard_by: Optional[List[str]] = None
+    partition_by: Optional[str] = None
+    keys: Optional[List[Any]] = None
+
+    def assign(self, rows: pd.DataFrame) -> np.ndarray:
+        """
+        Shard number of every row. The same rows get the same shards whatever the chunk they are read in.
+        Values are hashed as strings, so the shards do not depend on whether a column was read as numbers or strings.
+        """
+        if self.partition_by is not None:
+            codes = pd.Categorical(rows[self.partition_by], categories=self.keys).codes
+            if (codes < 0).any():
+                raise ValueError(f'Column {self.partition_by} has missing or unexpected values')
+            return codes.astype(np.int64)
+        columns = self.shard_by or [column for column in rows.columns if column.startswith('INPUT:')]
+        if not columns:
+            raise ValueError('No INPUT: columns to shard tasks by, set shard_by')
+        hashes = pd.util.hash_pandas_object(rows[columns].astype(str), index=False).to_numpy()
+        return (hashes % np.uint64(self.shards)).astype(np.int64)
+
+
+def plan_shards(
+    tasks: Union[pd.DataFrame, Any],
+    shards: Optional[int] = None,
+    rows_per_shard: Optional[int] = None,
+    shard_by: Optional[Union[str, List[str]]] = None,
+    partition_by: Optional[str] = None,
+) -> ShardPlan:
+    """Chooses the number of shards from exactly one of `shards`, `rows_per_shard` and `partition_by`."""
+    if sum(option is not None for option in (shards, rows_per_shard, partition_by)) != 1:
+        raise ValueError('Exactly one of shards, rows_per_shard or partition_by should be set')
+    if isinstance(shard_by, str):
+        shard_by = [shard_by]
+    if shards is not None:
+        if shards < 1:
+            raise ValueError(f'shards should be positive, got {shards}')
+        return ShardPlan(shards, shard_by)
+
+    if not isinstance(tasks, pd.DataFrame):
+        raise ValueError('rows_per_shard and partition_by need all tasks as one DataFrame, set shards instead')
+    if rows_per_shard is not None:
+        if rows_per_shard < 1:
+            raise ValueError(f'rows_per_shard should be positive, got {rows_per_shard}')
+        return ShardPlan(max(1, math.ceil(len(tasks) / rows_per_shard)), shard_by)
+
+    if tasks[partition_by].isna().any():
+        raise ValueError(f'Column {partition_by} has missing values')
+    keys = sorted(pd.unique(tasks[partition_by]).tolist(), key=str)
+    return ShardPlan(max(1, len(keys)), partition_by=partition_by, keys=keys)
+
+
+def shard_name(name: Optional[str], shard: int, shards: int, key: Any = None) -> str:
+    suffix = f'shard {shard + 1}/{shards}' if key is None else f'shard {key}'
+    return f'{name} ({suffix})' if name else suffix
+
+
+def is_shard_manifest(obj: Any) -> bool:
+    """
+    Function to tell a shard manifest written by `create_sharded_tasks` from a pool config.
+
+    Args:
+        - obj (Any): Config read from a file.
+
+    Returns:
+        - bool: Whether `obj` is a shard manifest.
+
+    Example:
+        >>> pools = shard_pools(config) if is_shard_manifest(config) else [config]
+        ...
+    """
+    return isinstance(obj, dict) and isinstance(obj.get('shards'), list)
+
+
+def shard_pools(manifest: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Function to get pools of a shard manifest written by `create_sharded_tasks`.
+
+    Args:
+        - manifest (Dict): Shard manifest.
+
+    Returns:
+        - List[Dict]: Pool configs in the shards order.
+
+    Example:
+        >>> pools = wait_pools(pools=shard_pools(manifest))
+        ...
+    """
+    return [shard['pool'] for shard in manifest['shards']]
+
+
+def update_shard_pools(manifest: Dict[str, Any], pools: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Function to replace pools of a shard manifest, e.g. by their state after waiting.
+
+    Args:
+        - manifest (Dict): Shard manifest.
+        - pools (List[Dict]): Pool configs in the shards order.
+
+    Returns:
+        - Dict: A copy of the manifest with the new pools.
+
+    Example:
+        >>> manifest = update_shard_pools(manifest, wait_pools(pools=shard_pools(manifest)))
+        ...
+    """
+    return {**manifest, 'shards': [{**shard, 'pool': pool} for shard, pool in zip(manifest['shards'], pools)]}
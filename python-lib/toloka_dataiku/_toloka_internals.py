@@ -0,0 +1,85 @@
+"""
+The only module relying on private toloka-kit internals.
+
+toloka-kit has no public hooks for the `requests.Session` of each thread, which the plugin extends with
+a shared connection pool and request metrics, nor for the raw assignments export. These rely on
+`TolokaClient._session_for_thread` and `TolokaClient._raw_request` as implemented in toloka-kit 0.1.x.
+Other versions use the sessions and the public export of toloka-kit as is.
+"""
+import functools
+import io
+import logging
+import re
+import requests
+
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple
+
+from toloka.client import TolokaClient, unstructure
+from toloka.client.assignment import GetAssignmentsTsvParameters
+
+try:
+    from toloka.__version__ import __version__ as TOLOKA_KIT_VERSION
+except ImportError:
+    TOLOKA_KIT_VERSION = 'unknown'
+
+
+def _parse_version(version: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in re.findall(r'\d+', version)[:2])
+
+
+# Private internals below were checked against toloka-kit 0.1.26.
+PRIVATE_API_SUPPORTED = (
+    (0, 1) <= _parse_version(TOLOKA_KIT_VERSION) < (1, 0)
+    and callable(getattr(TolokaClient, '_session_for_thread', None))
+    and callable(getattr(TolokaClient, '_raw_request', None))
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _warn_unsupported() -> None:
+    logging.warning(f'toloka-kit {TOLOKA_KIT_VERSION} sessions can not be extended, threads do not share '
+                    f'connections, operation metrics do not count requests and client calls are rate limited instead')
+
+
+def wrap_thread_sessions(toloka_client: TolokaClient, hook: Callable[[requests.Session], None]) -> bool:
+    """
+    Calls `hook` once on the session of every thread of `toloka_client`, before its first request.
+
+    Returns False and leaves the client as is if the installed toloka-kit is not supported.
+    """
+    if not PRIVATE_API_SUPPORTED:
+        _warn_unsupported()
+        return False
+    session_for_thread = toloka_client._session_for_thread
+
+    @functools.lru_cache(maxsize=128)
+    def _session_for_thread(thread_id: int) -> requests.Session:
+        session = session_for_thread(thread_id)
+        hook(session)
+        return session
+
+    toloka_client._session_for_thread = _session_for_thread
+    return True
+
+
+@contextmanager
+def open_assignments_tsv(toloka_client: TolokaClient, pool_id: str,
+                         parameters: GetAssignmentsTsvParameters) -> Iterator[Optional[BinaryIO]]:
+    """
+    Opens the same export as `TolokaClient.get_assignments_df` as a binary stream read from the connection.
+
+    Sessions of `create_toloka_client` stream the body, while sessions of a plain `TolokaClient` preload it.
+    Yields None with unsupported toloka-kit versions, which only have the export parsed as a whole.
+    """
+    if not PRIVATE_API_SUPPORTED:
+        yield None
+        return
+    response = toloka_client._raw_request('get', f'/new/requester/pools/{pool_id}/assignments.tsv',
+                                          params=unstructure(parameters), stream=True)
+    with response:
+        if response._content is not False:
+            yield io.BytesIO(response.content)
+        else:
+            response.raw.decode_content = True
+            yield response.raw
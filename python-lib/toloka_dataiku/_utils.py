@@ -1,20 +1,39 @@
+import hashlib
 import json
+import logging
+import numpy as np
 import pandas as pd
 import pickle
+import threading
+import time
 
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import datetime
 from decimal import Decimal
 from enum import Enum
-from functools import partial
-from typing import Any, Callable, Type, List
+from functools import partial, reduce
+from itertools import compress
+from queue import Full, Queue
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Type, Union
 
-from toloka.client import Task, unstructure
+from toloka.client import Assignment, Task, unstructure
+from toloka.client.batch_create_results import TaskBatchCreateResult
 
 # To avoid `structure` pickling errors.
 import toloka.client as _toloka_client_lib
 
+from ._validation import RejectedRows
+
 
 _json_loads = partial(json.loads, parse_float=Decimal)
 
+# Toloka recommends to create no more than 10,000 tasks per asynchronous request.
+DEFAULT_UPLOAD_BATCH_SIZE = 10000
+
+TasksSource = Union[pd.DataFrame, Iterable[pd.DataFrame]]
+
 
 def structure_from_conf(obj: Any, cl: Type) -> object:
     if isinstance(obj, cl):
@@ -62,73 +81,615 @@ class TaskType(Enum):
     HONEYPOT = 'HONEYPOT'
 
 
-def init_pool_tasks(tasks_df: pd.DataFrame, pool_id: str) -> List[Task]:
-    tasks: List[Task] = []
+def _prefixed_columns(tasks_df: pd.DataFrame, prefix: str) -> List[str]:
+    return [column_name for column_name in tasks_df.columns if column_name.startswith(prefix)]
 
-    headings = [
-        column_name for column_name in tasks_df.columns if column_name.startswith('INPUT:')]
 
-    for _, row in tasks_df.iterrows():
-        tasks.append(
-            Task(input_values={field[len('INPUT:'):]: row[field] for field in headings if not pd.isna(row[field])},
-                 pool_id=pool_id))
+def _columns_to_dicts(tasks_df: pd.DataFrame, headings: List[str], prefix: str) -> List[Dict[str, Any]]:
+    """Builds one `{field: value}` dict per row, skipping missing values, column by column."""
+    records: List[Dict[str, Any]] = [{} for _ in range(len(tasks_df))]
+    for heading in headings:
+        field = heading[len(prefix):]
+        column = tasks_df[heading]
+        for record, value in compress(zip(records, column.tolist()), column.notna().tolist()):
+            record[field] = value
+    return records
 
-    return tasks
 
+def _hint_messages(values: List[Dict[str, Any]]) -> List[str]:
+    return [f'Correct solution: {"".join(row_values.values())}' for row_values in values]
 
-def init_control_tasks(tasks_df: pd.DataFrame, pool_id: str) -> List[Task]:
-    tasks: List[Task] = []
 
-    input_headings = [column_name for column_name in tasks_df.columns if
-                      column_name.startswith('INPUT:')]
-    golden_headings = [column_name for column_name in tasks_df.columns if
-                       column_name.startswith('GOLDEN:')]
+def init_pool_tasks(tasks_df: pd.DataFrame, pool_id: str) -> List[Task]:
+    input_values = _columns_to_dicts(tasks_df, _prefixed_columns(tasks_df, 'INPUT:'), 'INPUT:')
+
+    return [Task(input_values=row_input_values, pool_id=pool_id) for row_input_values in input_values]
 
-    for _, row in tasks_df.iterrows():
-        known_solutions = [{'output_values': {field[len('GOLDEN:'):]: row[field] for field in golden_headings if
-                                              not pd.isna(row[field])}}]
-        tasks.append(Task(
-            input_values={field[len('INPUT:'):]: row[field]
-                          for field in input_headings if not pd.isna(row[field])},
-            known_solutions=known_solutions,
-            pool_id=pool_id))
 
-    return tasks
+def init_control_tasks(tasks_df: pd.DataFrame, pool_id: str) -> List[Task]:
+    input_values = _columns_to_dicts(tasks_df, _prefixed_columns(tasks_df, 'INPUT:'), 'INPUT:')
+    golden_values = _columns_to_dicts(tasks_df, _prefixed_columns(tasks_df, 'GOLDEN:'), 'GOLDEN:')
+
+    return [
+        Task(input_values=row_input_values,
+             known_solutions=[{'output_values': row_golden_values}],
+             pool_id=pool_id)
+        for row_input_values, row_golden_values in zip(input_values, golden_values)
+    ]
 
 
 def init_training_tasks(tasks_df: pd.DataFrame, pool_id: str) -> List[Task]:
-    tasks: List[Task] = []
-
-    input_headings = [column_name for column_name in tasks_df.columns if
-                      column_name.startswith('INPUT:')]
-    golden_headings = [column_name for column_name in tasks_df.columns if
-                       column_name.startswith('GOLDEN:')]
-    hint_headings = [column_name for column_name in tasks_df.columns if
-                     column_name.startswith('HINT:')]
-
-    for _, row in tasks_df.iterrows():
-        known_solutions = [{'output_values': {field[len('GOLDEN:'):]: row[field] for field in golden_headings if
-                                              not pd.isna(row[field])}}]
-        if len(hint_headings) > 0:
-            hint = f'Correct solution: {"".join(row[field] for field in hint_headings if not pd.isna(row[field]))}'
+    input_values = _columns_to_dicts(tasks_df, _prefixed_columns(tasks_df, 'INPUT:'), 'INPUT:')
+    golden_values = _columns_to_dicts(tasks_df, _prefixed_columns(tasks_df, 'GOLDEN:'), 'GOLDEN:')
+    hint_headings = _prefixed_columns(tasks_df, 'HINT:')
+    if len(hint_headings) > 0:
+        hints = _hint_messages(_columns_to_dicts(tasks_df, hint_headings, 'HINT:'))
+    else:
+        hints = _hint_messages(golden_values)
+
+    return [
+        Task(input_values=row_input_values,
+             known_solutions=[{'output_values': row_golden_values}],
+             message_on_unknown_solution=hint,
+             pool_id=pool_id)
+        for row_input_values, row_golden_values, hint in zip(input_values, golden_values, hints)
+    ]
+
+
+def iter_dataframe_chunks(tasks: TasksSource, chunk_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """Yields `tasks` as DataFrames of at most `chunk_size` rows. `tasks` may be a DataFrame or an iterator of them."""
+    if not isinstance(tasks, pd.DataFrame):
+        for chunk in tasks:
+            yield from iter_dataframe_chunks(chunk, chunk_size)
+        return
+    if not chunk_size or len(tasks) <= chunk_size:
+        yield tasks
+        return
+    for start in range(0, len(tasks), chunk_size):
+        yield tasks.iloc[start:start + chunk_size]
+
+
+class TaskBatch(NamedTuple):
+    """A chunk of task rows, its position among all input rows and the function building its tasks."""
+    offset: int
+    rows: pd.DataFrame
+    builder: Callable[[pd.DataFrame, str], List[Task]]
+
+    def build(self, pool_id: str) -> List[Task]:
+        return self.builder(self.rows, pool_id)
+
+
+class PreparedBatch(NamedTuple):
+    """
+    A task batch ready to be sent: its checkpoint key, rows rejected by validation and tasks built from valid rows,
+    or the result restored from a checkpoint if the batch was already uploaded.
+    """
+    batch: TaskBatch
+    key: Optional[Tuple[int, int, str]] = None
+    tasks: Optional[List[Task]] = None
+    rejected: Optional[RejectedRows] = None
+    restored: Optional[TaskBatchCreateResult] = None
+
+    @property
+    def offset(self) -> int:
+        return self.batch.offset
+
+
+def iter_task_batches(
+    pool_tasks: Optional[TasksSource],
+    control_tasks: Optional[TasksSource],
+    training_tasks: Optional[TasksSource],
+    chunk_size: Optional[int] = None,
+) -> Iterator[TaskBatch]:
+    """Lazily splits task sources into batches, keeping the pool, control, training order."""
+    sources = [(pool_tasks, init_pool_tasks),
+               (control_tasks, init_control_tasks),
+               (training_tasks, init_training_tasks)]
+    offset = 0
+    for tasks, builder in sources:
+        if tasks is None:
+            continue
+        for chunk in iter_dataframe_chunks(tasks, chunk_size):
+            if len(chunk) > 0:
+                yield TaskBatch(offset, chunk, builder)
+                offset += len(chunk)
+
+
+def hash_rows(rows: pd.DataFrame) -> str:
+    digest = hashlib.sha1('\t'.join(map(str, rows.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class UploadCheckpoint:
+    """
+    Keeps track of task batches accepted by Toloka, so an interrupted upload may be resumed without duplicates.
+
+    Every committed batch is described by a JSON-serializable manifest entry with the pool ID, the batch offset
+    and size, a hash of its rows and IDs of the created tasks (`None` for rejected rows).
+    """
+
+    def __init__(
+        self,
+        pool_id: str,
+        committed_chunks: Optional[Iterable[Dict[str, Any]]] = None,
+        on_chunk_committed: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self._pool_id = pool_id
+        self._on_chunk_committed = on_chunk_committed
+        self._lock = threading.Lock()
+        self._committed: Dict[Tuple[int, int, str], List[Optional[str]]] = {
+            (chunk['offset'], chunk['size'], chunk['rows_hash']): chunk['task_ids']
+            for chunk in committed_chunks or []
+            if chunk['pool_id'] == pool_id
+        }
+
+    @staticmethod
+    def key(batch: TaskBatch) -> Tuple[int, int, str]:
+        return batch.offset, len(batch.rows), hash_rows(batch.rows)
+
+    def restore(self, key: Tuple[int, int, str]) -> Optional[TaskBatchCreateResult]:
+        task_ids = self._committed.get(key)
+        if task_ids is None:
+            return None
+        return TaskBatchCreateResult(items={
+            str(index): Task(id=task_id, pool_id=self._pool_id)
+            for index, task_id in enumerate(task_ids) if task_id is not None
+        })
+
+    def commit(self, key: Tuple[int, int, str], result: TaskBatchCreateResult) -> None:
+        offset, size, rows_hash = key
+        task_ids: List[Optional[str]] = [None] * size
+        for index, task in (result.items or {}).items():
+            task_ids[int(index)] = task.id
+        with self._lock:
+            self._committed[key] = task_ids
+            if self._on_chunk_committed is not None:
+                self._on_chunk_committed({
+                    'pool_id': self._pool_id,
+                    'offset': offset,
+                    'size': size,
+                    'rows_hash': rows_hash,
+                    'task_ids': task_ids,
+                })
+
+
+def mark_last(items: Iterable[Any]) -> Iterator[Tuple[Any, bool]]:
+    """Yields `(item, is_last)` pairs with a one item lookahead."""
+    iterator = iter(items)
+    try:
+        previous = next(iterator)
+    except StopIteration:
+        return
+    for item in iterator:
+        yield previous, False
+        previous = item
+    yield previous, True
+
+
+def upload_task_batches(
+    upload: Callable[[Any, bool], TaskBatchCreateResult],
+    batches: Iterable[Union[TaskBatch, PreparedBatch]],
+    concurrency: int = 1,
+) -> Iterator[Tuple[int, TaskBatchCreateResult]]:
+    """
+    Calls `upload(batch, is_last)` for every batch and yields `(offset, result)` pairs in the batches order.
+    Batches may be raw or already prepared ones.
+
+    With `concurrency > 1` up to `concurrency` batches are uploaded by a thread pool at the same time,
+    while the next batches are read lazily. The last batch is sent only after all previous ones are done.
+    """
+    if concurrency <= 1:
+        for batch, is_last in mark_last(batches):
+            yield batch.offset, upload(batch, is_last)
+        return
+
+    pending: Deque[Tuple[int, Future]] = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for batch, is_last in mark_last(batches):
+            while pending and (is_last or len(pending) >= concurrency):
+                offset, future = pending.popleft()
+                yield offset, future.result()
+            # Request headers set by `add_headers` live in context variables, which threads do not inherit.
+            pending.append((batch.offset, executor.submit(copy_context().run, upload, batch, is_last)))
+        while pending:
+            offset, future = pending.popleft()
+            yield offset, future.result()
+
+
+def merge_task_batch_results(results: Iterable[Tuple[int, TaskBatchCreateResult]]) -> TaskBatchCreateResult:
+    """Merges per-batch results into one, shifting item and error indices by the batch offset."""
+    items: Dict[str, Task] = {}
+    validation_errors: Dict[str, Any] = {}
+    for offset, result in results:
+        items.update((str(int(index) + offset), task) for index, task in (result.items or {}).items())
+        validation_errors.update(
+            (str(int(index) + offset), errors) for index, errors in (result.validation_errors or {}).items())
+    return TaskBatchCreateResult(items=items, validation_errors=validation_errors or None)
+
+
+def map_in_context(func: Callable[[Any], Any], items: Iterable[Any],
+                   executor: Optional[ThreadPoolExecutor] = None) -> List[Any]:
+    """Calls `func` on every item, concurrently if `executor` is given, in the caller context. Keeps items order."""
+    if executor is None:
+        return [func(item) for item in items]
+    futures = [executor.submit(copy_context().run, func, item) for item in items]
+    return [future.result() for future in futures]
+
+
+class PollScheduler:
+    """
+    Chooses intervals between pool checks from the recent history of completion percentages.
+
+    While pools progress, the interval is half of the nearest predicted close time, so checks get more frequent
+    as a pool approaches completion. Without progress or after errors the interval grows exponentially.
+    Intervals are always kept between `min_period` and `max_period` seconds.
+    """
+
+    def __init__(self, min_period: float, max_period: float, *, history: int = 5, backoff: float = 2.0,
+                 max_errors: int = 5) -> None:
+        if not 0 < min_period <= max_period:
+            raise ValueError(f'Expected 0 < min_period <= max_period, got {min_period} and {max_period}')
+        self.min_period = min_period
+        self.max_period = max_period
+        self.backoff = backoff
+        self.max_errors = max_errors
+        self._history_size = history
+        self._history: Dict[str, Deque[Tuple[float, float]]] = {}
+        self._idle_checks = 0
+        self._errors = 0
+
+    def observe(self, percentages: Dict[str, float], now: Optional[float] = None) -> None:
+        """Records completion percentages of open pools by pool ID."""
+        now = time.monotonic() if now is None else now
+        progressed = False
+        for pool_id, percentage in percentages.items():
+            history = self._history.setdefault(pool_id, deque(maxlen=self._history_size))
+            progressed |= not history or history[-1][1] != percentage
+            history.append((now, percentage))
+        self._idle_checks = 0 if progressed else self._idle_checks + 1
+        self._errors = 0
+
+    def fail(self, error: Exception) -> None:
+        """Records a failed check. Raises `error` after `max_errors` consecutive failures."""
+        self._errors += 1
+        if self._errors > self.max_errors:
+            raise error
+        logging.warning(f'Pool check failed ({self._errors}/{self.max_errors}): {error}')
+
+    def eta(self) -> Optional[float]:
+        """Seconds until the nearest predicted pool close, if any pool makes progress."""
+        etas = []
+        for history in self._history.values():
+            (first_time, first_percentage), (last_time, last_percentage) = history[0], history[-1]
+            if last_time > first_time and last_percentage > first_percentage:
+                velocity = (last_percentage - first_percentage) / (last_time - first_time)
+                etas.append((100 - last_percentage) / velocity)
+        return min(etas, default=None)
+
+    def next_period(self) -> float:
+        eta = self.eta()
+        if self._errors:
+            period = self.min_period * self.backoff ** self._errors
+        elif eta is not None and not self._idle_checks:
+            period = eta / 2
         else:
-            hint = f'Correct solution: {"".join(row[field] for field in golden_headings if not pd.isna(row[field]))}'
+            period = self.min_period * self.backoff ** self._idle_checks
+        return min(max(period, self.min_period), self.max_period)
 
-        tasks.append(Task(
-            input_values={field[len('INPUT:'):]: row[field]
-                          for field in input_headings if not pd.isna(row[field])},
-            known_solutions=known_solutions,
-            message_on_unknown_solution=hint,
-            pool_id=pool_id))
 
-    return tasks
+def iter_in_context(iterator: Iterator[Any]) -> Iterator[Any]:
+    """Runs every step of `iterator` in the caller context, so lazy requests keep headers set by `add_headers`."""
+    ctx = copy_context()
 
+    def _iterate() -> Iterator[Any]:
+        while True:
+            try:
+                yield ctx.run(next, iterator)
+            except StopIteration:
+                return
 
-def get_task_from_fields(row: pd.Series, field_type: str):
-    values_lst = [val for idx, val in row.iteritems() if idx.startswith(field_type)]
-    if len(values_lst) == 1:
-        return values_lst[0]
-    elif len(values_lst) > 1:
-        return "|".join([val for idx, val in row if idx.startswith(field_type)])
-    else:
-        return ""
+    return _iterate()
+
+
+_PRODUCER_DONE = object()
+
+
+def iter_in_background(items: Iterable[Any], size: int) -> Iterator[Any]:
+    """
+    Iterates `items` in a background thread in the caller context, at most `size` items ahead of the consumer.
+
+    The bounded queue keeps memory flat and makes the producer wait for a slow consumer. Errors of the producer
+    are raised to the consumer, and the producer stops when the consumer stops early.
+    """
+    queue: Queue = Queue(maxsize=size)
+    stopped = threading.Event()
+
+    def _put(item: Tuple[Any, Optional[BaseException]]) -> bool:
+        while not stopped.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _produce() -> None:
+        try:
+            for item in items:
+                if not _put((item, None)):
+                    return
+        except BaseException as error:
+            _put((_PRODUCER_DONE, error))
+            return
+        _put((_PRODUCER_DONE, None))
+
+    producer = threading.Thread(target=copy_context().run, args=(_produce,), name='toloka-producer', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = queue.get()
+            if item is _PRODUCER_DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+        producer.join()
+
+
+_ASSIGNMENT_COLUMNS = [
+    'ASSIGNMENT:assignment_id',
+    'ASSIGNMENT:task_id',
+    'ASSIGNMENT:task_suite_id',
+    'ASSIGNMENT:worker_id',
+    'ASSIGNMENT:status',
+    'ASSIGNMENT:started',
+    'ASSIGNMENT:submitted',
+    'ASSIGNMENT:accepted',
+    'ASSIGNMENT:rejected',
+    'ASSIGNMENT:skipped',
+    'ASSIGNMENT:expired',
+    'ASSIGNMENT:reward',
+]
+
+
+_TIMESTAMP_COLUMNS = [
+    'ASSIGNMENT:started',
+    'ASSIGNMENT:submitted',
+    'ASSIGNMENT:accepted',
+    'ASSIGNMENT:rejected',
+    'ASSIGNMENT:skipped',
+    'ASSIGNMENT:expired',
+]
+
+# String columns with at most this share of distinct values are stored as categories.
+_CATEGORY_MAX_UNIQUE_SHARE = 0.5
+
+
+def _arrow_string_dtype() -> Optional[pd.StringDtype]:
+    # Arrow strings need pandas 1.3 or later with pyarrow 1.0.1 or later, while the code env may have pandas 1.1.
+    # Older strings dtypes still keep a Python object per value, so such columns are left as they are.
+    try:
+        return pd.StringDtype('pyarrow')
+    except (ImportError, TypeError):
+        return None
+
+
+def to_compact_dtypes(df: pd.DataFrame, downcast_integers: bool = True) -> pd.DataFrame:
+    """
+    Converts assignment columns from Python objects and pandas strings to compact dtypes.
+
+    Timestamp columns become `datetime64`, strings with repeated values (labels, workers, statuses,
+    task inputs with overlap) become categories and other strings become Arrow strings if pandas and pyarrow
+    support them.
+    Integers are downcast unless `downcast_integers` is unset, e.g. for chunks that should share dtypes.
+    Floats are kept, as float32 would change values.
+    """
+    arrow_string = _arrow_string_dtype()
+    columns = {}
+    for name, column in df.items():
+        if name in _TIMESTAMP_COLUMNS:
+            column = pd.to_datetime(column, errors='coerce')
+        elif pd.api.types.is_integer_dtype(column.dtype) and downcast_integers:
+            column = pd.to_numeric(column, downcast='integer')
+        elif pd.api.types.is_object_dtype(column.dtype) or pd.api.types.is_string_dtype(column.dtype):
+            # Pandas string dtypes, the default for strings since pandas 3.0, are compacted as well.
+            if column.nunique() <= _CATEGORY_MAX_UNIQUE_SHARE * len(column):
+                column = column.astype('category')
+            elif arrow_string is not None:
+                column = column.astype(arrow_string)
+        columns[name] = column
+    return pd.DataFrame(columns, index=df.index)
+
+
+def assignment_columns(input_fields: List[str], output_fields: List[str]) -> List[str]:
+    """Columns of the assignments TSV export for the given project fields."""
+    return ([f'INPUT:{field}' for field in input_fields]
+            + [f'OUTPUT:{field}' for field in output_fields]
+            + [f'GOLDEN:{field}' for field in output_fields]
+            + _ASSIGNMENT_COLUMNS)
+
+
+def _flat_value(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def assignment_to_rows(assignment: Assignment) -> Iterator[Dict[str, Any]]:
+    """Yields one row per task of the assignment, shaped like rows of the assignments TSV export."""
+    assignment_values = {
+        'ASSIGNMENT:assignment_id': assignment.id,
+        'ASSIGNMENT:task_suite_id': assignment.task_suite_id,
+        'ASSIGNMENT:worker_id': assignment.user_id,
+        'ASSIGNMENT:status': assignment.status.value if assignment.status is not None else None,
+        'ASSIGNMENT:started': _isoformat(assignment.created),
+        'ASSIGNMENT:submitted': _isoformat(assignment.submitted),
+        'ASSIGNMENT:accepted': _isoformat(assignment.accepted),
+        'ASSIGNMENT:rejected': _isoformat(assignment.rejected),
+        'ASSIGNMENT:skipped': _isoformat(assignment.skipped),
+        'ASSIGNMENT:expired': _isoformat(assignment.expired),
+        'ASSIGNMENT:reward': _flat_value(assignment.reward),
+    }
+    solutions = assignment.solutions or []
+    for index, task in enumerate(assignment.tasks or []):
+        row = {f'INPUT:{field}': _flat_value(value) for field, value in (task.input_values or {}).items()}
+        if index < len(solutions):
+            row.update((f'OUTPUT:{field}', _flat_value(value))
+                       for field, value in (solutions[index].output_values or {}).items())
+        if task.known_solutions:
+            row.update((f'GOLDEN:{field}', _flat_value(value))
+                       for field, value in (task.known_solutions[0].output_values or {}).items())
+        row['ASSIGNMENT:task_id'] = task.id
+        row.update(assignment_values)
+        yield row
+
+
+def join_fields(answers_df: pd.DataFrame, prefix: str) -> pd.Series:
+    """Joins values of all `prefix` columns into one "|"-separated key per row. A single column is kept as is."""
+    columns = _prefixed_columns(answers_df, prefix)
+    if not columns:
+        return pd.Series('', index=answers_df.index)
+    if len(columns) == 1:
+        return answers_df[columns[0]]
+    return reduce(lambda left, right: left + '|' + right, (answers_df[column].astype(str) for column in columns))
+
+
+def _factorize_categorical(values: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """Same as `_factorize`, but remaps category codes instead of hashing values again."""
+    codes = values.cat.codes.to_numpy(dtype=np.intp)
+    categories = values.cat.categories
+    known = codes >= 0
+    used = np.bincount(codes[known], minlength=len(categories)) > 0
+    if not used.all():
+        codes = np.where(known, (np.cumsum(used) - 1)[codes], -1)
+        categories = categories[used]
+    if not categories.is_monotonic_increasing:
+        try:
+            order = categories.argsort()
+        except TypeError:
+            # Mixed value types can not be sorted.
+            return codes, categories
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        codes = np.where(known, rank[codes], -1)
+        categories = categories.take(order)
+    return codes, categories
+
+
+def _factorize(values: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return _factorize_categorical(values)
+    try:
+        return pd.factorize(values, sort=True)
+    except TypeError:
+        # Mixed value types can not be sorted.
+        return pd.factorize(values)
+
+
+class AnswerCodes(NamedTuple):
+    """Integer-encoded (task, worker, label) answers with the values behind the codes."""
+    task: np.ndarray
+    worker: np.ndarray
+    label: np.ndarray
+    tasks: pd.Index
+    workers: pd.Index
+    labels: pd.Index
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Answers as a crowd-kit `task`, `worker`, `label` DataFrame with coded tasks and workers.
+
+        Labels are kept as values: crowd-kit models confuse integer labels with their probability columns.
+        """
+        return pd.DataFrame({'task': self.task, 'worker': self.worker, 'label': self.labels.take(self.label)})
+
+    def decode_tasks(self, predicted: pd.Series) -> pd.Series:
+        """Maps task codes in the index of `predicted` back to task keys."""
+        return predicted.set_axis(pd.Index(self.tasks.take(predicted.index.to_numpy()), name=predicted.index.name))
+
+    def decode_labels(self, predicted: pd.Series) -> pd.Series:
+        """Maps label codes in the values of `predicted` back to labels."""
+        return pd.Series(self.labels.take(predicted.to_numpy()), index=predicted.index, name=predicted.name)
+
+    def decode(self, predicted: pd.Series) -> pd.Series:
+        """Maps both task codes in the index and label codes in the values of `predicted` back to keys and labels."""
+        return self.decode_tasks(self.decode_labels(predicted))
+
+    def subset(self, mask: np.ndarray) -> 'AnswerCodes':
+        """Answers selected by a boolean `mask`, with codes compacted to the tasks, workers and labels left."""
+        task, tasks = _compact(self.task[mask], self.tasks)
+        worker, workers = _compact(self.worker[mask], self.workers)
+        label, labels = _compact(self.label[mask], self.labels)
+        return AnswerCodes(task, worker, label, tasks, workers, labels)
+
+
+def encode_answers(answers_df: pd.DataFrame) -> AnswerCodes:
+    """
+    Encodes assignments to integer task, worker and label codes.
+
+    Tasks are keyed by INPUT: columns, labels by OUTPUT: columns and workers by "ASSIGNMENT:worker_id".
+    Codes follow the sorted order of values. Answers with a missing task, worker or label are dropped.
+    Single categorical columns, e.g. from `get_assignments_df(compact_dtypes=True)`, reuse their category codes.
+    """
+    task, tasks = _factorize(join_fields(answers_df, 'INPUT:'))
+    worker, workers = _factorize(answers_df['ASSIGNMENT:worker_id'])
+    label, labels = _factorize(join_fields(answers_df, 'OUTPUT:'))
+    answers = AnswerCodes(task, worker, label, tasks, workers, labels)
+    known = (task >= 0) & (worker >= 0) & (label >= 0)
+    if not known.all():
+        # Keep codes dense: values seen only in dropped answers get no code.
+        return answers.subset(known)
+    return answers
+
+
+def _compact(codes: np.ndarray, uniques: pd.Index) -> Tuple[np.ndarray, pd.Index]:
+    codes, used = pd.factorize(codes, sort=True)
+    return codes, uniques.take(used)
+
+
+class AnswerEncoder:
+    """
+    Encodes assignments to `AnswerCodes` chunk by chunk, keeping only integer codes
+    and the distinct tasks, workers and labels instead of the chunks themselves.
+
+    Tasks, workers and labels are keyed and codes are ordered as in `encode_answers`.
+    """
+
+    def __init__(self) -> None:
+        # Codes in order of first appearance, remapped to the sorted order by `encode`.
+        self._values: Tuple[Dict[Any, int], ...] = ({}, {}, {})
+        self._codes: Tuple[List[np.ndarray], ...] = ([], [], [])
+
+    def add(self, answers_df: pd.DataFrame) -> int:
+        """Encodes a chunk of assignments and returns the number of answers kept."""
+        keys = [join_fields(answers_df, 'INPUT:'), answers_df['ASSIGNMENT:worker_id'],
+                join_fields(answers_df, 'OUTPUT:')]
+        chunk_codes = []
+        for key, values in zip(keys, self._values):
+            codes, uniques = pd.factorize(key)
+            # Missing values keep the -1 code.
+            mapping = np.fromiter((values.setdefault(value, len(values)) for value in uniques), dtype=np.int64,
+                                  count=len(uniques))
+            chunk_codes.append(np.append(mapping, -1)[codes])
+        known = (chunk_codes[0] >= 0) & (chunk_codes[1] >= 0) & (chunk_codes[2] >= 0)
+        for codes, all_codes in zip(chunk_codes, self._codes):
+            all_codes.append(codes[known])
+        return int(known.sum())
+
+    def encode(self) -> AnswerCodes:
+        columns = []
+        for values, codes in zip(self._values, self._codes):
+            categorical = pd.Categorical.from_codes(np.concatenate(codes) if codes else np.empty(0, dtype=np.int64),
+                                                    categories=pd.Index(list(values)))
+            columns.append(_factorize_categorical(pd.Series(categorical, copy=False)))
+        (task, tasks), (worker, workers), (label, labels) = columns
+        return AnswerCodes(task, worker, label, tasks, workers, labels)
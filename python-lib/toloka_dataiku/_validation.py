@@ -0,0 +1,182 @@
+import json
+import numpy as np
+import pandas as pd
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Type
+
+from toloka.client.project.task_spec import TaskSpec
+from toloka.client.batch_create_results import TaskBatchCreateResult
+from toloka.client.project.field_spec import (
+    ArrayBooleanSpec,
+    ArrayCoordinatesSpec,
+    ArrayFileSpec,
+    ArrayFloatSpec,
+    ArrayIntegerSpec,
+    ArrayJsonSpec,
+    ArrayStringSpec,
+    ArrayUrlSpec,
+    BooleanSpec,
+    CoordinatesSpec,
+    FieldSpec,
+    FileSpec,
+    FloatSpec,
+    IntegerSpec,
+    StringSpec,
+    UrlSpec,
+)
+
+# Validation errors by the path of the invalid value, as in `TaskBatchCreateResult.validation_errors`.
+RowErrors = Dict[str, Dict[str, str]]
+
+_ARRAY_SPECS = (ArrayBooleanSpec, ArrayCoordinatesSpec, ArrayFileSpec, ArrayFloatSpec, ArrayIntegerSpec,
+                ArrayJsonSpec, ArrayStringSpec, ArrayUrlSpec)
+_STRING_SPECS = (StringSpec, UrlSpec, FileSpec, CoordinatesSpec)
+_NUMBER_TYPES = (int, float, np.integer, np.floating)
+
+
+def _is_instance(values: pd.Series, types: Tuple[Type, ...]) -> np.ndarray:
+    return np.fromiter((isinstance(value, types) for value in values.tolist()), dtype=bool, count=len(values))
+
+
+def _type_mask(column: pd.Series, spec: FieldSpec) -> np.ndarray:
+    """Whether each value has the type of `spec`. Checked by dtype where possible, value by value for objects."""
+    dtype = column.dtype
+    is_object = dtype == object or isinstance(dtype, pd.CategoricalDtype)
+    if isinstance(spec, _ARRAY_SPECS):
+        return _is_instance(column, (list, tuple, np.ndarray)) if is_object else np.zeros(len(column), dtype=bool)
+    if isinstance(spec, _STRING_SPECS):
+        if isinstance(dtype, pd.StringDtype) or (dtype == object and pd.api.types.infer_dtype(column) == 'string'):
+            return np.ones(len(column), dtype=bool)
+        return _is_instance(column, (str,)) if is_object else np.zeros(len(column), dtype=bool)
+    if isinstance(spec, BooleanSpec):
+        if pd.api.types.is_bool_dtype(dtype):
+            return np.ones(len(column), dtype=bool)
+        return _is_instance(column, (bool, np.bool_)) if is_object else np.zeros(len(column), dtype=bool)
+    if isinstance(spec, (IntegerSpec, FloatSpec)):
+        if is_object:
+            mask = _is_instance(column, _NUMBER_TYPES) & ~_is_instance(column, (bool, np.bool_))
+        else:
+            mask = np.full(len(column), pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype))
+        if isinstance(spec, IntegerSpec):
+            # Integer columns with missing values are read as floats.
+            numbers = pd.to_numeric(column.where(mask), errors='coerce')
+            mask &= (numbers % 1 == 0).to_numpy()
+        return mask
+    # JSON values may be of any type.
+    return np.ones(len(column), dtype=bool)
+
+
+def _check_field(column: Optional[pd.Series], spec: FieldSpec, required: bool,
+                 index: pd.Index) -> List[Tuple[np.ndarray, str, str]]:
+    """Returns `(mask of invalid rows, code, message)` of every failed check of one field."""
+    if column is None:
+        column = pd.Series(None, index=index, dtype=object)
+    present = column.notna().to_numpy()
+    checks = []
+    if required:
+        checks.append((~present, 'VALUE_REQUIRED', 'Value is required'))
+
+    # Missing optional columns are common and need no type checks.
+    typed = present & _type_mask(column, spec) if present.any() else present
+    checks.append((present & ~typed, 'INVALID_TYPE', f'Value should be of type {spec.type.value}'))
+
+    if isinstance(spec, _ARRAY_SPECS):
+        min_value, max_value = spec.min_size, spec.max_size
+    elif isinstance(spec, _STRING_SPECS):
+        min_value, max_value = getattr(spec, 'min_length', None), getattr(spec, 'max_length', None)
+    elif isinstance(spec, (IntegerSpec, FloatSpec)):
+        min_value, max_value = spec.min_value, spec.max_value
+    else:
+        min_value = max_value = None
+    if (min_value is not None or max_value is not None) and typed.any():
+        values = column.where(typed)
+        if isinstance(spec, _ARRAY_SPECS):
+            values = values.map(len, na_action='ignore')
+        elif isinstance(spec, _STRING_SPECS):
+            values = values.str.len()
+        else:
+            values = pd.to_numeric(values, errors='coerce')
+    else:
+        min_value = max_value = None
+
+    # Array specs inherit from the specs of their elements.
+    unit = ' long' if isinstance(spec, _STRING_SPECS) and not isinstance(spec, _ARRAY_SPECS) else ''
+    if min_value is not None:
+        checks.append((typed & (values < min_value).to_numpy(), 'VALUE_LESS_THAN_MIN',
+                       f'Value should be at least {min_value}{unit}'))
+    if max_value is not None:
+        checks.append((typed & (values > max_value).to_numpy(), 'VALUE_GREATER_THAN_MAX',
+                       f'Value should be at most {max_value}{unit}'))
+
+    allowed_values = getattr(spec, 'allowed_values', None)
+    if allowed_values and not isinstance(spec, _ARRAY_SPECS):
+        checks.append((typed & ~column.isin(allowed_values).to_numpy(), 'VALUE_NOT_ALLOWED',
+                       f'Value should be one of: {", ".join(map(str, allowed_values))}'))
+    return checks
+
+
+def validate_task_rows(rows: pd.DataFrame, task_spec: TaskSpec, golden: bool = False) -> Dict[int, RowErrors]:
+    """
+    Validates task rows against the project specification column by column, as Toloka validates tasks on upload.
+
+    INPUT: columns are checked against the input specification: required fields, value types, string lengths,
+    array sizes, number ranges and allowed values. With `golden`, GOLDEN: columns are checked against the output
+    specification the same way, except for required fields. Elements of arrays are not checked.
+
+    Returns errors of invalid rows only, by row position.
+    """
+    fields = [(f'INPUT:{field}', f'input_values.{field}', spec, spec.required)
+              for field, spec in task_spec.input_spec.items()]
+    if golden:
+        fields.extend((f'GOLDEN:{field}', f'known_solutions.0.output_values.{field}', spec, False)
+                      for field, spec in task_spec.output_spec.items())
+
+    errors: Dict[int, RowErrors] = {}
+    for column_name, path, spec, required in fields:
+        for mask, code, message in _check_field(rows.get(column_name), spec, required, rows.index):
+            for position in np.flatnonzero(mask).tolist():
+                errors.setdefault(position, {}).setdefault(path, {'code': code, 'message': message})
+    return errors
+
+
+class RejectedRows(NamedTuple):
+    """Rows of a task batch failing local validation and positions of the rows left for upload."""
+    rows: pd.DataFrame
+    errors: Dict[int, RowErrors]
+    valid_positions: np.ndarray
+
+    def to_frame(self, offset: int = 0) -> pd.DataFrame:
+        """Rejected rows with their position among all input rows in "row" and their errors as JSON."""
+        return self.rows.assign(
+            row=[offset + position for position in sorted(self.errors)],
+            validation_errors=[json.dumps(self.errors[position]) for position in sorted(self.errors)],
+        )
+
+    def restore_positions(self, result: TaskBatchCreateResult) -> TaskBatchCreateResult:
+        """Maps indices of a result for the valid rows back to positions in the batch and adds the local errors."""
+        items = {str(self.valid_positions[int(index)]): task for index, task in (result.items or {}).items()}
+        validation_errors: Dict[str, Any] = {str(position): errors for position, errors in self.errors.items()}
+        validation_errors.update((str(self.valid_positions[int(index)]), errors)
+                                 for index, errors in (result.validation_errors or {}).items())
+        return TaskBatchCreateResult(items=items, validation_errors=validation_errors or None)
+
+
+def merge_rejected_rows(batches: List[Tuple[int, RejectedRows]]) -> RejectedRows:
+    """Merges rejected rows of several batches, shifting positions by the batch offsets."""
+    return RejectedRows(
+        pd.concat([rejected.rows for _, rejected in batches]),
+        {offset + position: errors for offset, rejected in batches for position, errors in rejected.errors.items()},
+        np.concatenate([offset + rejected.valid_positions for offset, rejected in batches]),
+    )
+
+
+def split_invalid_rows(
+    rows: pd.DataFrame,
+    task_spec: TaskSpec,
+    golden: bool = False,
+) -> Tuple[pd.DataFrame, RejectedRows]:
+    """Splits rows into valid ones and rejected ones with their errors."""
+    errors = validate_task_rows(rows, task_spec, golden)
+    invalid = np.zeros(len(rows), dtype=bool)
+    invalid[list(errors)] = True
+    return rows[~invalid], RejectedRows(rows[invalid], errors, np.flatnonzero(~invalid))
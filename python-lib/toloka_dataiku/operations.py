@@ -1,21 +1,79 @@
 import logging
+import numpy as np
 import pandas as pd
+import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 from crowdkit.aggregation import DawidSkene
-from toloka.client import Assignment, Pool, Project, Task, TolokaClient, Training
-from toloka.client.analytics_request import CompletionPercentagePoolAnalytics
+from toloka.client import Assignment, Pool, Project, TolokaClient, Training, UserRestriction, unstructure
+from toloka.client.analytics_request import (
+    ApprovedAssignmentsCountPoolAnalytics,
+    CompletionPercentagePoolAnalytics,
+    PoolAnalyticsRequest,
+)
 from toloka.client.assignment import GetAssignmentsTsvParameters
 from toloka.client.batch_create_results import TaskBatchCreateResult
+from toloka.client.exceptions import InternalApiError, RemoteServiceUnavailableApiError, TooManyRequestsApiError
+from toloka.client.project.task_spec import TaskSpec
 from toloka.util._managing_headers import add_headers
 
-from ._utils import extract_id, structure_from_conf, unstructured, init_pool_tasks, init_training_tasks, init_control_tasks, get_task_from_fields
+from ._aggregation import aggregate_cascade, aggregate_codes, get_aggregator
+from ._dawid_skene import fit_dawid_skene
+from ._metrics import count_rows, instrumented, phase, recorded_metrics
+from ._utils import (
+    DEFAULT_UPLOAD_BATCH_SIZE,
+    AnswerEncoder,
+    PollScheduler,
+    PreparedBatch,
+    TaskBatch,
+    TasksSource,
+    UploadCheckpoint,
+    assignment_columns,
+    assignment_to_rows,
+    encode_answers,
+    extract_id,
+    init_pool_tasks,
+    iter_dataframe_chunks,
+    iter_in_background,
+    iter_in_context,
+    iter_task_batches,
+    map_in_context,
+    merge_task_batch_results,
+    structure_from_conf,
+    to_compact_dtypes,
+    unstructured,
+    upload_task_batches,
+)
+from ._sharding import plan_shards, shard_name, shard_pools
+from ._toloka_internals import open_assignments_tsv
+from ._validation import RejectedRows, merge_rejected_rows, split_invalid_rows
+
+
+# Errors a pool check is retried after, with a growing interval.
+_TRANSIENT_ERRORS = (
+    requests.exceptions.RequestException,
+    InternalApiError,
+    RemoteServiceUnavailableApiError,
+    TooManyRequestsApiError,
+)
+
+_COMPLETION_PERCENTAGE = PoolAnalyticsRequest.Subject.COMPLETION_PERCENTAGE.value
+_APPROVED_ASSIGNMENTS_COUNT = PoolAnalyticsRequest.Subject.APPROVED_ASSIGNMENTS_COUNT.value
+
+_WATERMARK_FIELDS = [GetAssignmentsTsvParameters.Field.ASSIGNMENT_ID, GetAssignmentsTsvParameters.Field.STATUS,
+                     GetAssignmentsTsvParameters.Field.STARTED]
+# Assignments in these statuses do not change anymore, so incremental downloads keep only them.
+_FINAL_STATUSES = [Assignment.ACCEPTED.value, Assignment.REJECTED.value, Assignment.EXPIRED.value,
+                   Assignment.SKIPPED.value]
 
 
 @unstructured
 @add_headers('dataiku')
+@instrumented
 def create_project(
     obj: Union[Project, Dict, str, bytes],
     *,
@@ -37,12 +95,14 @@ def create_project(
         >>> project = create_project(project_conf)
         ...
     """
-    obj = structure_from_conf(obj, Project)
+    with phase('structure'):
+        obj = structure_from_conf(obj, Project)
     return toloka_client.create_project(obj)
 
 
 @unstructured
 @add_headers('dataiku')
+@instrumented
 def create_training(
     obj: Union[Training, Dict, str, bytes],
     *,
@@ -67,7 +127,8 @@ def create_training(
         >>> exam = create_training({...}, project=project)
         ...
     """
-    obj = structure_from_conf(obj, Training)
+    with phase('structure'):
+        obj = structure_from_conf(obj, Training)
     if project:
         obj.project_id = extract_id(project, Project)
     elif project_id:
@@ -79,6 +140,7 @@ def create_training(
 
 @unstructured
 @add_headers('dataiku')
+@instrumented
 def create_pool(
     obj: Union[Pool, Dict, str, bytes],
     *,
@@ -115,7 +177,8 @@ def create_pool(
         >>> pool = create_pool({...}, project=project, training=training)
         ...
     """
-    obj = structure_from_conf(obj, Pool)
+    with phase('structure'):
+        obj = structure_from_conf(obj, Pool)
     if project:
         obj.project_id = extract_id(project, Project)
     elif project_id:
@@ -137,18 +200,56 @@ def create_pool(
     return toloka_client.create_pool(obj)
 
 
+def _reject_invalid_rows(
+    rows: pd.DataFrame,
+    offset: int,
+    task_spec: TaskSpec,
+    golden: bool,
+    skip_invalid_items: bool,
+    on_rejected: Optional[Callable[[pd.DataFrame], None]],
+) -> Tuple[pd.DataFrame, RejectedRows]:
+    with phase('validate'):
+        valid_rows, rejected = split_invalid_rows(rows, task_spec, golden=golden)
+    if rejected.errors:
+        if on_rejected is not None:
+            on_rejected(rejected.to_frame(offset))
+        if not skip_invalid_items:
+            position, errors = next(iter(rejected.errors.items()))
+            raise ValueError(f'{len(rejected.errors)} of {len(rows)} task rows are invalid, '
+                             f'e.g. row {offset + position}: {errors}. '
+                             f'Set skip_invalid_items to upload valid rows only')
+    return valid_rows, rejected
+
+
+def _create_valid_tasks(tasks: List[Any], kwargs: Dict[str, Any], toloka_client: TolokaClient) -> TaskBatchCreateResult:
+    if tasks:
+        return toloka_client.create_tasks(tasks, **kwargs)
+    if kwargs['open_pool']:
+        logging.warning('All task rows are invalid, the pool is not opened')
+    return TaskBatchCreateResult(items={})
+
+
 @unstructured
 @add_headers('dataiku')
+@instrumented
 def create_tasks(
     *,
     pool: Union[Pool, Training, Dict, str, None] = None,
     pool_id: str = None,
-    pool_tasks: Optional[pd.DataFrame] = None,
-    control_tasks: Optional[pd.DataFrame] = None,
-    training_tasks: Optional[pd.DataFrame] = None,
+    pool_tasks: Optional[TasksSource] = None,
+    control_tasks: Optional[TasksSource] = None,
+    training_tasks: Optional[TasksSource] = None,
     allow_defaults: bool = False,
     open_pool: bool = False,
     skip_invalid_items: bool = False,
+    chunk_size: Optional[int] = None,
+    concurrency: int = 1,
+    committed_chunks: Optional[Iterable[Dict[str, Any]]] = None,
+    on_chunk_committed: Optional[Callable[[Dict[str, Any]], None]] = None,
+    validate: bool = False,
+    on_rejected: Optional[Callable[[pd.DataFrame], None]] = None,
+    prefetch: int = 0,
+    on_chunk_uploaded: Optional[Callable[[int, TaskBatchCreateResult], None]] = None,
     toloka_client: TolokaClient,
 ) -> TaskBatchCreateResult:
     """
@@ -158,20 +259,50 @@ def create_tasks(
         - pool (Pool, Training, Dict, str, optional): Allow to set tasks pool.
             May be either a `Pool` or `Training` object or config
         - pool_id (str): Allow to set tasks pool ID.
-        - pool_tasks (DataFrame, optional): DataFrame containing pool tasks configuraion.
-        - control_tasks (DataFrame, optional): DataFrame containing control tasks configuraion.
+        - pool_tasks (DataFrame, Iterable[DataFrame], optional): DataFrame containing pool tasks configuraion.
+            May also be an iterator of DataFrame chunks, e.g. `dataiku.Dataset.iter_dataframes()`.
+        - control_tasks (DataFrame, Iterable[DataFrame], optional): DataFrame containing control tasks configuraion.
             Should contain columns strats with \"GOLDEN\" to represent ground truth.
-        - training_tasks (DataFrame, optional): DataFrame containing training tasks configuraion.
+        - training_tasks (DataFrame, Iterable[DataFrame], optional): DataFrame containing training tasks configuraion.
             Should contain columns strats with \"GOLDEN\" to represent ground truth.
             Should be chosen in case of Training pool.
         - allow_defaults (bool, optional): Allow to use the overlap that is set in the pool parameters.
         - open_pool (bool, optional): Open the pool immediately after creating a task suite, if the pool is closed.
+            In chunked mode the pool is opened with the last chunk.
         - skip_invalid_items (bool, optional): Allow to skip invalid tasks.
             You can handle them using resulting TaskBatchCreateResult object.
+        - chunk_size (int, optional): Build and upload tasks by chunks of at most this many rows,
+            so only one chunk is kept in memory at a time.
+            Chunks that were uploaded before a failing one stay in Toloka.
+            By default all tasks are uploaded in a single request unless iterators of DataFrames are passed.
+        - concurrency (int, optional): Number of chunks uploaded in parallel. 1 by default.
+            If `chunk_size` is not set, tasks are split into chunks of 10000 rows.
+            Items and validation errors in the result keep the original rows order.
+        - committed_chunks (Iterable[Dict], optional): Checkpoint entries saved by `on_chunk_committed` during
+            a previous run. Chunks with the same pool, position and rows hash are not uploaded again,
+            their tasks are restored in the result by IDs only.
+        - on_chunk_committed (Callable[[Dict], None], optional): Called with a JSON-serializable checkpoint entry
+            each time a chunk is accepted by Toloka. Either this or `committed_chunks` enables chunked mode
+            with 10000 rows per chunk if `chunk_size` is not set. Input rows should keep their order between runs.
+        - validate (bool, optional): Validate rows against the project input and output specification before upload:
+            required fields, value types, string lengths, array sizes, number ranges and allowed values.
+            Invalid rows are not uploaded. With `skip_invalid_items` their errors are added to the result
+            validation errors, otherwise the chunk with invalid rows fails before it is sent.
+        - on_rejected (Callable[[DataFrame], None], optional): Called with rows rejected by validation, their position
+            among all input rows in a "row" column and their errors as JSON in a "validation_errors" column.
+            Enables validation.
+        - prefetch (int, optional): Number of chunks read, validated and built ahead of the upload by a background
+            thread, so building tasks overlaps with sending earlier chunks. The producer waits when this many chunks
+            are ready, which bounds memory. 0 by default: chunks are built right before they are sent.
+            If `chunk_size` is not set, tasks are split into chunks of 10000 rows.
+        - on_chunk_uploaded (Callable[[int, TaskBatchCreateResult], None], optional): Called with the position
+            of the first row and the result of every chunk in the rows order. Created tasks are then passed
+            to it only and not kept, so memory does not grow with the number of uploaded tasks.
+            If `chunk_size` is not set, tasks are split into chunks of 10000 rows.
         - toloka_client (TolokaClient): Client to be used to create obects in Toloka
 
     Returns:
-        - TaskBatchCreateResult: Result object.
+        - TaskBatchCreateResult: Result object. With `on_chunk_uploaded` it has validation errors only.
 
     Example:
         >>> tasks = create_tasks(tasks_df,
@@ -180,7 +311,6 @@ def create_tasks(
         ...                      allow_defaults=True)
         ...
     """
-    tasks: List[Task] = []
     if pool:
         try:
             pool_id = extract_id(pool, Pool)
@@ -189,24 +319,252 @@ def create_tasks(
     elif not pool_id:
         raise ValueError("Either pool or pool_id should be set")
 
-    if pool_tasks is not None:
-        tasks.extend(init_pool_tasks(pool_tasks, pool_id))
-    if control_tasks is not None:
-        tasks.extend(init_control_tasks(control_tasks, pool_id))
-    if training_tasks is not None:
-        tasks.extend(init_training_tasks(training_tasks, pool_id))
+    checkpoint = None
+    if committed_chunks is not None or on_chunk_committed is not None:
+        checkpoint = UploadCheckpoint(pool_id, committed_chunks, on_chunk_committed)
+    chunked = concurrency > 1 or prefetch > 0 or checkpoint is not None or on_chunk_uploaded is not None
+    if chunked and not chunk_size:
+        chunk_size = DEFAULT_UPLOAD_BATCH_SIZE
 
-    if not tasks:
-        raise ValueError(
-            "At least one of pool_tasks, control_tasks or training_tasks should be set")
+    task_spec = None
+    if validate or on_rejected is not None:
+        get_pool = toloka_client.get_training if training_tasks is not None else toloka_client.get_pool
+        task_spec = toloka_client.get_project(get_pool(pool_id).project_id).task_spec
+
+    def check(batch: TaskBatch) -> Tuple[TaskBatch, Optional[RejectedRows]]:
+        """Leaves only valid rows in the batch if validation is enabled."""
+        if task_spec is None:
+            return batch, None
+        rows, rejected = _reject_invalid_rows(batch.rows, batch.offset, task_spec, batch.builder is not init_pool_tasks,
+                                              skip_invalid_items, on_rejected)
+        return batch._replace(rows=rows), rejected
 
     kwargs = {'allow_defaults': allow_defaults,
               'open_pool': open_pool, 'skip_invalid_items': skip_invalid_items}
-    return toloka_client.create_tasks(tasks, **kwargs)
+    sources = (pool_tasks, control_tasks, training_tasks)
+    batches = iter_task_batches(*sources, chunk_size=chunk_size)
+    if not chunk_size and all(source is None or isinstance(source, pd.DataFrame) for source in sources):
+        tasks = []
+        rejected_batches = []
+        for batch in batches:
+            valid_batch, rejected = check(batch)
+            if rejected is not None:
+                rejected_batches.append((batch.offset, rejected))
+            with phase('build_tasks'):
+                tasks.extend(valid_batch.build(pool_id))
+        if not tasks and not rejected_batches:
+            raise ValueError(
+                "At least one of pool_tasks, control_tasks or training_tasks should be set")
+        count_rows(len(tasks))
+        if not rejected_batches:
+            return toloka_client.create_tasks(tasks, **kwargs)
+        result = _create_valid_tasks(tasks, kwargs, toloka_client)
+        return merge_rejected_rows(rejected_batches).restore_positions(result)
+
+    def prepare(batch: TaskBatch) -> PreparedBatch:
+        """Does all CPU work of a batch before the upload."""
+        key = None
+        if checkpoint is not None:
+            key = checkpoint.key(batch)
+        # Rows are validated before a restore, so rejected rows are reported on every run.
+        valid_batch, rejected = check(batch)
+        if checkpoint is not None:
+            restored = checkpoint.restore(key)
+            if restored is not None:
+                logging.info(f'Pool {pool_id} - rows {batch.offset}-{batch.offset + len(batch.rows)} '
+                             f'were already uploaded, skipping')
+                return PreparedBatch(batch, key, restored=restored)
+        with phase('build_tasks'):
+            tasks = valid_batch.build(pool_id)
+        return PreparedBatch(batch, key, tasks, rejected)
+
+    def send(prepared: PreparedBatch, is_last: bool) -> TaskBatchCreateResult:
+        if prepared.restored is not None:
+            if open_pool and is_last:
+                logging.warning(f'Pool {pool_id} - the last chunk was already uploaded, the pool is not opened')
+            return prepared.restored
+        batch_kwargs = {**kwargs, 'open_pool': open_pool and is_last}
+        if prepared.rejected is None:
+            result = toloka_client.create_tasks(prepared.tasks, **batch_kwargs)
+        else:
+            result = prepared.rejected.restore_positions(
+                _create_valid_tasks(prepared.tasks, batch_kwargs, toloka_client))
+        count_rows(len(prepared.tasks))
+        if checkpoint is not None:
+            checkpoint.commit(prepared.key, result)
+        return result
+
+    if prefetch > 0:
+        # Chunks are read, validated and built by a producer thread while earlier chunks are sent.
+        uploads = upload_task_batches(send, iter_in_background(map(prepare, batches), prefetch), concurrency)
+    else:
+        uploads = upload_task_batches(lambda batch, is_last: send(prepare(batch), is_last), batches, concurrency)
+
+    results = []
+    uploaded = 0
+    for offset, result in uploads:
+        uploaded += len(result.items or {}) + len(result.validation_errors or {})
+        logging.info(f'Pool {pool_id} - {uploaded} tasks uploaded')
+        if on_chunk_uploaded is not None:
+            on_chunk_uploaded(offset, result)
+            # Only validation errors are kept, tasks belong to the callback.
+            result = TaskBatchCreateResult(items={}, validation_errors=result.validation_errors)
+        results.append((offset, result))
+
+    if not results:
+        raise ValueError(
+            "At least one of pool_tasks, control_tasks or training_tasks should be set")
+
+    if len(results) == 1:
+        return results[0][1]
+    return merge_task_batch_results(results)
+
+
+@add_headers('dataiku')
+@instrumented
+def create_sharded_tasks(
+    pool_template: Union[Pool, Dict, str, bytes],
+    *,
+    pool_tasks: TasksSource,
+    control_tasks: Optional[pd.DataFrame] = None,
+    project: Union[Project, Dict, str, None] = None,
+    project_id: str = None,
+    training: Union[Training, Dict, str, None] = None,
+    training_id: str = None,
+    expiration: Union[str, int, None] = None,
+    reward_per_assignment: Optional[float] = None,
+    shards: Optional[int] = None,
+    rows_per_shard: Optional[int] = None,
+    shard_by: Optional[Union[str, List[str]]] = None,
+    partition_by: Optional[str] = None,
+    allow_defaults: bool = False,
+    open_pool: bool = False,
+    skip_invalid_items: bool = False,
+    chunk_size: Optional[int] = None,
+    concurrency: int = 4,
+    prefetch: int = 0,
+    validate: bool = False,
+    on_rejected: Optional[Callable[[pd.DataFrame], None]] = None,
+    toloka_client: TolokaClient,
+) -> Dict[str, Any]:
+    """
+    Function to spread tasks across several pools created from one pool config, and upload them in parallel.
+
+    Every row goes to a shard deterministically: by a hash of `shard_by` columns, or by the value of the
+    `partition_by` column. The same rows go to the same shards in every run. Values are hashed as strings,
+    so a column read as integers in one run and as strings in another is sharded the same way,
+    but integers read as floats, e.g. because of missing values, are not.
+
+    Args:
+        - pool_template (Pool, Dict, str, bytes): Config of every pool. Private names of pools get a shard suffix.
+        - pool_tasks (DataFrame, Iterable[DataFrame]): Pool tasks to spread. May also be an iterator of DataFrame
+            chunks if `shards` is set.
+        - control_tasks (DataFrame, optional): Control tasks uploaded to every pool.
+        - project (Project, Dict, str, optional): Project to assign pools to.
+        - project_id (str): Project ID to assign pools to.
+        - training (Training, Dict, str, optional): Related training pool.
+        - training_id (str): Related training pool ID.
+        - expiration (int, str, optional): Pool expiration in days or as an ISO-8601 date and time, as in `create_pool`.
+        - reward_per_assignment (float, optional): Allow to redefine reward per assignment.
+        - shards (int, optional): Number of pools.
+        - rows_per_shard (int, optional): Target number of tasks per pool, to derive the number of pools from.
+        - shard_by (str, List[str], optional): Columns to hash to choose the pool of a row. All INPUT: columns by
+            default, so repeated tasks share a pool.
+        - partition_by (str, optional): Column whose every distinct value gets its own pool.
+            Exactly one of `shards`, `rows_per_shard` and `partition_by` should be set.
+        - allow_defaults (bool, optional): Allow to use the overlap that is set in the pool parameters.
+        - open_pool (bool, optional): Open pools with tasks once all of them are uploaded.
+        - skip_invalid_items (bool, optional): Allow to skip invalid tasks.
+        - chunk_size (int, optional): Read and spread tasks by chunks of at most this many rows.
+            Tasks of a pool are uploaded by chunks of the same size, as in `create_tasks`.
+        - concurrency (int, optional): Number of parallel uploads, 4 by default. They are shared by pools
+            uploaded to in parallel, and the rest are used for chunks of a pool, as in `create_tasks`.
+        - prefetch (int, optional): Number of chunks of a pool built ahead of the upload, as in `create_tasks`.
+        - validate (bool, optional): Validate rows against the project specification before upload,
+            as in `create_tasks`.
+        - on_rejected (Callable[[DataFrame], None], optional): Called with rows rejected by validation, as in
+            `create_tasks`. Enables validation.
+        - toloka_client (TolokaClient): Client to be used to create obects in Toloka
+
+    Returns:
+        - Dict: Shard manifest. "shards" lists every shard number, its partition key, pool, number of rows
+            and number of created tasks. `wait_pool`, `wait_pools` and `get_shard_assignments_dfs` accept
+            its pools, see `shard_pools`.
+
+    Example:
+        >>> manifest = create_sharded_tasks(pool_config, project=project, pool_tasks=tasks_df, rows_per_shard=100000)
+        ...
+    """
+    plan = plan_shards(pool_tasks, shards, rows_per_shard, shard_by, partition_by)
+    with phase('structure'):
+        template = unstructure(structure_from_conf(pool_template, Pool))
+    keys = plan.keys or [None] * plan.shards
+    parallel_shards = min(concurrency, plan.shards)
+
+    def _create_pool(shard: int) -> Dict[str, Any]:
+        config = {**template,
+                  'private_name': shard_name(template.get('private_name'), shard, plan.shards, keys[shard])}
+        return create_pool(config, project=project, project_id=project_id, training=training, training_id=training_id,
+                           expiration=expiration, reward_per_assignment=reward_per_assignment,
+                           toloka_client=toloka_client)
+
+    def _create_tasks(item: Tuple[str, Optional[pd.DataFrame], Optional[pd.DataFrame]]) -> Dict[str, Any]:
+        pool_id, shard_tasks, shard_control_tasks = item
+        return create_tasks(pool_id=pool_id, pool_tasks=shard_tasks, control_tasks=shard_control_tasks,
+                            allow_defaults=allow_defaults, skip_invalid_items=skip_invalid_items,
+                            chunk_size=chunk_size, concurrency=max(1, concurrency // parallel_shards),
+                            prefetch=prefetch, toloka_client=toloka_client)
+
+    rows = np.zeros(plan.shards, dtype=np.int64)
+    created = np.zeros(plan.shards, dtype=np.int64)
+    shard_executor = ThreadPoolExecutor(max_workers=parallel_shards) if concurrency > 1 else nullcontext()
+    with shard_executor as executor:
+        pools = map_in_context(_create_pool, range(plan.shards), executor)
+        pool_ids = [pool['id'] for pool in pools]
+        logging.info(f'Created {plan.shards} pools: {", ".join(pool_ids)}')
+        task_spec = None
+        if validate or on_rejected is not None:
+            task_spec = toloka_client.get_project(pools[0]['project_id']).task_spec
+        if control_tasks is not None:
+            map_in_context(_create_tasks, [(pool_id, None, control_tasks) for pool_id in pool_ids], executor)
+
+        offset = 0
+        for chunk in iter_dataframe_chunks(pool_tasks, chunk_size):
+            with phase('shard'):
+                shard_numbers = plan.assign(chunk)
+            rows += np.bincount(shard_numbers, minlength=plan.shards)
+            valid_rows = chunk
+            if task_spec is not None:
+                valid_rows, rejected = _reject_invalid_rows(chunk, offset, task_spec, False, skip_invalid_items,
+                                                            on_rejected)
+                shard_numbers = shard_numbers[rejected.valid_positions]
+            chunk_shards = np.unique(shard_numbers)
+            parts = [(pool_ids[shard], valid_rows[shard_numbers == shard], None) for shard in chunk_shards]
+            for shard, result in zip(chunk_shards, map_in_context(_create_tasks, parts, executor)):
+                created[shard] += len(result.get('items') or {})
+            offset += len(chunk)
+            logging.info(f'{offset} rows spread across {plan.shards} pools, {created.sum()} tasks created')
+
+        if open_pool:
+            opened = map_in_context(lambda pool_id: unstructure(toloka_client.open_pool(pool_id)),
+                                    [pool_id for pool_id, tasks in zip(pool_ids, created) if tasks], executor)
+            opened_pools = {pool['id']: pool for pool in opened}
+            pools = [opened_pools.get(pool['id'], pool) for pool in pools]
+
+    return {
+        'shard_by': plan.shard_by,
+        'partition_by': plan.partition_by,
+        'shards': [
+            {'shard': shard, 'key': keys[shard], 'pool': pools[shard], 'rows': int(rows[shard]),
+             'tasks': int(created[shard])}
+            for shard in range(plan.shards)
+        ],
+    }
 
 
 @unstructured
 @add_headers('dataiku')
+@instrumented
 def open_pool(
     *,
     pool: Optional[Union[Pool, Dict, str]] = None,
@@ -238,6 +596,7 @@ def open_pool(
 
 @unstructured
 @add_headers('dataiku')
+@instrumented
 def open_training(
     *,
     training: Optional[Union[Training, Dict, str]] = None,
@@ -269,12 +628,17 @@ def open_training(
 
 @unstructured
 @add_headers('dataiku')
+@instrumented
 def wait_pool(
     *,
     pool: Optional[Union[Pool, Dict, str]] = None,
     pool_id: Optional[str] = None,
     period: int = 60,
     open_pool: bool = False,
+    min_period: Optional[int] = None,
+    max_period: Optional[int] = None,
+    completion_threshold: Optional[float] = None,
+    min_accepted_assignments: Optional[int] = None,
     toloka_client: TolokaClient,
 ) -> Pool:
     """
@@ -285,10 +649,18 @@ def wait_pool(
         - pool_id (str): pool ID.
         - period (timedelta): Interval between checks (in seconds). One minute by default.
         - open_pool (bool, optional): Allow to open pool at start if it's closed. False by default.
+        - min_period (int, optional): Minimum interval between checks (in seconds). `period` by default.
+        - max_period (int, optional): Maximum interval between checks (in seconds). `period` by default.
+            If the range is wider than one value, intervals adapt to the predicted pool close time:
+            checks get more frequent as the pool approaches completion and rarer while it makes no progress.
+        - completion_threshold (float, optional): Return while the pool is still open
+            once its completion percentage reaches this value.
+        - min_accepted_assignments (int, optional): Return while the pool is still open
+            once this many assignments are accepted.
         - toloka_client (TolokaClient): Client to be used to create obects in Toloka
 
     Returns:
-        - Pool: Toloka pool object.
+        - Pool: Toloka pool object. It's still open if the pool was released early.
 
     Example:
         >>> pool = wait_pool(pool, open_pool=True)
@@ -303,21 +675,176 @@ def wait_pool(
     if pool.is_closed() and open_pool:
         pool = toloka_client.open_pool(pool_id)
 
-    period = timedelta(seconds=period)
-    while pool.is_open():
-        op = toloka_client.get_analytics(
-            [CompletionPercentagePoolAnalytics(subject_id=pool_id)])
-        percentage = toloka_client.wait_operation(
-            op).details['value'][0]['result']['value']
-        logging.info(f'Pool {pool_id} - {percentage}%')
+    scheduler = _poll_scheduler(period, min_period, max_period)
+    return _wait_closed([pool], lambda: [toloka_client.get_pool(pool_id)], scheduler, 1, toloka_client,
+                        completion_threshold, min_accepted_assignments)[0]
+
+
+def _poll_scheduler(period: int, min_period: Optional[int], max_period: Optional[int]) -> PollScheduler:
+    min_period = min_period or min(period, max_period or period)
+    return PollScheduler(min_period, max_period or max(period, min_period))
+
+
+def _request_progress(
+    objects: List[Union[Pool, Training]],
+    toloka_client: TolokaClient,
+    accepted: bool = False,
+) -> Tuple[Dict[str, float], Dict[str, int]]:
+    """
+    Requests completion percentages and, if `accepted` is set, accepted assignments counts
+    of all open pools in one analytics request.
+    """
+    pool_ids = [obj.id for obj in objects if isinstance(obj, Pool) and obj.is_open()]
+    if not pool_ids:
+        return {}, {}
+    analytics = [CompletionPercentagePoolAnalytics(subject_id=pool_id) for pool_id in pool_ids]
+    if accepted:
+        analytics += [ApprovedAssignmentsCountPoolAnalytics(subject_id=pool_id) for pool_id in pool_ids]
+    op = toloka_client.get_analytics(analytics)
+
+    values = {}
+    for request, entry in zip(analytics, toloka_client.wait_operation(op).details['value']):
+        subject = entry.get('request', {})
+        key = subject.get('name', request.name.value), subject.get('subject_id', request.subject_id)
+        values[key] = entry['result']['value']
+    percentages = {pool_id: values.get((_COMPLETION_PERCENTAGE, pool_id)) for pool_id in pool_ids}
+    accepted_counts = {}
+    if accepted:
+        accepted_counts = {pool_id: values.get((_APPROVED_ASSIGNMENTS_COUNT, pool_id)) for pool_id in pool_ids}
+    for pool_id in pool_ids:
+        accepted_info = f', {accepted_counts[pool_id]} accepted assignments' if accepted else ''
+        logging.info(f'Pool {pool_id} - {percentages[pool_id]}%{accepted_info}')
+    return percentages, accepted_counts
 
-        time.sleep(period.total_seconds())
-        pool = toloka_client.get_pool(pool_id)
 
-    return pool
+def _wait_closed(
+    objects: List[Union[Pool, Training]],
+    fetch: Callable[[], List[Union[Pool, Training]]],
+    scheduler: PollScheduler,
+    quorum: int,
+    toloka_client: TolokaClient,
+    completion_threshold: Optional[float] = None,
+    min_accepted_assignments: Optional[int] = None,
+) -> List[Union[Pool, Training]]:
+    """
+    Polls `fetch` until at least `quorum` of the returned pools and trainings are finished.
 
+    A pool or training is finished once it's not open. With `completion_threshold` or `min_accepted_assignments`
+    an open pool is also finished once its completion percentage or its accepted assignments count reaches them.
+    """
+    while True:
+        closed = sum(not obj.is_open() for obj in objects)
+        if closed >= quorum:
+            return objects
+        try:
+            percentages, accepted_counts = _request_progress(objects, toloka_client,
+                                                             accepted=min_accepted_assignments is not None)
+            scheduler.observe(percentages)
+            released = {
+                pool_id for pool_id, percentage in percentages.items()
+                if completion_threshold is not None and percentage is not None and percentage >= completion_threshold
+            } | {
+                pool_id for pool_id, count in accepted_counts.items()
+                if count is not None and count >= min_accepted_assignments
+            }
+            if closed + len(released) >= quorum:
+                logging.info(f'Releasing results of open pools: {", ".join(sorted(released))}')
+                return objects
+        except _TRANSIENT_ERRORS as e:
+            scheduler.fail(e)
+        period = scheduler.next_period()
+        logging.info(f'Next check in {period:.0f}s')
+        with phase('sleep'):
+            time.sleep(period)
+        try:
+            objects = fetch()
+        except _TRANSIENT_ERRORS as e:
+            scheduler.fail(e)
 
+
+@unstructured
 @add_headers('dataiku')
+@instrumented
+def wait_pools(
+    *,
+    pools: Optional[List[Union[Pool, Dict, str]]] = None,
+    pool_ids: Optional[List[str]] = None,
+    trainings: Optional[List[Union[Training, Dict, str]]] = None,
+    training_ids: Optional[List[str]] = None,
+    period: int = 60,
+    open_pools: bool = False,
+    min_period: Optional[int] = None,
+    max_period: Optional[int] = None,
+    quorum: Optional[int] = None,
+    completion_threshold: Optional[float] = None,
+    min_accepted_assignments: Optional[int] = None,
+    concurrency: int = 8,
+    toloka_client: TolokaClient,
+) -> List[Union[Pool, Training]]:
+    """
+    Function to wait several Toloka pools and trainings until close.
+
+    Completion percentages of all open pools are requested with one analytics request per check,
+    and states of pools and trainings are requested concurrently.
+
+    Args:
+        - pools (List[Pool, Dict, str], optional): `Pool` objects or their configs.
+        - pool_ids (List[str], optional): Pool IDs.
+        - trainings (List[Training, Dict, str], optional): `Training` objects or their configs.
+        - training_ids (List[str], optional): Training IDs.
+        - period (int): Interval between checks (in seconds). One minute by default.
+        - open_pools (bool, optional): Allow to open closed pools and trainings at start. False by default.
+        - min_period (int, optional): Minimum interval between checks (in seconds). `period` by default.
+        - max_period (int, optional): Maximum interval between checks (in seconds). `period` by default.
+            Intervals adapt to the nearest predicted pool close time, as in `wait_pool`.
+        - quorum (int, optional): Return once this many pools and trainings are finished. All of them by default.
+        - completion_threshold (float, optional): Count an open pool as finished once its completion percentage
+            reaches this value.
+        - min_accepted_assignments (int, optional): Count an open pool as finished once this many of its
+            assignments are accepted.
+        - concurrency (int): Maximum number of concurrent state requests.
+        - toloka_client (TolokaClient): Client to be used to create obects in Toloka
+
+    Returns:
+        - List[Pool, Training]: Pools followed by trainings in the given order.
+
+    Example:
+        >>> pools = wait_pools(pools=[first_pool, second_pool], quorum=1)
+        ...
+    """
+    pool_ids = [extract_id(pool, Pool) for pool in pools or []] + list(pool_ids or [])
+    training_ids = [extract_id(training, Training) for training in trainings or []] + list(training_ids or [])
+    watched: List[Tuple[Callable[[str], Union[Pool, Training]], str]] = (
+        [(toloka_client.get_pool, pool_id) for pool_id in pool_ids]
+        + [(toloka_client.get_training, training_id) for training_id in training_ids]
+    )
+    if not watched:
+        raise ValueError("Either pools, pool_ids, trainings or training_ids should be set")
+    if quorum is None:
+        quorum = len(watched)
+    if not 1 <= quorum <= len(watched):
+        raise ValueError(f'quorum should be between 1 and {len(watched)}, got {quorum}')
+
+    def _get(item: Tuple[Callable[[str], Union[Pool, Training]], str]) -> Union[Pool, Training]:
+        getter, obj_id = item
+        return getter(obj_id)
+
+    def _get_or_open(item: Tuple[Callable[[str], Union[Pool, Training]], str]) -> Union[Pool, Training]:
+        obj = _get(item)
+        if open_pools and obj.is_closed():
+            obj = toloka_client.open_pool(obj.id) if isinstance(obj, Pool) else toloka_client.open_training(obj.id)
+        return obj
+
+    pool_executor = ThreadPoolExecutor(max_workers=min(concurrency, len(watched))) if concurrency > 1 else nullcontext()
+    with pool_executor as executor:
+        return _wait_closed(map_in_context(_get_or_open, watched, executor),
+                            lambda: map_in_context(_get, watched, executor),
+                            _poll_scheduler(period, min_period, max_period), quorum, toloka_client,
+                            completion_threshold, min_accepted_assignments)
+
+
+@add_headers('dataiku')
+@instrumented
 def get_assignments_df(
     status: Union[str, List[str], Assignment.Status,
                   List[Assignment.Status], None] = None,
@@ -328,6 +855,8 @@ def get_assignments_df(
     start_time_to: Optional[datetime] = None,
     exclude_banned: bool = False,
     field: Optional[List[GetAssignmentsTsvParameters.Field]] = None,
+    watermark: Optional[Dict[str, Any]] = None,
+    compact_dtypes: bool = False,
     toloka_client: TolokaClient
 ) -> pd.DataFrame:
     """
@@ -344,6 +873,11 @@ def get_assignments_df(
             even if assignments in suitable status "ACCEPTED".
         - field (List[GetAssignmentsTsvParameters.Field], optional): Select some additional fields.
             You can find possible values in the `toloka.client.assignment.GetAssignmentsTsvParameters.Field` enum.
+        - watermark (Dict, optional): Watermark returned by `update_assignments_watermark` after the previous run.
+            Only assignments started after the watermark are downloaded and already seen assignments are dropped.
+        - compact_dtypes (bool): Return timestamps as `datetime64`, repeated strings (labels, workers, statuses,
+            inputs) as categories, other strings as Arrow strings with pandas 1.3 or later and downcast integers,
+            instead of Python objects. Aggregation uses category codes directly. False by default.
         - toloka_client (TolokaClient): Client to be used to create obects in Toloka
 
     Returns:
@@ -363,28 +897,302 @@ def get_assignments_df(
         status = []
     elif isinstance(status, (str, Assignment.Status)):
         status = [status]
+    if watermark and watermark.get('start_time_from'):
+        watermark_time = datetime.fromisoformat(watermark['start_time_from'])
+        start_time_from = max(start_time_from, watermark_time) if start_time_from else watermark_time
+        if field is not None:
+            field = list(field) + [required_field for required_field in _WATERMARK_FIELDS
+                                   if required_field not in field]
     kwargs = {'start_time_from': start_time_from,
               'start_time_to': start_time_to,
               'exclude_banned': exclude_banned,
               'field': field}
-    return toloka_client.get_assignments_df(
+    assignments_df = toloka_client.get_assignments_df(
         pool_id=pool_id,
         status=status,
         **{key: value for key, value in kwargs.items() if value is not None}
     )
+    if watermark and watermark.get('assignments'):
+        seen = assignments_df['ASSIGNMENT:assignment_id'].isin(watermark['assignments'].keys())
+        assignments_df = assignments_df[~seen].reset_index(drop=True)
+    if compact_dtypes:
+        with phase('compact'):
+            assignments_df = to_compact_dtypes(assignments_df)
+    count_rows(len(assignments_df))
+    return assignments_df
+
+
+@add_headers('dataiku')
+@instrumented
+def get_shard_assignments_dfs(
+    status: Union[str, List[str], Assignment.Status,
+                  List[Assignment.Status], None] = None,
+    *,
+    manifest: Dict[str, Any],
+    exclude_banned: bool = False,
+    field: Optional[List[GetAssignmentsTsvParameters.Field]] = None,
+    watermarks: Optional[Dict[str, Dict[str, Any]]] = None,
+    compact_dtypes: bool = False,
+    concurrency: int = 4,
+    toloka_client: TolokaClient
+) -> Dict[str, pd.DataFrame]:
+    """
+    Function to get assignments of all pools of a shard manifest written by `create_sharded_tasks`.
+    Pools are downloaded in parallel.
+
+    Args:
+        - status (str, List[str], optional): A status or a list of statuses to get.
+            All statuses (None) by default.
+        - manifest (Dict): Shard manifest.
+        - exclude_banned (bool, optional): Exclude answers from banned performers,
+            even if assignments in suitable status "ACCEPTED".
+        - field (List[GetAssignmentsTsvParameters.Field], optional): Select some additional fields.
+        - watermarks (Dict[str, Dict], optional): Watermarks of the previous run by pool ID, see `get_assignments_df`.
+        - compact_dtypes (bool): Return compact dtypes, as in `get_assignments_df`. False by default.
+        - concurrency (int, optional): Number of pools downloaded in parallel. 4 by default.
+        - toloka_client (TolokaClient): Client to be used to create obects in Toloka
+
+    Returns:
+        - Dict[str, DataFrame]: Assignments by pool ID in the shards order.
+
+    Example:
+        >>> assignments_df = pd.concat(get_shard_assignments_dfs('ACCEPTED', manifest=manifest).values())
+        ...
+    """
+    pools = shard_pools(manifest)
+
+    def _get(pool: Dict[str, Any]) -> Tuple[str, pd.DataFrame]:
+        pool_id = extract_id(pool, Pool)
+        return pool_id, get_assignments_df(status, pool_id=pool_id, exclude_banned=exclude_banned, field=field,
+                                           watermark=(watermarks or {}).get(pool_id), compact_dtypes=compact_dtypes,
+                                           toloka_client=toloka_client)
+
+    pool_executor = ThreadPoolExecutor(max_workers=min(concurrency, len(pools))) if concurrency > 1 else nullcontext()
+    with pool_executor as executor:
+        return dict(map_in_context(_get, pools, executor))
+
+
+def _banned_user_ids(toloka_client: TolokaClient, project_id: str, pool_id: str) -> Set[str]:
+    now = datetime.utcnow()
+    searches = [
+        {'scope': UserRestriction.ALL_PROJECTS},
+        {'scope': UserRestriction.PROJECT, 'project_id': project_id},
+        {'scope': UserRestriction.POOL, 'pool_id': pool_id},
+    ]
+    return {
+        restriction.user_id
+        for search in searches
+        for restriction in toloka_client.get_user_restrictions(**search)
+        if restriction.will_expire is None or restriction.will_expire.replace(tzinfo=None) > now
+    }
+
+
+def _iter_assignments_dfs(
+    status: List[Union[str, Assignment.Status]],
+    pool_id: str,
+    project_id: Optional[str],
+    exclude_banned: bool,
+    chunk_size: int,
+    watermark: Optional[Dict[str, Any]],
+    compact_dtypes: bool,
+    toloka_client: TolokaClient,
+) -> Iterator[pd.DataFrame]:
+    project_id = project_id or toloka_client.get_pool(pool_id).project_id
+    task_spec = toloka_client.get_project(project_id).task_spec
+    columns = assignment_columns(list(task_spec.input_spec), list(task_spec.output_spec))
+    banned = _banned_user_ids(toloka_client, project_id, pool_id) if exclude_banned else set()
+
+    search = {'pool_id': pool_id}
+    if status:
+        search['status'] = status
+    seen = set()
+    if watermark and watermark.get('start_time_from'):
+        search['created_gte'] = datetime.fromisoformat(watermark['start_time_from'])
+        seen = set(watermark.get('assignments', {}))
+
+    def _chunk(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+        count_rows(len(rows))
+        chunk = pd.DataFrame.from_records(rows, columns=columns)
+        # Integers are not downcast, so all chunks share dtypes.
+        return to_compact_dtypes(chunk, downcast_integers=False) if compact_dtypes else chunk
+
+    rows = []
+    chunks = 0
+    for assignment in toloka_client.get_assignments(**search):
+        if assignment.user_id in banned or assignment.id in seen:
+            continue
+        rows.extend(assignment_to_rows(assignment))
+        if len(rows) >= chunk_size:
+            yield _chunk(rows)
+            chunks += 1
+            rows = []
+    if rows or not chunks:
+        yield _chunk(rows)
+
+
+@add_headers('dataiku')
+@instrumented
+def iter_assignments_dfs(
+    status: Union[str, List[str], Assignment.Status,
+                  List[Assignment.Status], None] = None,
+    *,
+    pool: Optional[Union[Pool, Dict, str]] = None,
+    pool_id: Optional[str] = None,
+    exclude_banned: bool = False,
+    chunk_size: int = 10000,
+    watermark: Optional[Dict[str, Any]] = None,
+    compact_dtypes: bool = False,
+    toloka_client: TolokaClient
+) -> Iterator[pd.DataFrame]:
+    """
+    Function to stream pool assignments page by page as Pandas `DataFrame` chunks.
+
+    Unlike `get_assignments_df`, only one chunk is kept in memory at a time. Chunks have the same columns
+    as the assignments TSV export, declared up front from the project input and output specification.
+
+    Args:
+        - pool (Pool, Training, Dict, str, optional): Either a `Pool` object or it's config.
+        - pool_id (str): pool ID.
+        - status (str, List[str], optional): A status or a list of statuses to get.
+            All statuses (None) by default.
+        - exclude_banned (bool, optional): Exclude answers from performers restricted in this pool,
+            its project or all projects.
+        - chunk_size (int): Approximate number of rows in each chunk. 10000 by default.
+        - watermark (Dict, optional): Watermark returned by `update_assignments_watermark` after the previous run.
+        - compact_dtypes (bool): Return chunks with compact dtypes as `get_assignments_df` does,
+            except for integers, which keep their dtype in all chunks. False by default.
+        - toloka_client (TolokaClient): Client to be used to create obects in Toloka
+
+    Returns:
+        - Iterator[DataFrame]: Chunks with selected assignments, one row per task.
+            A single empty chunk is returned if there are no assignments.
+
+    Example:
+        >>> for chunk in iter_assignments_dfs(pool=pool, status=['ACCEPTED']):
+        ...     writer.write_dataframe(chunk)
+        ...
+    """
+    project_id = None
+    if pool:
+        pool_id = extract_id(pool, Pool)
+        project_id = structure_from_conf(pool, Pool).project_id
+    if not pool_id:
+        raise ValueError("Either pool or pool_id should be set")
+
+    if not status:
+        status = []
+    elif isinstance(status, (str, Assignment.Status)):
+        status = [status]
+    return iter_in_context(_iter_assignments_dfs(
+        status, pool_id, project_id, exclude_banned, chunk_size, watermark, compact_dtypes, toloka_client))
+
+
+@instrumented
+def update_assignments_watermark(
+    assignments_df: pd.DataFrame,
+    watermark: Optional[Dict[str, Any]] = None,
+    lookback: int = 0,
+) -> Dict[str, Any]:
+    """
+    Function to advance an incremental assignments download watermark past the given assignments.
+
+    Accepted, rejected, expired and skipped assignments are remembered and dropped from the next download.
+    The next download starts no later than the earliest active or submitted assignment, however long it waits
+    for review, so only its final status is kept with `final_assignments`.
+
+    Args:
+        - assignments_df (DataFrame): All assignments downloaded with the previous `watermark` in this run.
+            Should contain "ASSIGNMENT:assignment_id", "ASSIGNMENT:status" and "ASSIGNMENT:started" columns.
+        - watermark (Dict, optional): Watermark used to download `assignments_df`.
+        - lookback (int): Interval (in seconds) before the latest start time to download again on the next run.
+            Should cover the time between the start of an assignment and its appearance in the export,
+            e.g. `assignment_max_duration_seconds` of the pool.
+
+    Returns:
+        - Dict: JSON-serializable watermark to pass to the next `get_assignments_df` call.
+
+    Example:
+        >>> new_df = get_assignments_df(pool=pool, watermark=watermark)
+        >>> watermark = update_assignments_watermark(new_df, watermark,
+        ...                                          lookback=pool['assignment_max_duration_seconds'])
+        ...
+    """
+    watermark = dict(watermark or {'start_time_from': None, 'assignments': {}})
+    if assignments_df.empty:
+        return watermark
+
+    started = pd.to_datetime(assignments_df['ASSIGNMENT:started'])
+    final = assignments_df['ASSIGNMENT:status'].isin(_FINAL_STATUSES)
+    start_time_from = started.max().to_pydatetime() - timedelta(seconds=lookback)
+    if not final.all():
+        start_time_from = min(start_time_from, started[~final].min().to_pydatetime())
+    if watermark['start_time_from']:
+        start_time_from = max(start_time_from, datetime.fromisoformat(watermark['start_time_from']))
+
+    assignments = {
+        assignment_id: started_at
+        for assignment_id, started_at in watermark['assignments'].items()
+        if datetime.fromisoformat(started_at) >= start_time_from
+    }
+    recent = (started >= start_time_from) & final
+    assignments.update(zip(
+        assignments_df.loc[recent, 'ASSIGNMENT:assignment_id'],
+        (started_at.to_pydatetime().isoformat() for started_at in started[recent]),
+    ))
+    return {'start_time_from': start_time_from.isoformat(), 'assignments': assignments}
+
+
+def final_assignments(assignments_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Function to keep assignments whose status does not change anymore: accepted, rejected, expired and skipped.
+
+    Incremental downloads should only append these, as active and submitted assignments are downloaded again
+    by the next run with the watermark of `update_assignments_watermark`. So each assignment is appended once.
+
+    Args:
+        - assignments_df (DataFrame): Assignments with an "ASSIGNMENT:status" column.
+
+    Returns:
+        - DataFrame: Assignments in final statuses.
+
+    Example:
+        >>> new_df = get_assignments_df(pool=pool, watermark=watermark)
+        >>> watermark = update_assignments_watermark(new_df, watermark, lookback=lookback)
+        >>> writer.write_dataframe(final_assignments(new_df))
+        ...
+    """
+    final = assignments_df['ASSIGNMENT:status'].isin(_FINAL_STATUSES)
+    return assignments_df if final.all() else assignments_df[final].reset_index(drop=True)
 
 
 @add_headers('dataiku')
+@instrumented
 def aggregate_dawid_skene(
     answers_df: pd.DataFrame,
-    n_iter: int = 20
-) -> pd.DataFrame:
+    n_iter: int = 20,
+    *,
+    tol: float = 1e-5,
+    state: Optional[Dict[str, Any]] = None,
+    on_state_fitted: Optional[Callable[[Dict[str, Any]], None]] = None,
+    engine: Optional[str] = None,
+    n_jobs: int = 1,
+) -> pd.Series:
     """
     Function to aggregate pool assignments in case of categorial responses using Dawid-Skene algorithm
 
     Args:
         - answers_df (DataFrame): DataFrame containing raw pool assignments.
-        - n_iter (int): The number of EM iterations (algorithm parameter).
+        - n_iter (int): The maximum number of EM iterations (algorithm parameter).
+        - tol (float): Stop EM iterations once the evidence lower bound per answer improves by less than this value.
+        - state (Dict, optional): Model state passed to `on_state_fitted` by a previous run.
+            Class priors and confusion matrices of known workers are used as a starting point,
+            so a re-aggregation with a few new answers takes a few iterations.
+        - on_state_fitted (Callable[[Dict], None], optional): Called with the JSON-serializable fitted model state:
+            labels, class priors and confusion matrices of all workers seen so far.
+        - engine (str, optional): `'crowdkit'` to run crowd-kit `DawidSkene` or `'numpy'` to run the built-in
+            sparse implementation, which takes a fraction of crowd-kit time and memory on millions of answers.
+            By default `'numpy'` is used only if `state` or `on_state_fitted` is given, as only it supports them.
+        - n_jobs (int): The number of threads used by the `'numpy'` engine.
 
     Returns:
         - Series: `pd.Series` with aggregated responses to each task, task is a Series index.
@@ -393,16 +1201,182 @@ def aggregate_dawid_skene(
         >>> predicted_answers = aggregate_dawid_skene(answers_df, n_iter)
         ...
     """
-    answers_df['task'] = answers_df.apply(
-        get_task_from_fields, axis=1, field_type='INPUT:')
-    answers_df['label'] = answers_df.apply(
-        get_task_from_fields, axis=1, field_type='OUTPUT:')
-    # Prepare dataframe
-    answers_df = answers_df.rename(columns={
-        'ASSIGNMENT:worker_id': 'worker'
-    })
-    answers_df = answers_df[['task', 'label', 'worker']]
-    # Run aggregation
-    predicted_answers = DawidSkene(n_iter=n_iter).fit_predict(answers_df)
-
-    return predicted_answers
+    warm_start = state is not None or on_state_fitted is not None
+    if engine is None:
+        engine = 'numpy' if warm_start else 'crowdkit'
+    if engine not in ('crowdkit', 'numpy'):
+        raise ValueError(f'Unknown Dawid-Skene engine: {engine}')
+    if engine == 'crowdkit' and warm_start:
+        raise ValueError('Model state is supported only by the numpy engine')
+
+    with phase('encode'):
+        answers = encode_answers(answers_df)
+    count_rows(len(answers.task))
+    if engine == 'crowdkit':
+        # Run aggregation
+        with phase('fit'):
+            predicted_answers = DawidSkene(n_iter=n_iter, tol=tol).fit_predict(answers.to_frame())
+        return answers.decode_tasks(predicted_answers)
+
+    with phase('fit'):
+        predicted_answers, new_state = fit_dawid_skene(answers, n_iter, tol, state, n_jobs=n_jobs)
+    if on_state_fitted is not None:
+        on_state_fitted(new_state)
+    return answers.decode(predicted_answers)
+
+
+@instrumented
+def aggregate(
+    answers_df: pd.DataFrame,
+    method: str = 'dawid_skene',
+    *,
+    cascade: bool = False,
+    agreement_threshold: float = 1.0,
+    n_iter: Optional[int] = None,
+    tol: Optional[float] = None,
+    n_jobs: int = 1,
+) -> pd.Series:
+    """
+    Function to aggregate pool assignments in case of categorial responses with the chosen method.
+
+    Tasks, workers and labels are encoded to integer codes once, and the aggregator runs on the codes.
+
+    Args:
+        - answers_df (DataFrame): DataFrame containing raw pool assignments.
+        - method (str): Aggregation method: `'majority_vote'`, `'wawa'`, `'dawid_skene'`, `'glad'` or `'mmsr'`.
+        - cascade (bool): Take the majority vote for tasks where workers agree and run `method`
+            only on answers to contested tasks.
+        - agreement_threshold (float): In cascade mode, the minimum share of answers with the top label
+            for a task to be settled by the majority vote. 1.0 means unanimous answers only.
+        - n_iter (int, optional): The maximum number of iterations of iterative methods. Method default if not set.
+        - tol (float, optional): Convergence tolerance of iterative methods. Method default if not set.
+        - n_jobs (int): The number of threads used by `'dawid_skene'`.
+
+    Returns:
+        - Series: `pd.Series` with aggregated responses to each task, task is a Series index.
+
+    Example:
+        >>> predicted_answers = aggregate(answers_df, 'dawid_skene', cascade=True, agreement_threshold=0.8)
+        ...
+    """
+    aggregator = get_aggregator(method, n_iter=n_iter, tol=tol, n_jobs=n_jobs)
+    with phase('encode'):
+        answers = encode_answers(answers_df)
+    count_rows(len(answers.task))
+    with phase('fit'):
+        if cascade:
+            return aggregate_cascade(answers, aggregator, agreement_threshold)
+        return aggregate_codes(answers, aggregator)
+
+
+def _is_answer_column(column: str) -> bool:
+    return column.startswith(('INPUT:', 'OUTPUT:')) or column == 'ASSIGNMENT:worker_id'
+
+
+@add_headers('dataiku')
+@instrumented
+def aggregate_pool(
+    status: Union[str, List[str], Assignment.Status,
+                  List[Assignment.Status], None] = None,
+    *,
+    pool: Optional[Union[Pool, Dict, str]] = None,
+    pool_id: Optional[str] = None,
+    exclude_banned: bool = False,
+    method: str = 'dawid_skene',
+    cascade: bool = False,
+    agreement_threshold: float = 1.0,
+    n_iter: Optional[int] = None,
+    tol: Optional[float] = None,
+    n_jobs: int = 1,
+    chunk_size: int = 100000,
+    toloka_client: TolokaClient
+) -> pd.Series:
+    """
+    Function to download pool assignments and aggregate their categorical responses in one pass.
+
+    Same as `get_assignments_df` followed by `aggregate`, but the assignments table is never built:
+    only task inputs, answers and worker IDs are exported, and the export is parsed by chunks
+    as it is downloaded, each encoded to integer task, worker and label codes right away. Values are read as strings.
+    With toloka-kit versions whose raw export can not be streamed, the export is parsed as a whole
+    and aggregated as `aggregate` does.
+
+    Args:
+        - pool (Pool, Training, Dict, str, optional): Either a `Pool` object or it's config.
+        - pool_id (str): pool ID.
+        - status (str, List[str], optional): A status or a list of statuses to get.
+            All statuses (None) by default.
+        - exclude_banned (bool, optional): Exclude answers from banned performers,
+            even if assignments in suitable status "ACCEPTED".
+        - method (str): Aggregation method: `'majority_vote'`, `'wawa'`, `'dawid_skene'`, `'glad'` or `'mmsr'`.
+        - cascade (bool): Take the majority vote for tasks where workers agree and run `method`
+            only on answers to contested tasks.
+        - agreement_threshold (float): In cascade mode, the minimum share of answers with the top label
+            for a task to be settled by the majority vote. 1.0 means unanimous answers only.
+        - n_iter (int, optional): The maximum number of iterations of iterative methods. Method default if not set.
+        - tol (float, optional): Convergence tolerance of iterative methods. Method default if not set.
+        - n_jobs (int): The number of threads used by `'dawid_skene'`.
+        - chunk_size (int): Number of export rows parsed at once. 100000 by default.
+        - toloka_client (TolokaClient): Client to be used to create obects in Toloka
+
+    Returns:
+        - Series: `pd.Series` with aggregated responses to each task, task is a Series index.
+
+    Example:
+        >>> predicted_answers = aggregate_pool('ACCEPTED', pool=pool, method='dawid_skene')
+        ...
+    """
+    if pool:
+        pool_id = extract_id(pool, Pool)
+    if not pool_id:
+        raise ValueError("Either pool or pool_id should be set")
+
+    if not status:
+        status = []
+    elif isinstance(status, (str, Assignment.Status)):
+        status = [status]
+    aggregator = get_aggregator(method, n_iter=n_iter, tol=tol, n_jobs=n_jobs)
+
+    parameters = GetAssignmentsTsvParameters(status=status, exclude_banned=exclude_banned,
+                                             field=[GetAssignmentsTsvParameters.Field.WORKER_ID])
+    encoder = AnswerEncoder()
+    # The export is downloaded while it is parsed, so the "encode" phase includes the download.
+    with phase('encode'), open_assignments_tsv(toloka_client, pool_id, parameters) as export:
+        if export is None:
+            assignments_df = toloka_client.get_assignments_df(pool_id, parameters)
+            return aggregate(assignments_df, method, cascade=cascade, agreement_threshold=agreement_threshold,
+                             n_iter=n_iter, tol=tol, n_jobs=n_jobs)
+        chunks = pd.read_csv(export, delimiter='\t', usecols=_is_answer_column, dtype=str, chunksize=chunk_size)
+        for chunk in chunks:
+            count_rows(encoder.add(chunk))
+        answers = encoder.encode()
+    with phase('fit'):
+        if cascade:
+            return aggregate_cascade(answers, aggregator, agreement_threshold)
+        return aggregate_codes(answers, aggregator)
+
+
+def get_operation_metrics(clear: bool = False) -> pd.DataFrame:
+    """
+    Function to get timing and throughput metrics of the latest operation calls.
+
+    Every call of an operation from this module is recorded once it returns, or once its iterator is exhausted.
+
+    Args:
+        - clear (bool): Forget the returned records, so the next call returns only new ones.
+
+    Returns:
+        - DataFrame: `pd.DataFrame` with one row per operation call, oldest first, and columns:
+            `operation`, `started_at`, `wall_seconds`,
+            `http_seconds` (total response time of requests, may exceed `wall_seconds` with concurrent requests),
+            `requests`, `request_bytes`, `response_bytes`, `retries`,
+            `queue_seconds` (total time requests waited for the rate limiter), `throttled` (429 responses),
+            `rows` (tasks uploaded, assignment rows downloaded or answers aggregated),
+            `phases` (JSON object with wall time of phases like "structure", "build_tasks", "sleep", "encode", "fit")
+            and `error` (exception class name if the call failed).
+
+    Example:
+        >>> pool = wait_pool(pool=pool, toloka_client=toloka_client)
+        >>> metrics_df = get_operation_metrics(clear=True)
+        ...
+    """
+    return recorded_metrics(clear)
@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from toloka_dataiku._utils import _arrow_string_dtype, to_compact_dtypes
+
+LABELS = ['cat', 'dog'] * 50
+IDS = [f'assignment-{i}' for i in range(100)]
+
+
+@pytest.mark.parametrize('dtype', [object, 'string'])
+def test_repeated_strings_become_categories(dtype):
+    df = pd.DataFrame({'OUTPUT:result': pd.Series(LABELS, dtype=dtype)})
+
+    compact_df = to_compact_dtypes(df)
+
+    assert isinstance(compact_df['OUTPUT:result'].dtype, pd.CategoricalDtype)
+    assert compact_df['OUTPUT:result'].tolist() == LABELS
+
+
+@pytest.mark.skipif(_arrow_string_dtype() is None, reason='Arrow strings are not supported')
+@pytest.mark.parametrize('dtype', [object, 'string'])
+def test_unique_strings_become_arrow_strings(dtype):
+    df = pd.DataFrame({'ASSIGNMENT:assignment_id': pd.Series(IDS, dtype=dtype)})
+
+    compact_df = to_compact_dtypes(df)
+
+    assert compact_df['ASSIGNMENT:assignment_id'].dtype == _arrow_string_dtype()
+    assert compact_df['ASSIGNMENT:assignment_id'].tolist() == IDS
+
+
+def test_categories_and_numbers_are_kept():
+    df = pd.DataFrame({'OUTPUT:result': pd.Series(LABELS, dtype='category'), 'OUTPUT:score': [0.5] * 100})
+
+    compact_df = to_compact_dtypes(df)
+
+    pd.testing.assert_frame_equal(compact_df, df)
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from toloka_dataiku import aggregate_dawid_skene
+
+LABELS = ['bird', 'cat', 'dog']
+
+
+def make_answers_df(seed, tasks=300, workers=40, overlap=5):
+    """Answers of workers with different accuracy, so Dawid-Skene has worker skills to learn."""
+    rng = np.random.default_rng(seed)
+    true_labels = rng.integers(len(LABELS), size=tasks)
+    accuracy = rng.uniform(0.4, 0.95, size=workers)
+    rows = []
+    for task, true_label in enumerate(true_labels):
+        for worker in rng.choice(workers, overlap, replace=False):
+            label = true_label if rng.random() < accuracy[worker] else rng.integers(len(LABELS))
+            rows.append((f'https://example.com/{task}.png', LABELS[label], f'worker-{worker}'))
+    return pd.DataFrame(rows, columns=['INPUT:image', 'OUTPUT:result', 'ASSIGNMENT:worker_id'])
+
+
+@pytest.mark.parametrize('seed', range(3))
+@pytest.mark.parametrize('n_jobs', [1, 4])
+def test_numpy_engine_matches_crowdkit(seed, n_jobs):
+    answers_df = make_answers_df(seed)
+
+    expected = aggregate_dawid_skene(answers_df, 20, engine='crowdkit').sort_index()
+    predicted = aggregate_dawid_skene(answers_df, 20, engine='numpy', n_jobs=n_jobs).sort_index()
+
+    pd.testing.assert_series_equal(predicted, expected)
+
+
+def test_numpy_engine_warm_start_keeps_labels():
+    answers_df = make_answers_df(0)
+    states = []
+    predicted = aggregate_dawid_skene(answers_df, 20, engine='numpy', on_state_fitted=states.append)
+
+    warm_predicted = aggregate_dawid_skene(answers_df, 20, state=states[0])
+
+    # EM goes on from the fitted state, so a few borderline tasks may change.
+    assert (warm_predicted.reindex(predicted.index) == predicted).mean() >= 0.99
+
+
+def test_numpy_engine_without_answers():
+    answers_df = make_answers_df(0).iloc[:0]
+    states = []
+
+    predicted = aggregate_dawid_skene(answers_df, 20, engine='numpy', on_state_fitted=states.append)
+
+    assert predicted.empty
+    assert states == [{'labels': [], 'priors': [], 'workers': {}}]
@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from toloka.client import Task
+
+from toloka_dataiku._utils import (
+    _columns_to_dicts,
+    init_control_tasks,
+    init_pool_tasks,
+    init_training_tasks,
+    join_fields,
+)
+
+POOL_ID = 'pool-1'
+
+
+# Row-wise builders replaced by the column-wise ones, kept as the reference behaviour.
+
+def _row_values(row: pd.Series, headings, prefix):
+    return {field[len(prefix):]: row[field] for field in headings if not pd.isna(row[field])}
+
+
+def _headings(tasks_df, prefix):
+    return [column_name for column_name in tasks_df.columns if column_name.startswith(prefix)]
+
+
+def rowwise_pool_tasks(tasks_df, pool_id):
+    headings = _headings(tasks_df, 'INPUT:')
+    return [Task(input_values=_row_values(row, headings, 'INPUT:'), pool_id=pool_id) for _, row in tasks_df.iterrows()]
+
+
+def rowwise_control_tasks(tasks_df, pool_id):
+    input_headings, golden_headings = _headings(tasks_df, 'INPUT:'), _headings(tasks_df, 'GOLDEN:')
+    return [
+        Task(input_values=_row_values(row, input_headings, 'INPUT:'),
+             known_solutions=[{'output_values': _row_values(row, golden_headings, 'GOLDEN:')}],
+             pool_id=pool_id)
+        for _, row in tasks_df.iterrows()
+    ]
+
+
+def rowwise_training_tasks(tasks_df, pool_id):
+    input_headings, golden_headings = _headings(tasks_df, 'INPUT:'), _headings(tasks_df, 'GOLDEN:')
+    hint_headings = _headings(tasks_df, 'HINT:') or golden_headings
+    return [
+        Task(input_values=_row_values(row, input_headings, 'INPUT:'),
+             known_solutions=[{'output_values': _row_values(row, golden_headings, 'GOLDEN:')}],
+             message_on_unknown_solution=f'Correct solution: '
+                                         f'{"".join(row[field] for field in hint_headings if not pd.isna(row[field]))}',
+             pool_id=pool_id)
+        for _, row in tasks_df.iterrows()
+    ]
+
+
+def get_task_from_fields(row, field_type):
+    values_lst = [val for idx, val in row.items() if idx.startswith(field_type)]
+    if len(values_lst) == 1:
+        return values_lst[0]
+    elif len(values_lst) > 1:
+        return "|".join(values_lst)
+    else:
+        return ""
+
+
+SINGLE_FIELD_DF = pd.DataFrame({
+    'INPUT:image': ['a.png', 'b.png', 'c.png'],
+    'GOLDEN:result': ['cat', 'dog', 'cat'],
+})
+
+MULTI_FIELD_DF = pd.DataFrame({
+    'INPUT:image': ['a.png', 'b.png', 'c.png'],
+    'INPUT:text': ['first', 'second', 'third'],
+    'INPUT:count': [1, 2, 3],
+    'GOLDEN:result': ['cat', 'dog', 'cat'],
+    'GOLDEN:comment': ['fluffy', 'good boy', 'grumpy'],
+    'HINT:text': ['look ', 'at the ', 'ears'],
+    'OTHER:ignored': ['x', 'y', 'z'],
+})
+
+MISSING_VALUES_DF = pd.DataFrame({
+    'INPUT:image': ['a.png', None, 'c.png', np.nan],
+    'INPUT:text': [np.nan, 'second', None, 'fourth'],
+    'GOLDEN:result': ['cat', None, np.nan, 'dog'],
+    'GOLDEN:comment': [None, 'good boy', 'grumpy', np.nan],
+    'HINT:text': [None, 'ears', np.nan, 'tail'],
+})
+
+TASKS_DFS = pytest.mark.parametrize('tasks_df', [SINGLE_FIELD_DF, MULTI_FIELD_DF, MISSING_VALUES_DF],
+                                    ids=['single_field', 'multi_field', 'missing_values'])
+
+
+@TASKS_DFS
+def test_pool_tasks_match_rowwise(tasks_df):
+    assert init_pool_tasks(tasks_df, POOL_ID) == rowwise_pool_tasks(tasks_df, POOL_ID)
+
+
+@TASKS_DFS
+def test_control_tasks_match_rowwise(tasks_df):
+    assert init_control_tasks(tasks_df, POOL_ID) == rowwise_control_tasks(tasks_df, POOL_ID)
+
+
+@TASKS_DFS
+def test_training_tasks_match_rowwise(tasks_df):
+    assert init_training_tasks(tasks_df, POOL_ID) == rowwise_training_tasks(tasks_df, POOL_ID)
+
+
+def test_training_hints_fall_back_to_golden_values():
+    tasks_df = MISSING_VALUES_DF.drop(columns=['HINT:text'])
+    tasks = init_training_tasks(tasks_df, POOL_ID)
+
+    assert tasks == rowwise_training_tasks(tasks_df, POOL_ID)
+    assert [task.message_on_unknown_solution for task in tasks] == [
+        'Correct solution: cat', 'Correct solution: good boy', 'Correct solution: grumpy', 'Correct solution: dog']
+
+
+def test_columns_to_dicts_skips_missing_values():
+    values = _columns_to_dicts(MISSING_VALUES_DF, ['INPUT:image', 'INPUT:text'], 'INPUT:')
+
+    assert values == [{'image': 'a.png'}, {'text': 'second'}, {'image': 'c.png'}, {'text': 'fourth'}]
+
+
+def test_columns_to_dicts_keeps_python_values():
+    values = _columns_to_dicts(MULTI_FIELD_DF, ['INPUT:count'], 'INPUT:')
+
+    assert values == [{'count': 1}, {'count': 2}, {'count': 3}]
+    assert all(type(row_values['count']) is int for row_values in values)
+
+
+def test_empty_frame_builds_no_tasks():
+    tasks_df = SINGLE_FIELD_DF.iloc[:0]
+
+    assert init_pool_tasks(tasks_df, POOL_ID) == []
+    assert init_control_tasks(tasks_df, POOL_ID) == []
+    assert init_training_tasks(tasks_df, POOL_ID) == []
+
+
+@pytest.mark.parametrize('answers_df', [
+    pd.DataFrame({'INPUT:image': ['a.png', 'b.png'], 'OUTPUT:result': ['cat', 'dog']}),
+    pd.DataFrame({'INPUT:image': ['a.png', 'b.png'], 'INPUT:text': ['first', 'second'],
+                  'OUTPUT:result': ['cat', 'dog']}),
+    pd.DataFrame({'INPUT:image': ['a.png', None, np.nan], 'OUTPUT:result': ['cat', 'dog', 'cat']}),
+    pd.DataFrame({'OUTPUT:result': ['cat', 'dog']}),
+], ids=['single_field', 'multi_field', 'missing_values', 'no_fields'])
+def test_join_fields_matches_rowwise(answers_df):
+    expected = answers_df.apply(get_task_from_fields, axis=1, field_type='INPUT:')
+
+    pd.testing.assert_series_equal(join_fields(answers_df, 'INPUT:'), expected, check_names=False)
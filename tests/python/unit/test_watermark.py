@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from toloka_dataiku import final_assignments, update_assignments_watermark
+
+START = datetime(2022, 8, 1)
+
+
+def make_assignments_df(statuses):
+    """One assignment per status, started a minute apart."""
+    return pd.DataFrame({
+        'ASSIGNMENT:assignment_id': [f'a{i}' for i in range(len(statuses))],
+        'ASSIGNMENT:status': statuses,
+        'ASSIGNMENT:started': [(START + timedelta(minutes=i)).isoformat() for i in range(len(statuses))],
+    })
+
+
+def download(assignments_df, watermark):
+    """What `get_assignments_df` returns for the watermark of the previous run."""
+    if watermark is None:
+        return assignments_df
+    started = pd.to_datetime(assignments_df['ASSIGNMENT:started'])
+    downloaded = started >= datetime.fromisoformat(watermark['start_time_from'])
+    seen = assignments_df['ASSIGNMENT:assignment_id'].isin(watermark['assignments'].keys())
+    return assignments_df[downloaded & ~seen].reset_index(drop=True)
+
+
+def test_final_assignments_keeps_final_statuses():
+    assignments_df = make_assignments_df(['ACCEPTED', 'SUBMITTED', 'REJECTED', 'ACTIVE', 'EXPIRED', 'SKIPPED'])
+
+    assert final_assignments(assignments_df)['ASSIGNMENT:assignment_id'].tolist() == ['a0', 'a2', 'a4', 'a5']
+
+
+def test_incremental_runs_append_each_assignment_once():
+    runs = [
+        ['ACCEPTED', 'SUBMITTED', 'ACTIVE'],
+        ['ACCEPTED', 'SUBMITTED', 'SUBMITTED', 'ACCEPTED'],
+        ['ACCEPTED', 'ACCEPTED', 'REJECTED', 'ACCEPTED', 'EXPIRED'],
+    ]
+    watermark, appended = None, []
+    for statuses in runs:
+        assignments_df = download(make_assignments_df(statuses), watermark)
+        watermark = update_assignments_watermark(assignments_df, watermark, lookback=60)
+        appended.append(final_assignments(assignments_df))
+    appended_df = pd.concat(appended, ignore_index=True)
+
+    assert sorted(appended_df['ASSIGNMENT:assignment_id']) == ['a0', 'a1', 'a2', 'a3', 'a4']
+    assert appended_df.set_index('ASSIGNMENT:assignment_id')['ASSIGNMENT:status'].to_dict() == {
+        'a0': 'ACCEPTED', 'a1': 'ACCEPTED', 'a2': 'REJECTED', 'a3': 'ACCEPTED', 'a4': 'EXPIRED'}
+
+
+def test_watermark_waits_for_submitted_assignments_beyond_lookback():
+    statuses = ['SUBMITTED'] + ['ACCEPTED'] * 10
+    watermark = update_assignments_watermark(make_assignments_df(statuses), lookback=60)
+
+    assert watermark['start_time_from'] == START.isoformat()
+    assert set(watermark['assignments']) == {f'a{i}' for i in range(1, 11)}
+
+    statuses[0] = 'ACCEPTED'
+    assignments_df = download(make_assignments_df(statuses), watermark)
+
+    assert final_assignments(assignments_df)['ASSIGNMENT:assignment_id'].tolist() == ['a0']